@@ -0,0 +1,64 @@
+# Benchmark: BOMs of many projects with `batch.run_batch`, projects/second for 1 worker process up to
+# the number of CPUs, vs. the same projects one after the other in this process.
+# Usage: python bench/bench_batch.py [n_projects] [symbols_per_project]
+
+import os
+import sys
+import tempfile
+import time
+
+from common import load_src
+import synth
+
+load_src()
+from src import batch  # noqa: E402
+from src.cli import load_bom  # noqa: E402
+from src.utils import json_from_bom__with_pn_as_key  # noqa: E402
+
+
+def write_projects(root, n_projects, n_symbols):
+    # boards/board_<i>/board_<i>.kicad_pcb + .kicad_sch, flat or hierarchical, with parts shared between projects
+    for i in range(n_projects):
+        directory = os.path.join(root, 'boards', 'board_{i}'.format(i=i))
+        os.makedirs(directory)
+        name = 'board_{i}'.format(i=i)
+        with open(os.path.join(directory, name + '.kicad_pcb'), 'w') as fo:
+            fo.write('(kicad_pcb)\n')
+        if i % 2:
+            synth.write_schematic(os.path.join(directory, name + '.kicad_sch'), n_symbols=n_symbols, n_fields=10,
+                                  unique_parts=max(1, n_symbols // 10), seed=i)
+        else:
+            synth.write_hierarchy(directory, depth=1, fanout=3, symbols_per_sheet=n_symbols // 4, n_fields=10, seed=i)
+            os.replace(os.path.join(directory, 'hierarchy.kicad_sch'), os.path.join(directory, name + '.kicad_sch'))
+    # a sub-sheet without its own PCB is not a project
+    with open(os.path.join(root, 'boards', 'orphan.kicad_sch'), 'w') as fo:
+        fo.write('(kicad_sch)\n')
+
+
+def sequential(projects):
+    return {str(_p): json_from_bom__with_pn_as_key(load_bom(_p, cache=False)[0].bom()) for _p in projects}
+
+
+def main(n_projects, n_symbols):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'repo')
+        write_projects(root, n_projects, n_symbols)
+        projects = batch.discover_projects(root)
+
+        t0 = time.perf_counter()
+        sequential(projects)
+        t_sequential = time.perf_counter() - t0
+        print('{n} projects of {s} symbols, {c} CPUs'.format(n=n_projects, s=n_symbols, c=os.cpu_count()))
+        print('{:>12} {:>9} {:>12}'.format('workers', 'time s', 'projects/s'))
+        print('{:>12} {:>9.2f} {:>12.1f}'.format('sequential', t_sequential, n_projects / t_sequential))
+        workers = sorted({1, 2, 4, os.cpu_count() or 1})
+        for max_workers in workers:
+            output_dir = os.path.join(tmp, 'boms_{w}'.format(w=max_workers))
+            t0 = time.perf_counter()
+            batch.run_batch(projects, output_dir, [root], max_workers=max_workers, cache=False)
+            elapsed = time.perf_counter() - t0
+            print('{:>12} {:>9.2f} {:>12.1f}'.format(max_workers, elapsed, n_projects / elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40, int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
@@ -0,0 +1,39 @@
+# Benchmark: switching the part number field in the dialog, `utils.make_quantity` vs. `bom_index.BOMIndex`.
+# Usage: python bench/bench_bom_index.py [n_symbols ...]
+
+import os
+import sys
+import tempfile
+
+from common import load_src, best_of
+import synth
+
+load_src()
+from src import utils  # noqa: E402
+from src.bom_index import BOMIndex  # noqa: E402
+
+
+def switch_fields(make_quantity, fields):
+    # the user going back and forth between candidate columns
+    for fname in fields + fields:
+        make_quantity(fname)
+
+
+def main(sizes):
+    print('{:>8} {:>9} {:>14} {:>14} {:>14}'.format('symbols', 'fields', 'make_quantity', 'index 1st', 'index cached'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = synth.write_schematic(os.path.join(tmp, 'bench_{n}.kicad_sch'.format(n=n)),
+                                         n_symbols=n, n_fields=12, unique_parts=max(1, n // 20))
+            symbol_table = utils.get_symbol_table(path)
+            fields = ['Manufacturer Part Number', 'Digikey Part Number', 'Value']
+            t_legacy, _ = best_of(switch_fields, lambda f: utils.make_quantity(symbol_table, f), fields)
+            index = BOMIndex(symbol_table)
+            t_first, _ = best_of(switch_fields, index.make_quantity, fields, repeat=1)
+            t_cached, _ = best_of(switch_fields, index.make_quantity, fields)
+            print('{:>8} {:>9} {:>14.3f} {:>14.3f} {:>14.6f}'.format(
+                n, len(fields) * 2, t_legacy, t_first, t_cached))
+
+
+if __name__ == '__main__':
+    main([int(_) for _ in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,61 @@
+# Peak RSS and wall time of the `get_symbol_dict` engines ('stream', 'mmap', and the legacy line parser).
+# Every measurement runs in a fresh interpreter, so peak RSS isn't shared between engines.
+# Usage: python bench/bench_engines.py [n_symbols ...]
+# (Unix only: peak RSS comes from `resource.getrusage`)
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import synth
+
+ENGINES = ('legacy', 'stream', 'mmap')
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 1e6 if sys.platform == 'darwin' else rss / 1e3
+
+
+def child(engine, path):
+    from common import load_src
+    load_src()
+    from src import utils
+    import bench_parser
+    baseline = _max_rss_mb()  # interpreter and imports
+    t0 = time.perf_counter()
+    if engine == 'legacy':
+        symbols = bench_parser.legacy_get_symbol_dict(path)
+    else:
+        symbols = utils.get_symbol_dict(path, engine=engine)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({'symbols': len(symbols), 'seconds': elapsed, 'peak_mb': _max_rss_mb() - baseline}))
+
+
+def measure(engine, path):
+    out = subprocess.run([sys.executable, __file__, '--child', engine, path],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def main(sizes):
+    print('{:>8} {:>9} {:>8} {:>10} {:>12}'.format('symbols', 'file MB', 'engine', 'seconds', 'peak RSS MB'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = synth.write_schematic(os.path.join(tmp, 'bench_{n}.kicad_sch'.format(n=n)), n_symbols=n)
+            for engine in ENGINES:
+                result = measure(engine, path)
+                print('{:>8} {:>9.1f} {:>8} {:>10.3f} {:>12.1f}'.format(
+                    result['symbols'], os.path.getsize(path) / 1e6, engine, result['seconds'], result['peak_mb']))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main([int(_) for _ in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,101 @@
+# Import time of the plugin at KiCad startup, i.e. of `src/__init__.py` registering the action plugin.
+# When run by a Python that has pcbnew (e.g. KiCad's), exits with an error if `import src` takes more
+# than BUDGET_MS.
+# Usage: python bench/bench_import.py [budget_ms]
+
+import ast
+import os
+import subprocess
+import sys
+
+from common import REPO_ROOT, SRC_PATH
+
+BUDGET_MS = 20.0
+REGISTRATION_MODULES = ['__init__']
+# imported on the first Run() only, reported for comparison
+DEFERRED = ['requests', 'src.utils', 'src.push_client', 'src.push_outbox']
+
+
+def module_imports(module_name):
+    # --> (plugin modules, other modules) imported at module level by src/<module_name>.py
+    with open(os.path.join(SRC_PATH, module_name + '.py'), encoding='utf-8') as fi:
+        tree = ast.parse(fi.read())
+    local, external = set(), set()
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop(0)
+        if isinstance(node, (ast.If, ast.Try)):  # `if pcbnew is not None:`, `try: import ...`
+            nodes += node.body + node.orelse + getattr(node, 'finalbody', [])
+            for handler in getattr(node, 'handlers', []):
+                nodes += handler.body
+        elif isinstance(node, ast.Import):
+            external.update(_alias.name for _alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                if node.module:
+                    local.add(node.module)
+                else:
+                    local.update(_alias.name for _alias in node.names)
+            else:
+                external.add(node.module)
+    return local, external
+
+
+def registration_imports():
+    # every module imported when `src` is imported, following the plugin modules
+    seen, external = set(), set()
+    pending = list(REGISTRATION_MODULES)
+    while pending:
+        module_name = pending.pop()
+        if module_name in seen:
+            continue
+        seen.add(module_name)
+        local, ext = module_imports(module_name)
+        pending += local
+        external |= ext
+    return seen, external
+
+
+def import_times(code):
+    # `python -X importtime -c code` --> {module: cumulative microseconds}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_ROOT,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _self, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def has_pcbnew():
+    return subprocess.run([sys.executable, '-c', 'import pcbnew'], capture_output=True).returncode == 0
+
+
+def main(budget_ms):
+    modules, external = registration_imports()
+    print('registration imports: {m} + {e}'.format(m=sorted(modules), e=sorted(external)))
+    status = 0
+    if has_pcbnew():
+        # pcbnew is already loaded when KiCad scans plugins
+        times = import_times('import pcbnew; import src')
+        elapsed_ms = times['src'] / 1000
+        print('import src (KiCad startup): {t:.1f} ms'.format(t=elapsed_ms))
+        if elapsed_ms > budget_ms:
+            print('import src takes {t:.1f} ms, budget {b} ms'.format(t=elapsed_ms, b=budget_ms), file=sys.stderr)
+            status = 1
+    else:
+        times = import_times('import src')
+        print('import src (no pcbnew, nothing registered): {t:.1f} ms'.format(t=times['src'] / 1000))
+    # what the first Run() imports instead (wx aside)
+    times = import_times('; '.join('import ' + _m for _m in DEFERRED))
+    for module_name in DEFERRED:
+        print('  deferred to Run(): {m:<20} {t:>7.1f} ms'.format(m=module_name, t=times.get(module_name, 0) / 1000))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS))
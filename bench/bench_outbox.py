@@ -0,0 +1,39 @@
+# Benchmark: adding pushes to the outbox (`push_outbox.PushOutbox`), adding them again while they're pending
+# (deduplicated), and draining them to the local stand-in server.
+# Usage: python bench/bench_outbox.py [n_entries]
+
+import os
+import sys
+import tempfile
+import time
+
+from common import load_src
+from mylists_server import MyListsServer
+from bench_push import make_bom
+
+load_src()
+from src.push_outbox import PushOutbox  # noqa: E402
+from src.utils import json_from_bom__with_pn_as_key  # noqa: E402
+
+def main(n_entries):
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = PushOutbox(os.path.join(tmp, 'bench.sqlite3'))
+        boms = [json_from_bom__with_pn_as_key(make_bom(200, note_length=_i % 50)) for _i in range(n_entries)]
+        with MyListsServer() as server:
+            t0 = time.perf_counter()
+            for _i, _json_data in enumerate(boms):
+                outbox.add(_json_data, 'bench {i}'.format(i=_i), server.api_url)
+            t_add = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for _i, _json_data in enumerate(boms):
+                outbox.add(_json_data, 'bench {i}'.format(i=_i), server.api_url)
+            t_dedupe = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            outbox.drain()
+            t_drain = time.perf_counter() - t0
+    print('{n} pushes of 200 parts: add {a:.1f} ms, add again (deduplicated) {d:.1f} ms, drain {r:.1f} ms each'.format(
+        n=n_entries, a=1000 * t_add / n_entries, d=1000 * t_dedupe / n_entries, r=1000 * t_drain / n_entries))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
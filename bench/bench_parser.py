@@ -0,0 +1,74 @@
+# Benchmark: streaming S-expression parser vs. the legacy line-based parser of `get_symbol_dict`.
+# Usage: python bench/bench_parser.py [n_symbols ...]
+
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from common import load_src, best_of
+import synth
+
+load_src()
+from src import utils  # noqa: E402
+from src.sch_parser import iter_symbols  # noqa: E402
+
+
+def legacy_get_symbol_dict(kicad_sch_path):
+    # `get_symbol_dict` before the streaming parser, kept for comparison
+    symbols = {}
+    new_symbol = False
+    curr_uuid = None
+    with open(kicad_sch_path, 'r', encoding='utf-8') as fi:
+        lines = fi.readlines()
+    for num, line in enumerate(lines):
+        if '  (symbol (lib_id' in line:
+            new_symbol = True
+            curr_uuid = None
+        if '    (uuid' in line and new_symbol:
+            new_symbol = False
+            curr_uuid = utils.parse_uuid(line)
+            symbols[curr_uuid] = []
+        if '    (property ' in line and curr_uuid:
+            symbol_property = utils.parse_property_line(line)
+            symbols[curr_uuid].append(symbol_property)
+    return symbols
+
+
+def _drain_streaming(path):
+    count = 0
+    for _ in iter_symbols(path):
+        count += 1
+    return count
+
+
+def _drain_legacy(path):
+    return len(legacy_get_symbol_dict(path))
+
+
+def peak_memory(func, path):
+    tracemalloc.start()
+    func(path)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(sizes):
+    print('{:>8} {:>9} {:>11} {:>11} {:>8} {:>13} {:>13}'.format(
+        'symbols', 'file MB', 'legacy s', 'stream s', 'ratio', 'legacy peak', 'stream peak'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = synth.write_schematic(os.path.join(tmp, 'bench_{n}.kicad_sch'.format(n=n)), n_symbols=n)
+            t_legacy, _legacy = best_of(legacy_get_symbol_dict, path)
+            t_stream, _stream = best_of(utils.get_symbol_dict, path)
+            # peak memory of a pass that doesn't keep the result: flat for the streaming parser
+            legacy_peak = peak_memory(_drain_legacy, path)
+            stream_peak = peak_memory(_drain_streaming, path)
+            print('{:>8} {:>9.1f} {:>11.3f} {:>11.3f} {:>8.2f} {:>10.1f} MB {:>10.1f} MB'.format(
+                n, os.path.getsize(path) / 1e6, t_legacy, t_stream, t_stream / t_legacy,
+                legacy_peak / 1e6, stream_peak / 1e6))
+
+
+if __name__ == '__main__':
+    main([int(_) for _ in sys.argv[1:]] or [10_000, 100_000])
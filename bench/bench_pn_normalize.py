@@ -0,0 +1,75 @@
+# Benchmark: grouping by part number as written vs. by canonical part number (`pn_normalize`),
+# on a schematic where some symbols spell their part number differently (case, spaces, full-width
+# characters, Tape & Reel instead of Cut Tape): lines, payload size and time.
+# Usage: python bench/bench_pn_normalize.py [n_symbols]
+
+import json
+import os
+import random
+import sys
+import tempfile
+
+from common import load_src, best_of
+import synth
+
+load_src()
+from src import utils  # noqa: E402
+from src.bom_index import BOMIndex  # noqa: E402
+from src.pn_normalize import PartNumberNormalizer  # noqa: E402
+from src.symbol_table import SymbolTable  # noqa: E402
+
+PN_FIELD = 'Digikey Part Number'
+VARIANT_FRACTION = 0.2
+
+
+def variant(part_number: str, rng):
+    # the same part number, as someone else could have typed it
+    kind = rng.randrange(5)
+    if kind == 0:
+        return part_number.lower()
+    if kind == 1:
+        return ' {pn} '.format(pn=part_number)
+    if kind == 2:  # full-width digits, e.g. from a Japanese input method
+        return part_number.translate({ord(_c): 0xFF10 + int(_c) for _c in '0123456789'})
+    if kind == 3:
+        return part_number.replace('-1-ND', '-2-ND').replace('-6-ND', '-2-ND')
+    return part_number + ' '  # no-break space
+
+
+def with_variants(symbol_dict, rng):
+    for properties in symbol_dict.values():
+        for prop in properties:
+            if prop['name'] == PN_FIELD and rng.random() < VARIANT_FRACTION:
+                prop['value'] = variant(prop['value'], rng)
+    return symbol_dict
+
+
+def payload_size(bom_obj_by_pn):
+    bom = {_pn: {'qty': str(_item['quantity'])} for _pn, _item in bom_obj_by_pn.items()}
+    return len(json.dumps(utils.json_from_bom__with_pn_as_key(bom)).encode('utf-8'))
+
+
+def main(n_symbols):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = synth.write_schematic(os.path.join(tmp, 'pn.kicad_sch'), n_symbols=n_symbols, n_fields=10)
+        symbol_dict = with_variants(utils.get_symbol_dict(path), random.Random(1))
+    table = SymbolTable.from_symbol_dict(symbol_dict)
+
+    t_raw, raw = best_of(lambda: BOMIndex(table).make_quantity(PN_FIELD))
+    print('{n} symbols, {v:.0%} with a variant spelling'.format(n=len(table), v=VARIANT_FRACTION))
+    print('  {l:<22} {n:>7} lines {s:>9} bytes {t:8.1f} ms'.format(
+        l='as written', n=len(raw), s=payload_size(raw), t=1000 * t_raw))
+    for fold, label in ((False, 'normalized'), (True, 'normalized, folded')):
+        t_cold, result = best_of(
+            lambda: BOMIndex(table, normalizer=PartNumberNormalizer(fold)).make_quantity(PN_FIELD))
+        normalizer = PartNumberNormalizer(fold)
+        bom_index = BOMIndex(table, normalizer=normalizer)
+        bom_index.make_quantity(PN_FIELD)
+        t_warm = best_of(lambda: BOMIndex(table, normalizer=normalizer).make_quantity(PN_FIELD))[0]
+        print('  {l:<22} {n:>7} lines {s:>9} bytes {t:8.1f} ms ({w:.1f} ms with a warm normalizer), '
+              '{m} part numbers merged'.format(l=label, n=len(result), s=payload_size(result), t=1000 * t_cold,
+                                               w=1000 * t_warm, m=len(bom_index.merged_variants(PN_FIELD))))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,134 @@
+# Cost of the phases of `profiling` in the dialog: disabled (the default) vs. enabled, per phase,
+# and the trace of a load and a push (the load thread and the push thread need wx, their steps are replayed here).
+# Exits with an error if a disabled phase costs more than MAX_DISABLED_NS.
+# Usage: python bench/bench_profiling.py [n_symbols]
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from common import load_src
+from mylists_server import MyListsServer
+import synth
+
+load_src()
+from src import profiling, utils  # noqa: E402
+from src.bom_index import BOMIndex  # noqa: E402
+from src.push_client import PhaseTimer  # noqa: E402
+from src.push_outbox import PushOutbox  # noqa: E402
+from src.sch_hierarchy import load_sheets, iter_symbol_instances  # noqa: E402
+from src.sch_parser import parse_sheet  # noqa: E402
+from src.symbol_table import SymbolTable  # noqa: E402
+
+MAX_DISABLED_NS = 2000
+N_CALLS = 200_000
+
+
+def per_phase_ns(profiler, n_calls=N_CALLS):
+    t0 = time.perf_counter()
+    for _ in range(n_calls):
+        with profiler.phase('bench', 'load', n=1):
+            pass
+    return 1e9 * (time.perf_counter() - t0) / n_calls
+
+
+def baseline_ns(n_calls=N_CALLS):
+    t0 = time.perf_counter()
+    for _ in range(n_calls):
+        pass
+    return 1e9 * (time.perf_counter() - t0) / n_calls
+
+
+def replay_load(profiler, kicad_sch_path):
+    # the phases of `LoadThread._load`
+    def parse(path, project=None):
+        with profiler.phase('parse_sheet', 'load', path=str(path)):
+            return parse_sheet(path, project)
+
+    with profiler.phase('read_schematic', 'load'):
+        sheets = load_sheets(kicad_sch_path, parse=parse)
+    with profiler.phase('symbol_table', 'load'):
+        symbol_dict = SymbolTable.from_items(iter_symbol_instances(sheets, kicad_sch_path))
+    with profiler.phase('field_scoring', 'load'):
+        pn_field = utils.auto_select_part_number_field(symbol_dict, sampled=True)['name']
+    bom = {}
+    phase = profiler.phase('aggregation', 'load')
+    for rows in BOMIndex(symbol_dict).iter_quantity(pn_field, 500):
+        phase.end()
+        bom.update({_pn: {'qty': str(_item['quantity'])} for _pn, _item in rows.items()})
+        phase = profiler.phase('aggregation', 'load')
+    phase.end()
+    with profiler.phase('serialization'):
+        return utils.json_from_bom__with_pn_as_key(bom)
+
+
+def replay_push(profiler, json_data, api_url, outbox):
+    # the phases of `PushThread.run`
+    # `outbox`: a `push_outbox.PushOutbox`, the push is stored and claimed there first
+    requests_by_chunk = {}
+
+    def on_event(name, chunk_idx, n_chunks):
+        if name == 'request_sent':
+            requests_by_chunk[chunk_idx] = profiler.phase('http_round_trip', 'push', chunk=chunk_idx)
+        elif name == 'response_received':
+            requests_by_chunk.pop(chunk_idx).end()
+
+    timer = PhaseTimer(profiler)
+    timer.start('outbox')
+    entry, _added = outbox.add(json_data, 'profiling', api_url, chunk_size=200, claim=True)
+    timer.start('upload')
+    short_urls = outbox.send(entry['id'], on_event=on_event)
+    timer.start('launch_browser')
+    timer.stop()
+    return short_urls
+
+
+def trace_events(trace_path):
+    with open(trace_path, encoding='utf-8') as fi:
+        return [_e for _e in json.load(fi)['traceEvents'] if _e['ph'] == 'X']
+
+
+def main(n_symbols):
+    disabled = profiling.get_profiler({})
+    loop_ns = baseline_ns()
+    disabled_ns = per_phase_ns(disabled) - loop_ns
+    with tempfile.TemporaryDirectory() as tmp:
+        enabled = profiling.Profiler(os.path.join(tmp, 'bench'), trace_memory=False)
+        enabled_ns = per_phase_ns(enabled, N_CALLS // 10) - loop_ns
+        enabled_memory = profiling.Profiler(os.path.join(tmp, 'bench'))
+        enabled_memory_ns = per_phase_ns(enabled_memory, N_CALLS // 10) - loop_ns
+        enabled_memory.save()
+        print('per phase: disabled {d:.0f} ns, enabled {e:.0f} ns, enabled with memory {m:.0f} ns'.format(
+            d=disabled_ns, e=enabled_ns, m=enabled_memory_ns))
+
+        directory = synth.write_hierarchy(tmp, depth=2, fanout=3, symbols_per_sheet=n_symbols // 13, n_fields=10)
+        t0 = time.perf_counter()
+        replay_load(profiling.NULL_PROFILER, directory)
+        t_disabled = time.perf_counter() - t0
+
+        environ = {profiling.PROFILE_ENV: os.path.join(tmp, 'traces'), profiling.CPROFILE_ENV: '1'}
+        profiler = profiling.get_profiler(environ)
+        t0 = time.perf_counter()
+        json_data = replay_load(profiler, directory)
+        t_enabled = time.perf_counter() - t0
+        with MyListsServer() as server:
+            replay_push(profiler, json_data, server.api_url, PushOutbox(os.path.join(tmp, 'outbox.sqlite3')))
+        events = trace_events(profiler.save())
+        print('load of {n} symbols: {d:.3f} s disabled, {e:.3f} s enabled (with memory and cProfile), '
+              '{c} events'.format(n=n_symbols, d=t_disabled, e=t_enabled, c=len(events)))
+        for name in ('read_schematic', 'symbol_table', 'field_scoring', 'serialization', 'outbox', 'upload'):
+            event = next(_e for _e in events if _e['name'] == name)
+            print('  {n:<16} {w:>8.1f} ms wall {c:>8.1f} ms CPU (thread) {p:>8.1f} ms CPU (process) '
+                  '{m:>9.1f} KiB peak'.format(n=name, w=event['dur'] / 1000, c=event['args']['thread_cpu_ms'],
+                                              p=event['args']['process_cpu_ms'], m=event['args']['peak_kb']))
+    if disabled_ns > MAX_DISABLED_NS:
+        print('a disabled phase costs {d:.0f} ns, budget {b} ns'.format(d=disabled_ns, b=MAX_DISABLED_NS),
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
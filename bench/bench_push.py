@@ -0,0 +1,75 @@
+# Benchmark: uploading a large BOM in one request vs. in concurrent chunks (`push_client.push_bom`),
+# against the local stand-in server of `mylists_server.py`.
+# Compares the size and peak memory of the request bodies, plain JSON vs. gzipped (`compress`, off by default).
+# Usage: python bench/bench_push.py [n_parts ...]
+
+import json
+import sys
+import time
+import tracemalloc
+
+from common import load_src
+from mylists_server import MyListsServer
+
+load_src()
+from src import push_client  # noqa: E402
+from src.utils import json_from_bom__with_pn_as_key  # noqa: E402
+
+
+def make_bom(n_parts, note_length=0):
+    # `note_length`: long notes and customer references, as some users paste into them
+    filler = ' lorem ipsum' * (note_length // 12)
+    return {'PN-{i:06d}'.format(i=_i): {'mpn': 'PN-{i:06d}'.format(i=_i), 'qty': str(_i % 7 + 1),
+                                        'cusRef': 'PO-{i}{f}'.format(i=_i // 50, f=filler[:note_length // 4]),
+                                        'note': 'note {i}{f}'.format(i=_i, f=filler) if _i % 3 else ''}
+            for _i in range(n_parts)}
+
+
+def push(json_data, api_url, chunk_size, max_workers):
+    t0 = time.perf_counter()
+    try:
+        short_urls = push_client.push_bom(json_data, 'bench', api_url=api_url, chunk_size=chunk_size,
+                                          max_workers=max_workers, timeout=30)
+    except push_client.PushError as e:
+        return time.perf_counter() - t0, e.state
+    return time.perf_counter() - t0, short_urls
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+def compare_bodies(n_parts, note_length):
+    # what `requests.post(json=...)` builds vs. `encode_body`
+    json_data = json_from_bom__with_pn_as_key(make_bom(n_parts, note_length))
+    peak_plain, plain = peak_memory(lambda d: json.dumps(d, allow_nan=False).encode('utf-8'), json_data)
+    peak_gzip, (body, _headers) = peak_memory(push_client.encode_body, json_data, True)
+    print('{:>7} parts, notes of {:>4} chars: json= {:>6.2f} MB (peak {:>6.2f} MB), '
+          'gzip {:>6.2f} MB (peak {:>6.2f} MB)'.format(n_parts, note_length, len(plain) / 1e6, peak_plain / 1e6,
+                                                         len(body) / 1e6, peak_gzip / 1e6))
+
+
+def main(sizes):
+    for note_length in (0, 500):
+        compare_bodies(max(sizes), note_length)
+    # a slow server (latency, and time per part), refusing requests of more than 1000 parts
+    print('{:>7} {:>6} {:>8} {:>8} {:>9} {:>12} {:>26}'.format(
+        'parts', 'chunk', 'workers', 'time s', 'requests', 'connections', 'result'))
+    for n in sizes:
+        json_data = json_from_bom__with_pn_as_key(make_bom(n))
+        for chunk_size, max_workers in ((None, 1), (500, 1), (500, 4), (250, 8)):
+            with MyListsServer(delay=0.1, delay_per_part=0.0002, max_parts=1000) as server:
+                elapsed, result = push(json_data, server.api_url, chunk_size, max_workers)
+                if isinstance(result, list):
+                    result = '{n} lists'.format(n=len(result))
+                print('{:>7} {:>6} {:>8} {:>8.2f} {:>9} {:>12} {:>26}'.format(
+                    n, chunk_size or '-', max_workers, elapsed, server.requests, server.connections, result))
+
+
+if __name__ == '__main__':
+    main([int(_) for _ in sys.argv[1:]] or [800, 5_000])
@@ -0,0 +1,77 @@
+# Benchmark: reading a few symbols again with `sch_index` (one seek each) vs. parsing the whole schematic,
+# and finding the symbols changed by a save by block hash.
+# Usage: python bench/bench_sch_index.py [n_symbols]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import load_src, best_of
+import synth
+
+load_src()
+from src.sch_index import IndexCache, build_index, read_symbols  # noqa: E402
+from src.sch_parser import parse_sheet  # noqa: E402
+
+N_READS = 20
+SYMBOL_HEAD = '  (symbol (lib_id'
+
+
+def rewrite(path, edit, newline=''):
+    with open(path, encoding='utf-8', newline='') as fi:
+        text = fi.read()
+    stat = os.stat(path)
+    with open(path, 'w', encoding='utf-8', newline=newline) as fo:
+        fo.write(edit(text))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def non_ascii(text):
+    # multi-byte characters before and inside symbols, so byte offsets and character offsets differ
+    text = text.replace('(paper "A4")', '(paper "A4") (title_block (title "Schaltplan – µC"))', 1)
+    return text.replace(' OHM 1% ', ' Ω ±1 % ')
+
+
+def time_update(tmp, path):
+    # one part number edited at the start of the file: index again, diff, read the modified symbol
+    def edit(text):
+        head, *blocks = text.split(SYMBOL_HEAD)
+        blocks[0] = blocks[0].replace('-ND"', '-NEW-ND"', 1)
+        return SYMBOL_HEAD.join([head] + blocks)
+
+    cache = IndexCache(os.path.join(tmp, 'index'))
+    cache.update(path)
+    rewrite(path, edit)
+    t0 = time.perf_counter()
+    new_index, (_added, modified, _removed) = cache.update(path)
+    read_symbols(path, new_index, modified)
+    return time.perf_counter() - t0
+
+
+def main(n_symbols):
+    with tempfile.TemporaryDirectory() as tmp:
+        # non-ASCII values and CRLF line endings: the slow path of the byte offsets
+        path = synth.write_schematic(os.path.join(tmp, 'flat.kicad_sch'), n_symbols=n_symbols, n_fields=10)
+        rewrite(path, non_ascii)
+        rewrite(path, lambda text: text, newline='\r\n')
+        index = build_index(path)
+
+        size_mb = os.path.getsize(path) / 1e6
+        uuids = random.Random(1).sample(sorted(index), min(N_READS, len(index)))
+        t_parse = best_of(parse_sheet, path)[0]
+        t_build = best_of(build_index, path)[0]
+        t_reads = best_of(read_symbols, path, index, uuids)[0]
+        t_update = time_update(tmp, path)
+        print('{n} symbols, {s:.1f} MB'.format(n=len(index), s=size_mb))
+        print('  parse_sheet                {t:8.1f} ms'.format(t=1000 * t_parse))
+        print('  build_index                {t:8.1f} ms'.format(t=1000 * t_build))
+        print('  read {k} symbols by offset {t:8.2f} ms ({r:.0f}x faster than a parse)'.format(
+            k=len(uuids), t=1000 * t_reads, r=t_parse / t_reads))
+        print('  update after one edit      {t:8.1f} ms (index, diff, read the modified symbol)'.format(
+            t=1000 * t_update))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
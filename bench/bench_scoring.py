@@ -0,0 +1,93 @@
+# Benchmark: single-pass `score_fields_as_part_number` vs. the previous one pass per field scoring,
+# and the NumPy batch scoring of `score_field_values_as_part_number` vs. its pure-Python fallback.
+# Usage: python bench/bench_scoring.py [n_symbols ...]
+
+import os
+import random
+import re
+import sys
+import tempfile
+
+from common import load_src, best_of
+import synth
+
+load_src()
+from src import utils  # noqa: E402
+
+
+def legacy_score_field_value_as_part_number(field_value: str):
+    # `score_field_value_as_part_number` before the precompiled patterns, kept for comparison
+    score = 0
+    if field_value.isupper():
+        score += 20
+    fv = field_value.upper()
+    char_and_length_regex = re.compile(r'^[A-Z0-9#+()/\-\s,.=&:\\_*;"\'%\[\]]{1,49}$')
+    if char_and_length_regex.match(field_value):
+        score += 10
+    if not fv.isascii():
+        score -= 20
+    if len(fv) in range(11, 25):
+        score += 10
+    elif len(fv) in range(10, 11) or len(fv) in range(25, 32):
+        score += 5
+    elif len(fv) in range(8, 10) or len(fv) in range(32, 38):
+        score += 2
+    if fv.endswith('-ND'):
+        score += 50
+    if fv.endswith('TR-ND') or fv.endswith('-2-ND') \
+            or fv.endswith('CT-ND') or fv.endswith('-1-ND') \
+            or fv.endswith('DKR-ND') or fv.endswith('-6-ND'):
+        score += 10
+    categorized_regex = re.compile(r'^\d{1,4}-.*-ND$')
+    if categorized_regex.match(fv):
+        score += 10
+    return score
+
+
+def legacy_score_fields_as_part_number(symbol_dict: dict):
+    # `score_fields_as_part_number` before the single pass: every value of every field is scored
+    fields_with_score = utils.parse_fields(symbol_dict)
+    for fname in fields_with_score:
+        fname_score = utils.score_field_name_as_part_number(fname)
+        fvalues_score = 0
+        for symbol_properties in symbol_dict.values():
+            for symbol_property in symbol_properties:
+                if symbol_property['name'] == fname:
+                    fvalues_score += legacy_score_field_value_as_part_number(symbol_property['value'])
+        fields_with_score[fname]['name_score'] = fname_score
+        fields_with_score[fname]['values_score'] = fvalues_score
+        fields_with_score[fname]['field_score'] = fname_score * fvalues_score
+    return fields_with_score
+
+
+def part_number_values(n, seed=0):
+    # a column as found in designs: part numbers, references and values
+    rng = random.Random(seed)
+    patterns = ['RC0603FR-07{n}L', '311-{n}-2-ND', 'R{n}', '{n}k', 'value {n}']
+    return [rng.choice(patterns).format(n=rng.randint(0, 999_999)) for _ in range(n)]
+
+
+def main(sizes):
+    values = part_number_values(100_000)
+    t_python, _ = best_of(utils.score_field_values_as_part_number, values, False)
+    t_numpy, _ = best_of(utils.score_field_values_as_part_number, values, True)
+    print('batch of {n} values: python {p:.3f} s, numpy {v:.3f} s'.format(n=len(values), p=t_python, v=t_numpy))
+    print('{:>8} {:>11} {:>11} {:>11} {:>8} {:>11} {:>11} {:>9}'.format(
+        'symbols', 'legacy s', 'dict s', 'table s', 'speedup', 'auto s', 'sampled s', 'examined'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = synth.write_schematic(os.path.join(tmp, 'bench_{n}.kicad_sch'.format(n=n)),
+                                         n_symbols=n, n_fields=12, unique_parts=max(1, n // 20))
+            symbol_dict = utils.get_symbol_dict(path)
+            symbol_table = utils.get_symbol_table(path)
+            t_legacy, _ = best_of(legacy_score_fields_as_part_number, symbol_dict)
+            t_dict, _ = best_of(utils.score_fields_as_part_number, symbol_dict)
+            t_table, _ = best_of(utils.score_fields_as_part_number, symbol_table)
+            t_auto, _auto = best_of(utils.auto_select_part_number_field, symbol_table)
+            t_sampled, sampled = best_of(utils.auto_select_part_number_field, symbol_table, True)
+            print('{:>8} {:>11.3f} {:>11.3f} {:>11.3f} {:>8.1f} {:>11.3f} {:>11.3f} {:>9}'.format(
+                n, t_legacy, t_dict, t_table, t_legacy / t_table, t_auto, t_sampled, sampled['values_examined']))
+
+
+if __name__ == '__main__':
+    main([int(_) for _ in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,107 @@
+# Benchmark: following a change of one sheet with `sch_watch.SchematicWatcher` (poll, then update the rows
+# of the changed part numbers) vs. reading the whole design again, as reopening the dialog does.
+# Usage: python bench/bench_watch.py [symbols_per_sheet]
+
+import os
+import sys
+import tempfile
+import time
+
+from common import load_src
+import synth
+
+load_src()
+from src.bom_index import BOMIndex  # noqa: E402
+from src.bom_model import BOMModel  # noqa: E402
+from src.sch_hierarchy import get_hierarchy_symbol_table  # noqa: E402
+from src.sch_parser import parse_sheet  # noqa: E402
+from src.sch_watch import SchematicWatcher, affected_part_numbers, apply_change  # noqa: E402
+from src.utils import parse_fields  # noqa: E402
+
+PN_FIELD = 'Digikey Part Number'
+SYMBOL_HEAD = '  (symbol (lib_id'
+
+
+class CountingParser:
+    def __init__(self):
+        self.paths = []
+
+    def __call__(self, path, project=None):
+        self.paths.append(os.path.basename(path))
+        return parse_sheet(path, project)
+
+
+def edit_sheet(path, edit):
+    # rewrites `path` with edit(symbol blocks) --> symbol blocks, keeps the mtime moving
+    with open(path, encoding='utf-8') as fi:
+        text = fi.read()
+    head, *blocks = text.split(SYMBOL_HEAD)
+    blocks = edit(blocks)
+    stat = os.stat(path)
+    with open(path, 'w', encoding='utf-8') as fo:
+        fo.write(SYMBOL_HEAD.join([head] + blocks))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def wait_change(watcher):
+    # a modified sheet is parsed once it didn't change for one poll
+    watcher.poll()
+    return watcher.poll()
+
+
+def time_change(root_path, edit_path, edit, label):
+    parser = CountingParser()
+    watcher = SchematicWatcher(root_path, parse=parser)
+    watcher.load()
+    table = watcher.symbol_table()
+    bom_index = BOMIndex(table)
+    model = BOMModel(bom_index.make_quantity(PN_FIELD), parse_fields(table), PN_FIELD)
+
+    edit_sheet(edit_path, edit)
+    t0 = time.perf_counter()
+    change = wait_change(watcher)
+    t_poll = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    apply_change(table, change)
+    bom_index.clear()
+    part_numbers = affected_part_numbers(change, PN_FIELD)
+    model.update_parts(bom_index.make_quantity_for(PN_FIELD, part_numbers), part_numbers)
+    t_apply = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    full_table = get_hierarchy_symbol_table(root_path)
+    BOMModel(BOMIndex(full_table).make_quantity(PN_FIELD), parse_fields(full_table), PN_FIELD)
+    t_reload = time.perf_counter() - t0
+    print('{l:<34} {n:>7} symbols {c:>5} changed | poll {p:7.1f} ms + rows {a:6.1f} ms | full reload {r:7.1f} ms'.format(
+        l=label, n=len(table), c=len(change['added']) + len(change['modified']) + len(change['removed']),
+        p=1000 * t_poll, a=1000 * t_apply, r=1000 * t_reload))
+
+
+def set_part_number(blocks, index, value):
+    block = blocks[index]
+    start = block.index('"{f}" "'.format(f=PN_FIELD)) + len(PN_FIELD) + 4
+    end = block.index('"', start)
+    blocks[index] = block[:start] + value + block[end:]
+    return blocks
+
+
+def main(symbols_per_sheet):
+    with tempfile.TemporaryDirectory() as tmp:
+        for kicad_version in (7, 6):
+            directory = os.path.join(tmp, 'hier_k{v}'.format(v=kicad_version))
+            os.makedirs(directory)
+            root_path = synth.write_hierarchy(directory, depth=2, fanout=3, symbols_per_sheet=symbols_per_sheet,
+                                              n_fields=10, kicad_version=kicad_version)
+            level_2 = os.path.join(directory, 'level_2.kicad_sch')
+            time_change(root_path, level_2, lambda b: set_part_number(b, 0, 'NEW-PN-ND'),
+                  'KiCad {v}, new part number'.format(v=kicad_version))
+            time_change(root_path, level_2, lambda b: set_part_number(b, 1, 'NEW-PN-ND'),
+                  'KiCad {v}, existing part number'.format(v=kicad_version))
+            time_change(root_path, level_2, lambda b: b[:-3] + b[-1:],
+                  'KiCad {v}, symbols removed'.format(v=kicad_version))
+        flat = synth.write_schematic(os.path.join(tmp, 'flat.kicad_sch'), n_symbols=9 * symbols_per_sheet, n_fields=10)
+        time_change(flat, flat, lambda b: set_part_number(b, 5, 'OTHER-PN-ND'), 'flat, new part number')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+import types
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SRC_PATH = os.path.join(REPO_ROOT, 'src')
+
+
+def load_src():
+    # `src/__init__.py` registers the action plugin with pcbnew, which only exists inside KiCad.
+    # Benchmarks only need the plain modules, so expose `src` as a bare package.
+    if 'src' not in sys.modules:
+        pkg = types.ModuleType('src')
+        pkg.__path__ = [SRC_PATH]
+        sys.modules['src'] = pkg
+        if REPO_ROOT not in sys.path:
+            sys.path.insert(0, REPO_ROOT)
+    return sys.modules['src']
+
+
+def best_of(func, *args, repeat=3):
+    # best wall time of `repeat` runs, and the last result
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
@@ -0,0 +1,150 @@
+# A local stand-in for the myLists API (/mylists/api/thirdparty), to exercise `src/push_client.py`
+# without creating lists on digikey.com.
+# Each POST creates a "list" and returns its short URL as a JSON string, same as the real endpoint.
+#
+# Usage:
+#     with MyListsServer(delay=0.2, max_parts=1000) as server:
+#         push_bom(json_data, 'name', api_url=server.api_url)
+#         server.lists  # {list name: [parts]}
+#
+# `failures`: statuses answered to the first requests before any list is created, e.g. [503, 429],
+# with `Retry-After: retry_after` when it's set. Connections are kept alive (HTTP/1.1),
+# `connections` counts the ones opened by clients.
+# `accept_gzip`: bodies with `Content-Encoding: gzip` are decompressed, else refused with 415.
+
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PATH = '/mylists/api/thirdparty'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are written separately
+
+    def setup(self):
+        super().setup()
+        self.server.stand_in.add_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.server.stand_in.handle(self)
+
+
+class MyListsServer:
+    def __init__(self, delay=0.0, delay_per_part=0.0, max_parts=None, max_bytes=None, failures=(), retry_after=None,
+                 accept_gzip=True, port=0):
+        # `delay`: seconds before answering a request, `delay_per_part`: and for each part it carries
+        # `max_parts`, `max_bytes`: larger requests are refused with 413 Payload Too Large
+        # `port`: any free port by default, or the one of a previous server to restart it
+        self.delay = delay
+        self.delay_per_part = delay_per_part
+        self.max_parts = max_parts
+        self.max_bytes = max_bytes
+        self.failures = list(failures)
+        self.retry_after = retry_after
+        self.accept_gzip = accept_gzip
+        self.lists = {}  # list name: parts, as received
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.connections = 0
+        self.bytes_received = 0  # request bodies, as received
+        self.gzip_refused = 0
+        self.max_concurrent = 0
+        self._concurrent = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    @property
+    def api_url(self):
+        return 'http://127.0.0.1:{port}{path}'.format(port=self.port, path=API_PATH)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def add_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def _reply(self, handler, status, body: str, headers=None):
+        data = body.encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        try:
+            handler.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up waiting (read timeout), the list is created all the same
+
+    def handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            self._concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self._concurrent)
+        try:
+            url = urlparse(handler.path)
+            if url.path != API_PATH:
+                self._reply(handler, 404, '"Not Found"')
+                return
+            body = handler.rfile.read(int(handler.headers.get('Content-Length', 0)))
+            with self._lock:
+                self.bytes_received += len(body)
+            if handler.headers.get('Content-Encoding') == 'gzip':
+                if not self.accept_gzip:
+                    with self._lock:
+                        self.gzip_refused += 1
+                    self._reply(handler, 415, '"Unsupported Media Type"')
+                    return
+                body = gzip.decompress(body)
+            with self._lock:
+                status = self.failures.pop(0) if self.failures else None
+                if status is not None:
+                    self.failed += 1
+            if status is not None:
+                headers = {'Retry-After': str(self.retry_after)} if self.retry_after is not None else None
+                self._reply(handler, status, '"Service Unavailable"', headers)
+                return
+            if self.max_bytes is not None and len(body) > self.max_bytes:
+                self._reject(handler)
+                return
+            parts = json.loads(body)
+            if self.max_parts is not None and len(parts) > self.max_parts:
+                self._reject(handler)
+                return
+            time.sleep(self.delay + self.delay_per_part * len(parts))
+            list_name = parse_qs(url.query).get('listName', [''])[0]
+            with self._lock:
+                self.lists[list_name] = parts
+                short_id = '{n:07x}'.format(n=len(self.lists))
+            self._reply(handler, 200, json.dumps('https://www.digikey.com/short/{i}'.format(i=short_id)))
+        finally:
+            with self._lock:
+                self._concurrent -= 1
+
+    def _reject(self, handler):
+        with self._lock:
+            self.rejected += 1
+        self._reply(handler, 413, '"Payload Too Large"')
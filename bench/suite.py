@@ -0,0 +1,171 @@
+# Benchmark suite of the BOM pipeline, without KiCad or wx: times `get_symbol_dict`,
+# `score_fields_as_part_number`, `auto_select_part_number_field`, `make_quantity` and
+# `json_from_bom__with_pn_as_key` on synthetic schematics (see `synth.py`), and compares them with
+# the stored baselines of `baselines.json`.
+# Exits with an error if a step is more than `--threshold` times slower than its baseline.
+# The results of the steps are checked by the tests (tests/test_pipeline.py), not here.
+#
+# Timings are divided by the time of a fixed pure-Python workload (`calibrate`, best of before and
+# after the cases), so baselines recorded on one machine can be checked on another, within reason.
+# Timings under NOISE_FLOOR are compared as NOISE_FLOOR.
+#
+# Usage:
+#     python bench/suite.py                    # compare with bench/baselines.json
+#     python bench/suite.py --update           # record new baselines, after an intended change
+#     python bench/suite.py --case flat_k7 --case hier_k6 --threshold 1.5
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from common import load_src, best_of
+import synth
+
+load_src()
+from src import utils  # noqa: E402
+from src.bom_model import BOMModel  # noqa: E402
+from src.sch_hierarchy import get_hierarchy_symbol_dict  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_THRESHOLD = 1.5
+DEFAULT_REPEAT = 5
+NOISE_FLOOR = 0.002  # s
+
+# name: synthetic schematic, see `synth.write_schematic` and `synth.write_hierarchy` (`depth`)
+CASES = {
+    'flat_k7': {'n_symbols': 10_000, 'n_fields': 10, 'unique_parts': 1_000, 'kicad_version': 7},
+    'flat_k6': {'n_symbols': 10_000, 'n_fields': 10, 'unique_parts': 1_000, 'kicad_version': 6},
+    'wide_k7': {'n_symbols': 2_000, 'n_fields': 40, 'unique_parts': 500, 'kicad_version': 7},
+    'dup_k7': {'n_symbols': 10_000, 'n_fields': 10, 'unique_parts': 20, 'kicad_version': 7},
+    'unique_k7': {'n_symbols': 10_000, 'n_fields': 10, 'unique_parts': 10_000, 'kicad_version': 7},
+    'hier_k7': {'depth': 3, 'fanout': 3, 'symbols_per_sheet': 250, 'n_fields': 10, 'kicad_version': 7},
+    'hier_k6': {'depth': 3, 'fanout': 3, 'symbols_per_sheet': 250, 'n_fields': 10, 'kicad_version': 6},
+}
+PN_FIELD = 'Digikey Part Number'
+
+
+def write_case(directory, name):
+    # --> path of the root schematic of case `name`, written in `directory`
+    params = dict(CASES[name])
+    if 'depth' in params:
+        case_dir = os.path.join(directory, name)
+        os.makedirs(case_dir)
+        return synth.write_hierarchy(case_dir, **params)
+    return synth.write_schematic(os.path.join(directory, name + '.kicad_sch'), **params)
+
+
+def calibrate(repeat=DEFAULT_REPEAT):
+    # a fixed workload of the same kind as the pipeline: string formatting, dicts, lists
+    def workload():
+        counts = {}
+        for i in range(200_000):
+            key = 'RC0603FR-07{n:05d}L'.format(n=i % 5_000)
+            counts[key] = counts.get(key, 0) + 1
+        return sorted(counts.items())
+    return best_of(workload, repeat=repeat)[0]
+
+
+def run_case(kicad_sch_path, hierarchy, repeat):
+    # --> {step: seconds}, each step on the output of the previous one
+    timings = {}
+    load = get_hierarchy_symbol_dict if hierarchy else utils.get_symbol_dict
+    timings['get_symbol_dict'], symbol_dict = best_of(load, kicad_sch_path, repeat=repeat)
+    timings['score_fields_as_part_number'], _field_scores = best_of(
+        utils.score_fields_as_part_number, symbol_dict, repeat=repeat)
+    timings['auto_select_part_number_field'], _selected = best_of(
+        utils.auto_select_part_number_field, symbol_dict, repeat=repeat)
+    timings['auto_select_part_number_field(sampled)'], _selected = best_of(
+        lambda d: utils.auto_select_part_number_field(d, sampled=True), symbol_dict, repeat=repeat)
+    timings['make_quantity'], bom_obj_by_pn = best_of(utils.make_quantity, symbol_dict, PN_FIELD, repeat=repeat)
+    bom = BOMModel(bom_obj_by_pn, utils.parse_fields(symbol_dict), PN_FIELD).bom()
+    timings['json_from_bom__with_pn_as_key'], json_data = best_of(
+        utils.json_from_bom__with_pn_as_key, bom, repeat=repeat)
+    return timings, len(symbol_dict), len(json_data)
+
+
+def load_baselines(path=BASELINES_PATH):
+    try:
+        with open(path, encoding='utf-8') as fi:
+            return json.load(fi)
+    except FileNotFoundError:
+        return {'calibration': None, 'cases': {}}
+
+
+def save_baselines(baselines, path=BASELINES_PATH):
+    baselines = {
+        'calibration': round(baselines['calibration'], 6),
+        'cases': {_n: {_s: round(_t, 6) for _s, _t in _timings.items()} for _n, _timings in baselines['cases'].items()},
+    }
+    with open(path, 'w', encoding='utf-8') as fo:
+        json.dump(baselines, fo, indent=2, sort_keys=True)
+        fo.write('\n')
+
+
+def compare(seconds, calibration, baseline_seconds, baseline_calibration):
+    # --> how many times slower than the baseline, on the same machine
+    scale = calibration / baseline_calibration if baseline_calibration else 1.0
+    return max(seconds, NOISE_FLOOR) / max(baseline_seconds * scale, NOISE_FLOOR)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python bench/suite.py', description='Benchmark suite of the BOM pipeline.')
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help='run this case only (repeatable)')
+    parser.add_argument('--update', action='store_true', help='store the timings as the new baselines')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown vs. baseline that fails the run (default: {t})'.format(t=DEFAULT_THRESHOLD))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='best of N runs (default: 5)')
+    parser.add_argument('--baselines', default=BASELINES_PATH, help='default: bench/baselines.json')
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines(args.baselines)
+    calibration = calibrate(args.repeat)
+    results = {}
+    counts = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.case or list(CASES):
+            kicad_sch_path = write_case(tmp, name)
+            results[name], n_symbols, n_parts = run_case(kicad_sch_path, 'depth' in CASES[name], args.repeat)
+            counts[name] = (n_symbols, n_parts)
+    calibration = min(calibration, calibrate(args.repeat))
+
+    print('calibration {c:.1f} ms (baseline {b})'.format(
+        c=1000 * calibration,
+        b='{:.1f} ms'.format(1000 * baselines['calibration']) if baselines['calibration'] else 'none'))
+    print('{:<40} {:>10} {:>10} {:>7}'.format('case / step', 'ms', 'base ms', 'ratio'))
+    regressions = []
+    for name, timings in results.items():
+        print('{n}: {s} symbols, {p} parts'.format(n=name, s=counts[name][0], p=counts[name][1]))
+        base = baselines['cases'].get(name, {})
+        for step, seconds in timings.items():
+            if step in base:
+                ratio = compare(seconds, calibration, base[step], baselines['calibration'])
+                status = ' REGRESSION' if ratio > args.threshold else ''
+                if status:
+                    regressions.append((name, step, ratio))
+                print('  {:<38} {:>10.2f} {:>10.2f} {:>7.2f}{}'.format(
+                    step, 1000 * seconds, 1000 * base[step], ratio, status))
+            else:
+                print('  {:<38} {:>10.2f} {:>10} {:>7}'.format(step, 1000 * seconds, '-', '-'))
+
+    if args.update:
+        if baselines['calibration'] and args.case:
+            # only some cases: keep the others comparable, on the calibration of the stored baselines
+            scale = baselines['calibration'] / calibration
+            results = {_n: {_s: _t * scale for _s, _t in _timings.items()} for _n, _timings in results.items()}
+        else:
+            baselines['calibration'] = calibration
+        baselines['cases'].update(results)
+        save_baselines(baselines, args.baselines)
+        print('baselines written to {p}'.format(p=args.baselines))
+        return 0
+    if regressions:
+        for name, step, ratio in regressions:
+            print('{n} {s}: {r:.2f}x slower than baseline'.format(n=name, s=step, r=ratio), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
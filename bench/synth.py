@@ -0,0 +1,206 @@
+import os
+import random
+import uuid as uuid_lib
+
+# Synthetic KiCad schematic generator for benchmarks.
+# The output follows the layout written by Eeschema, so both the streaming parser
+# and the legacy line-based parser can read it.
+
+_LIB_SYMBOLS = '''  (lib_symbols
+    (symbol "Device:R" (pin_numbers hide) (pin_names (offset 0)) (in_bom yes) (on_board yes)
+      (property "Reference" "R" (at 2.032 0 90)
+        (effects (font (size 1.27 1.27)))
+      )
+      (property "Value" "R" (at 0 0 90)
+        (effects (font (size 1.27 1.27)))
+      )
+      (symbol "R_0_1"
+        (rectangle (start -1.016 -2.54) (end 1.016 2.54)
+          (stroke (width 0.254) (type default))
+          (fill (type none))
+        )
+      )
+      (symbol "R_1_1"
+        (pin passive line (at 0 3.81 270) (length 1.27)
+          (name "~" (effects (font (size 1.27 1.27))))
+          (number "1" (effects (font (size 1.27 1.27))))
+        )
+        (pin passive line (at 0 -3.81 90) (length 1.27)
+          (name "~" (effects (font (size 1.27 1.27))))
+          (number "2" (effects (font (size 1.27 1.27))))
+        )
+      )
+    )
+  )
+'''
+
+_EXTRA_FIELD_NAMES = ['Manufacturer', 'Manufacturer Part Number', 'Digikey Part Number', 'Description',
+                      'Tolerance', 'Power', 'Voltage', 'Package', 'Note', 'Supplier']
+
+
+def new_uuid(rng):
+    return str(uuid_lib.UUID(int=rng.getrandbits(128), version=4))
+
+
+def field_names(n_fields):
+    # the 4 mandatory KiCad fields, then custom fields up to `n_fields` in total
+    names = ['Reference', 'Value', 'Footprint', 'Datasheet']
+    for i in range(max(0, n_fields - 4)):
+        if i < len(_EXTRA_FIELD_NAMES):
+            names.append(_EXTRA_FIELD_NAMES[i])
+        else:
+            names.append('Custom Field {n}'.format(n=i))
+    return names
+
+
+def _field_value(name, part_idx, rng):
+    if name == 'Value':
+        return '{v}k'.format(v=part_idx % 100 + 1)
+    if name == 'Footprint':
+        return 'Resistor_SMD:R_0603_1608Metric'
+    if name == 'Datasheet':
+        return '~'
+    if name == 'Manufacturer':
+        return 'Yageo'
+    if name == 'Manufacturer Part Number':
+        return 'RC0603FR-07{n:05d}L'.format(n=part_idx)
+    if name == 'Digikey Part Number':
+        return '311-{n}-{p}-ND'.format(n=part_idx + 1000, p=rng.choice('126'))
+    if name == 'Description':
+        return 'RES {n} OHM 1% 1/10W 0603'.format(n=part_idx)
+    return 'value {n}'.format(n=part_idx % 7)
+
+
+def _property(name, value, prop_id, kicad_version):
+    _id = ' (id {i})'.format(i=prop_id) if kicad_version == 6 else ''
+    return '    (property "{n}" "{v}"{id} (at 92.71 79.375 0)\n' \
+           '      (effects (font (size 1.27 1.27)) (justify left))\n' \
+           '    )\n'.format(n=name, v=value, id=_id)
+
+
+def symbol_text(ref, part_idx, fields, rng, kicad_version=7, project='bench', instance_paths=()):
+    # one placed symbol, returns (symbol uuid, text)
+    _uuid = new_uuid(rng)
+    lines = ['  (symbol (lib_id "Device:R") (at 90.17 80.645 0) (unit 1)\n',
+             '    (in_bom yes) (on_board yes) (fields_autoplaced)\n',
+             '    (uuid {u})\n'.format(u=_uuid)]
+    # per-part values are stable, so equal parts end up with equal fields
+    part_rng = random.Random(part_idx)
+    for prop_id, name in enumerate(fields):
+        value = ref if name == 'Reference' else _field_value(name, part_idx, part_rng)
+        lines.append(_property(name, value, prop_id, kicad_version))
+    lines.append('    (pin "1" (uuid {u}))\n'.format(u=new_uuid(rng)))
+    lines.append('    (pin "2" (uuid {u}))\n'.format(u=new_uuid(rng)))
+    if kicad_version >= 7 and instance_paths:
+        lines.append('    (instances\n      (project "{p}"\n'.format(p=project))
+        for path, inst_ref in instance_paths:
+            lines.append('        (path "{p}"\n          (reference "{r}") (unit 1)\n        )\n'
+                         .format(p=path, r=inst_ref))
+        lines.append('      )\n    )\n')
+    lines.append('  )\n')
+    return _uuid, ''.join(lines)
+
+
+def _sheet_text(sheet_uuid, name, file_name, kicad_version):
+    name_field, file_field = ('Sheet name', 'Sheet file') if kicad_version == 6 else ('Sheetname', 'Sheetfile')
+    return '  (sheet (at 50 50) (size 20 10) (fields_autoplaced)\n' \
+           '    (stroke (width 0.1524) (type solid))\n' \
+           '    (fill (color 0 0 0 0.0000))\n' \
+           '    (uuid {u})\n' \
+           '    (property "{nf}" "{n}" (at 50 49.5 0)\n' \
+           '      (effects (font (size 1.27 1.27)) (justify left bottom))\n' \
+           '    )\n' \
+           '    (property "{ff}" "{f}" (at 50 60.5 0)\n' \
+           '      (effects (font (size 1.27 1.27)) (justify left top))\n' \
+           '    )\n' \
+           '  )\n'.format(u=sheet_uuid, nf=name_field, n=name, ff=file_field, f=file_name)
+
+
+def write_schematic(path, n_symbols=1000, n_fields=8, unique_parts=None, kicad_version=7, seed=0):
+    # Writes a flat schematic with `n_symbols` resistors.
+    # `unique_parts`: number of distinct parts (value duplication), defaults to n_symbols // 10
+    rng = random.Random(seed)
+    fields = field_names(n_fields)
+    unique_parts = unique_parts or max(1, n_symbols // 10)
+    root_uuid = new_uuid(rng)
+    version = '20211123' if kicad_version == 6 else '20230121'
+    symbol_instances = []
+    with open(path, 'w', encoding='utf-8') as fo:
+        fo.write('(kicad_sch (version {v}) (generator eeschema)\n\n'.format(v=version))
+        fo.write('  (uuid {u})\n\n  (paper "A4")\n\n'.format(u=root_uuid))
+        fo.write(_LIB_SYMBOLS)
+        fo.write('\n')
+        for i in range(n_symbols):
+            ref = 'R{n}'.format(n=i + 1)
+            _uuid, text = symbol_text(ref, rng.randrange(unique_parts), fields, rng, kicad_version,
+                                      instance_paths=[('/' + root_uuid, ref)])
+            fo.write(text)
+            fo.write('\n')
+            symbol_instances.append((_uuid, ref))
+        fo.write('  (sheet_instances\n    (path "/" (page "1"))\n  )\n')
+        if kicad_version == 6:
+            fo.write('\n  (symbol_instances\n')
+            for _uuid, ref in symbol_instances:
+                fo.write('    (path "/{u}"\n      (reference "{r}") (unit 1) (value "") (footprint "")\n    )\n'
+                         .format(u=_uuid, r=ref))
+            fo.write('  )\n')
+        fo.write(')\n')
+    return path
+
+
+def write_hierarchy(directory, depth=2, fanout=3, symbols_per_sheet=100, n_fields=8, unique_parts=None,
+                    kicad_version=7, seed=0):
+    # Writes a hierarchical design: the root sheet instantiates `fanout` times the same sub-sheet file,
+    # which instantiates `fanout` times the next one, `depth` levels deep. Every sheet file holds
+    # `symbols_per_sheet` symbols, so the design has symbols_per_sheet * (1 + fanout + ... + fanout^depth)
+    # symbol instances. Returns the path of the root schematic.
+    rng = random.Random(seed)
+    fields = field_names(n_fields)
+    unique_parts = unique_parts or max(1, symbols_per_sheet // 2)
+    project = 'hierarchy'
+    root_uuid = new_uuid(rng)
+    version = '20211123' if kicad_version == 6 else '20230121'
+    file_names = ['{p}.kicad_sch'.format(p=project)] + ['level_{k}.kicad_sch'.format(k=k) for k in range(1, depth + 1)]
+    # uuids of the sheet items inside each file, and the sheet paths of each file
+    sheet_uuids = [[new_uuid(rng) for _ in range(fanout)] for _ in range(depth)]
+    sheet_paths = [['']]
+    for level in range(depth):
+        sheet_paths.append([p + '/' + u for p in sheet_paths[level] for u in sheet_uuids[level]])
+    ref_counter = 0
+    kicad6_instances = []
+    for level, file_name in enumerate(file_names):
+        lines = ['(kicad_sch (version {v}) (generator eeschema)\n\n'.format(v=version)]
+        if level == 0 or kicad_version >= 7:
+            lines.append('  (uuid {u})\n\n'.format(u=root_uuid if level == 0 else new_uuid(rng)))
+        lines.append('  (paper "A4")\n\n')
+        lines.append(_LIB_SYMBOLS)
+        for _ in range(symbols_per_sheet):
+            refs = []
+            for sheet_path in sheet_paths[level]:
+                ref_counter += 1
+                refs.append((sheet_path, 'R{n}'.format(n=ref_counter)))
+            _uuid, text = symbol_text(refs[0][1], rng.randrange(unique_parts), fields, rng, kicad_version, project,
+                                      [('/' + root_uuid + p, r) for p, r in refs])
+            lines.append(text)
+            kicad6_instances.extend(('{p}/{u}'.format(p=p, u=_uuid), r) for p, r in refs)
+        if level < depth:
+            for i, sheet_uuid in enumerate(sheet_uuids[level]):
+                lines.append(_sheet_text(sheet_uuid, 'Sheet {n}'.format(n=i), file_names[level + 1], kicad_version))
+        if level == 0:
+            lines.append('  (sheet_instances\n    (path "/" (page "1"))\n  )\n')
+        lines.append(')\n')
+        if level == 0 and kicad_version == 6:
+            root_lines = lines
+        else:
+            with open(os.path.join(directory, file_name), 'w', encoding='utf-8') as fo:
+                fo.writelines(lines)
+    if kicad_version == 6:
+        # KiCad 6 keeps the references of the whole design in the root sheet
+        root_lines.insert(-1, '\n  (symbol_instances\n')
+        for path, ref in kicad6_instances:
+            root_lines.insert(-1, '    (path "{p}"\n      (reference "{r}") (unit 1) (value "") (footprint "")\n    )\n'
+                              .format(p=path, r=ref))
+        root_lines.insert(-1, '  )\n')
+        with open(os.path.join(directory, file_names[0]), 'w', encoding='utf-8') as fo:
+            fo.writelines(root_lines)
+    return os.path.join(directory, file_names[0])
@@ -1,5 +1,12 @@
-# __init__.py --> plugin.py
+# __init__.py --> action_plugin.py --> (on Run) plugin.py
+# Outside of KiCad there is no pcbnew: the modules can still be imported, e.g. by the command line (`cli`).
 
-from .plugin import DigiKeyMyListsPlugin
-plugin = DigiKeyMyListsPlugin()
-plugin.register()
+try:
+    import pcbnew  # noqa: F401
+except ImportError:
+    pcbnew = None
+
+if pcbnew is not None:
+    from .action_plugin import DigiKeyMyListsPlugin
+    plugin = DigiKeyMyListsPlugin()
+    plugin.register()
@@ -0,0 +1,5 @@
+# python -m <package>: see `cli`
+import sys
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+import pcbnew
+
+# Registered with pcbnew when KiCad starts (see `__init__`): only what the toolbar needs.
+# The dialog and everything it uses (wx, requests, the parser...) are imported on the first `Run()`,
+# KiCad starts as fast without the plugin as with it. Keep the imports of this module to `os` and `pcbnew`,
+# see `bench/bench_import.py`.
+
+
+class DigiKeyMyListsPlugin(pcbnew.ActionPlugin):
+    def __init__(self):
+        self.name = 'Push to DigiKey myLists'
+        self.category = 'Manufacturing'
+        self.pcbnew_icon_support = hasattr(self, 'show_toolbar_button')
+        self.show_toolbar_button = True
+        self.icon_file_name = os.path.join(
+            os.path.dirname(__file__), 'toolbar_icon.png')
+        self.dark_icon_file_name = os.path.join(
+            os.path.dirname(__file__), 'toolbar_icon.png')
+        self.description = 'Push schematic components to Digi-Key myLists for easy and quick part ordering.'
+
+    def Run(self):
+        from .plugin import BOMFrame
+        BOMFrame().Show()
@@ -0,0 +1,208 @@
+import argparse
+import csv
+import json
+import os
+import pathlib
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from .cli import NoSymbolsError, load_bom
+from .utils import json_from_bom__with_pn_as_key, pcb_2_sch_path
+
+# BOMs of many KiCad projects at once, e.g. every project of a repository for a release.
+# Projects are .kicad_pcb files with a .kicad_sch of the same name (see `utils.pcb_2_sch_path`),
+# found in directory trees or listed in a manifest. Each project is parsed and grouped in a worker
+# process (parsing is CPU bound, threads would share one core). Workers only send back the BOM,
+# and at most 2 projects per worker are in flight, so memory doesn't grow with the number of projects.
+#
+# Output, in `output_dir`:
+#   <project>.json   parts of each project, as pushed to myLists (see `utils.json_from_bom__with_pn_as_key`)
+#   merged.json      parts of all projects, quantities summed by part number
+#   merged.csv       same, with the projects using each part
+#
+# Usage: python -m src.batch [--manifest FILE] [--output-dir DIR] [--workers N] [DIRECTORY_OR_PROJECT ...]
+
+IN_FLIGHT_PER_WORKER = 2
+MAX_TASKS_PER_CHILD = 50  # workers are replaced from time to time, Python 3.11+
+
+
+def discover_projects(root):
+    # --> .kicad_sch paths of the projects under `root` (a directory, a .kicad_pcb or a .kicad_sch), sorted
+    root = pathlib.Path(root)
+    if root.is_file():
+        return [pcb_2_sch_path(str(root.with_suffix('.kicad_pcb')))]
+    projects = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(_d for _d in dir_names if not _d.startswith('.'))  # .git, .history, ...
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith('.kicad_pcb'):
+                kicad_sch_path = pcb_2_sch_path(os.path.join(dir_path, file_name))
+                if kicad_sch_path.is_file():
+                    projects.append(kicad_sch_path)
+    return projects
+
+
+def read_manifest(manifest_path):
+    # one directory or project per line, relative to the manifest; empty lines and '#' comments are skipped
+    manifest_path = pathlib.Path(manifest_path)
+    projects = []
+    with open(manifest_path, encoding='utf-8') as fi:
+        for line in fi:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                projects += discover_projects(manifest_path.parent.joinpath(line))
+    return projects
+
+
+def project_name(kicad_sch_path, roots):
+    # path of the project relative to the root it was found in, without suffix: 'boards/psu/psu'
+    for root in roots:
+        try:
+            return pathlib.Path(kicad_sch_path).relative_to(pathlib.Path(root).resolve()).with_suffix('').as_posix()
+        except ValueError:
+            continue
+    return pathlib.Path(kicad_sch_path).stem
+
+
+def process_project(kicad_sch_path, pn_field=None, cache=True):
+    # runs in a worker process --> small, picklable summary of the project
+    # SAMPLE OUTPUT
+    # {'path': '/repo/psu/psu.kicad_sch', 'pn_field': 'DK_PN', 'n_parts': 42, 'parts': [...], 'error': None}
+    try:
+        model, _auto_pn_field_dict, _merged_variants = load_bom(kicad_sch_path, pn_field, cache=cache)
+    except FileNotFoundError:
+        return {'path': str(kicad_sch_path), 'error': 'schematic file (.kicad_sch) not found'}
+    except NoSymbolsError:
+        return {'path': str(kicad_sch_path), 'error': 'no symbols in the schematic or its sheets'}
+    except KeyError:
+        return {'path': str(kicad_sch_path), 'error': 'no field named {f!r}'.format(f=pn_field)}
+    except Exception as e:
+        return {'path': str(kicad_sch_path), 'error': 'error parsing schematic file: {e!r}'.format(e=e)}
+    return {
+        'path': str(kicad_sch_path),
+        'pn_field': model.pn_field,
+        'n_parts': len(model),
+        'parts': json_from_bom__with_pn_as_key(model.bom()),
+        'error': None,
+    }
+
+
+def _make_executor(max_workers):
+    try:
+        return ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=MAX_TASKS_PER_CHILD)
+    except TypeError:  # before Python 3.11
+        return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def iter_project_boms(projects, pn_field=None, max_workers=None, cache=True):
+    # yields `process_project` results as they are done (not in `projects` order)
+    max_workers = max_workers or os.cpu_count() or 1
+    pending_projects = iter(projects)
+    with _make_executor(max_workers) as executor:
+        in_flight = set()
+        while True:
+            for kicad_sch_path in pending_projects:
+                in_flight.add(executor.submit(process_project, str(kicad_sch_path), pn_field, cache))
+                if len(in_flight) >= max_workers * IN_FLIGHT_PER_WORKER:
+                    break
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+class MergedBOM:
+    # quantities of all projects, summed by part number
+    def __init__(self):
+        self.parts = {}  # part number: {'qty': int, 'projects': [project name, ...]}
+
+    def add(self, name: str, parts: list):
+        # `parts`: see `utils.json_from_bom__with_pn_as_key`
+        for _part in parts:
+            try:
+                qty = int(_part['quantities'][0]['quantity'])
+            except (ValueError, IndexError, KeyError):
+                qty = 0  # edited to a non-number, not possible without the dialog
+            entry = self.parts.get(_part['requestedPartNumber'])
+            if entry is None:
+                self.parts[_part['requestedPartNumber']] = {'qty': qty, 'projects': [name]}
+            else:
+                entry['qty'] += qty
+                entry['projects'].append(name)
+
+    def bom(self):
+        # same format as `BOMModel.bom()`, sorted by part number
+        return {_pn: {'mpn': _pn, 'qty': str(self.parts[_pn]['qty']), 'cusRef': '', 'note': ''}
+                for _pn in sorted(self.parts)}
+
+    def write_csv(self, fo):
+        writer = csv.writer(fo)
+        writer.writerow(['Part Number', 'Quantity', 'Projects'])
+        for _pn in sorted(self.parts):
+            writer.writerow([_pn, self.parts[_pn]['qty'], ','.join(sorted(set(self.parts[_pn]['projects'])))])
+
+
+def run_batch(projects, output_dir, roots=(), pn_field=None, max_workers=None, cache=True, log=None):
+    # --> (number of projects done, list of (path, error)), see the output files above
+    # `log`: log(message), progress of each project
+    output_dir = pathlib.Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    merged = MergedBOM()
+    errors = []
+    n_done = 0
+    for result in iter_project_boms(projects, pn_field, max_workers, cache):
+        n_done += 1
+        if result['error']:
+            errors.append((result['path'], result['error']))
+            if log is not None:
+                log('[{i}/{n}] {p}: {e}'.format(i=n_done, n=len(projects), p=result['path'], e=result['error']))
+            continue
+        name = project_name(result['path'], roots)
+        out_path = output_dir.joinpath(name + '.json')
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(out_path, 'w', encoding='utf-8') as fo:
+            json.dump(result['parts'], fo, indent=2, ensure_ascii=False)
+        merged.add(name, result['parts'])
+        if log is not None:
+            log('[{i}/{n}] {p}: {c} parts in {f!r}'.format(
+                i=n_done, n=len(projects), p=name, c=result['n_parts'], f=result['pn_field']))
+    with open(output_dir.joinpath('merged.json'), 'w', encoding='utf-8') as fo:
+        json.dump(json_from_bom__with_pn_as_key(merged.bom()), fo, indent=2, ensure_ascii=False)
+    with open(output_dir.joinpath('merged.csv'), 'w', encoding='utf-8', newline='') as fo:
+        merged.write_csv(fo)
+    return n_done, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.batch',
+                                     description='BOMs of many KiCad projects, and their merged BOM.')
+    parser.add_argument('paths', nargs='*', metavar='PATH', help='directory tree or project (.kicad_pcb, .kicad_sch)')
+    parser.add_argument('--manifest', help='file listing directories or projects, one per line')
+    parser.add_argument('--output-dir', default='boms', help='default: boms')
+    parser.add_argument('--pn-field', help='field with the part numbers (default: detected for each project)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: number of CPUs)')
+    parser.add_argument('--no-cache', action='store_true', help="don't use or update the parse cache")
+    args = parser.parse_args(argv)
+    if not args.paths and not args.manifest:
+        parser.error('give directories, projects or --manifest')
+
+    projects = []
+    roots = []
+    if args.manifest:
+        projects += read_manifest(args.manifest)
+        roots.append(pathlib.Path(args.manifest).parent)
+    for path in args.paths:
+        projects += discover_projects(path)
+        roots.append(path if os.path.isdir(path) else os.path.dirname(path) or '.')
+    projects = list(dict.fromkeys(projects))  # a project listed twice is processed once
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    n_done, errors = run_batch(projects, args.output_dir, roots, args.pn_field, args.workers, not args.no_cache, log)
+    log('{n} projects, {e} errors, BOMs in {d}'.format(n=n_done, e=len(errors), d=args.output_dir))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
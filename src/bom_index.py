@@ -0,0 +1,169 @@
+from collections import OrderedDict
+from itertools import chain
+from operator import itemgetter
+from .symbol_table import SymbolTable
+
+# Aggregation of the symbols of a design by part number.
+# The dialog lets the user pick any field as the part number field, and each pick groups all
+# the symbols again (see `utils.make_quantity`). A BOMIndex is built once per SymbolTable:
+# grouping by a field is one pass over its column, values of the other fields are gathered
+# column by column, and the grouped results of the last used fields are kept.
+# With a `normalizer` (see `pn_normalize`), spellings of a part number are grouped on one line,
+# under its canonical form.
+
+DEFAULT_MAX_FIELDS = 8
+DEFAULT_MAX_CELLS = 4_000_000  # values kept in all the cached results, ~8 bytes each
+
+
+def _gather(rows: list, column: list):
+    # [column[row] for row in rows], the loop runs in C
+    if len(rows) < 2:
+        return [column[_] for _ in rows]
+    return list(itemgetter(*rows)(column))
+
+
+class BOMIndex:
+    def __init__(self, table: SymbolTable, max_fields=DEFAULT_MAX_FIELDS, max_cells=DEFAULT_MAX_CELLS,
+                 normalizer=None):
+        # `normalizer`: normalizer(value) --> canonical part number, with a `merge` method,
+        #               e.g. `pn_normalize.PartNumberNormalizer`. None: part numbers are grouped as they are.
+        self.table = SymbolTable.from_symbol_dict(table)
+        self.normalizer = normalizer
+        self.max_fields = max_fields
+        self.max_cells = max_cells
+        self._cache = OrderedDict()  # field name: (result, number of values), least recently used first
+        self._cells = 0
+
+    def group_rows(self, pn_field_str: str):
+        # {part number: [row, ...]}, in order of first appearance. Symbols without a part number are left out.
+        # Part numbers are canonical with a `normalizer`.
+        groups = self._group_values(pn_field_str)
+        if self.normalizer is not None:
+            groups = self.normalizer.merge(groups)[0]
+        return groups
+
+    def merged_variants(self, pn_field_str: str):
+        # {canonical part number: {value: number of symbols}} of the part numbers written in more than one way
+        # e.g. {'296-1234-1-ND': {'296-1234-1-ND': 2, ' 296-1234-1-nd': 1}}
+        if self.normalizer is None:
+            return {}
+        return self.normalizer.merge(self._group_values(pn_field_str))[1]
+
+    def canonical_part_numbers(self, values):
+        # part numbers as they are written in symbols --> as in the results, e.g. for `make_quantity_for`
+        if self.normalizer is None:
+            return list(values)
+        part_numbers = (self.normalizer(_value) for _value in values)
+        return list(dict.fromkeys(_pn for _pn in part_numbers if _pn))
+
+    def _group_values(self, pn_field_str: str):
+        # `group_rows` by the values as they are written
+        groups = {}
+        for row, symbol_key in enumerate(self.table.column(pn_field_str)):
+            if not symbol_key:  # ignore None or '' values
+                continue
+            rows = groups.get(symbol_key)
+            if rows is None:
+                groups[symbol_key] = [row]
+            else:
+                rows.append(row)
+        return groups
+
+    def make_quantity(self, pn_field_str: str):
+        # same as `utils.make_quantity(table, pn_field_str)` without a normalizer. With one, part numbers
+        # are canonical (see `pn_normalize`) and each line counts the symbols of every spelling merged into it.
+        # The result is shared with later calls for the same field: don't modify it.
+        cached = self._cache.get(pn_field_str)
+        if cached is not None:
+            self._cache.move_to_end(pn_field_str)
+            return cached[0]
+        result = {}
+        for batch in self.iter_quantity(pn_field_str):
+            result.update(batch)
+        return result
+
+    def iter_quantity(self, pn_field_str: str, batch_size=None):
+        # `make_quantity` in batches of `batch_size` parts (all at once by default), to show them
+        # as they come. Once every batch is out, the whole result is cached.
+        cached = self._cache.get(pn_field_str)
+        if cached is not None:
+            self._cache.move_to_end(pn_field_str)
+            yield cached[0]
+            return
+        result = {}
+        cells = 0
+        for batch, batch_cells in self._iter_quantity(pn_field_str, batch_size):
+            result.update(batch)
+            cells += batch_cells
+            yield batch
+        self._cache[pn_field_str] = (result, cells)
+        self._cells += cells
+        # always keep the latest result, even when it's bigger than `max_cells` alone
+        while len(self._cache) > 1 and (len(self._cache) > self.max_fields or self._cells > self.max_cells):
+            _field, (_result, _cells) = self._cache.popitem(last=False)
+            self._cells -= _cells
+
+    def make_quantity_for(self, pn_field_str: str, part_numbers):
+        # the entries of `make_quantity(pn_field_str)` for some part numbers only, e.g. after a change
+        # of the schematic (see `sch_watch`). Part numbers without symbols are left out.
+        # `part_numbers`: canonical with a `normalizer`, see `canonical_part_numbers`
+        table = self.table
+        groups = self.group_rows(pn_field_str)
+        symbol_dict_by_pn = {}
+        for symbol_key in part_numbers:
+            rows = groups.get(symbol_key)
+            if not rows:
+                continue
+            item = {
+                'symbol_uuids': _gather(rows, table.uuids),
+                'quantity': len(rows),
+            }
+            for property_name in table.field_names(rows):
+                if property_name != pn_field_str:
+                    values = [_v for _v in _gather(rows, table.columns[property_name]) if _v is not None]
+                    item[property_name] = {'name': property_name, 'values': values}
+            symbol_dict_by_pn[symbol_key] = item
+        return symbol_dict_by_pn
+
+    def _iter_quantity(self, pn_field_str: str, batch_size):
+        # --> (batch of the result, number of values in the batch)
+        table = self.table
+        groups = self.group_rows(pn_field_str)
+        # rows sorted by part number: the values of a part are then a slice of each sorted column
+        order = list(chain.from_iterable(groups.values()))
+        sorted_columns = {}  # field name: (sorted column, True if some symbols don't have the field)
+        for property_name in table.fields:
+            if property_name != pn_field_str:
+                column = _gather(order, table.columns[property_name])
+                sorted_columns[property_name] = (column, None in column)
+        uuids = _gather(order, table.uuids)
+        symbol_dict_by_pn = {}
+        cells = 0
+        start = 0
+        for symbol_key, rows in groups.items():
+            end = start + len(rows)
+            item = {
+                'symbol_uuids': uuids[start:end],
+                'quantity': len(rows),
+            }
+            for property_name in table.field_names(rows):
+                if property_name != pn_field_str:
+                    column, missing = sorted_columns[property_name]
+                    values = column[start:end]
+                    if missing:
+                        values = [_v for _v in values if _v is not None]
+                    item[property_name] = {'name': property_name, 'values': values}
+                    cells += len(values)
+            symbol_dict_by_pn[symbol_key] = item
+            cells += len(rows)
+            start = end
+            if batch_size and len(symbol_dict_by_pn) >= batch_size:
+                yield symbol_dict_by_pn, cells
+                symbol_dict_by_pn = {}
+                cells = 0
+        if symbol_dict_by_pn or not groups:
+            yield symbol_dict_by_pn, cells
+
+    def clear(self):
+        self._cache.clear()
+        self._cells = 0
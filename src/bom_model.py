@@ -0,0 +1,185 @@
+from .utils import to_string
+
+# Rows of the BOM list in the dialog, for one part number field.
+# The list control is virtual (`wx.LC_VIRTUAL`): it asks for the text of the rows it shows,
+# and edits are written back here, so building the list doesn't depend on the number of parts.
+#
+# Columns: Row | Part Number* | Quantity* | every other field | Customer Reference | Note
+# (*: mandatory)
+#
+# An edit changes one row: the row is marked dirty, its entry in `bom()` is updated in place,
+# and the listeners (the list control, the frame) are told which cell changed.
+# `refresh()` rebuilds everything, for an explicit resynchronization only.
+
+ROW_COL = 0
+PN_COL = 1
+QTY_COL = 2
+
+
+class BOMModel:
+    def __init__(self, bom_obj_by_pn: dict, fields, pn_field: str):
+        # `bom_obj_by_pn`: see `utils.make_quantity`
+        # `fields`: field names, in column order
+        self.pn_field = pn_field
+        self.fields = [_ for _ in fields if _ != pn_field]
+        self.columns = [('Row', 75), ('Part Number*', 200), ('Quantity*', 75)] \
+            + [(_, 200) for _ in self.fields] \
+            + [('Customer Reference', 150), ('Note', 150)]
+        self.cus_ref_col = len(self.columns) - 2
+        self.note_col = len(self.columns) - 1
+        self._keys = []  # part number of each row, as grouped
+        self._items = []  # grouped symbols of each row, see `utils.make_quantity`
+        self.part_numbers = []
+        self.quantities = []
+        self.cus_refs = []
+        self.notes = []
+        self._edits = {}  # (row, col): text, for the other columns
+        self.dirty_rows = set()  # rows edited since `clear_dirty()`
+        self._listeners = []
+        self._bom = None  # see `bom()`, built on first use
+        self._bom_rows = {}  # part number: row of its entry in `_bom`
+        self.append(bom_obj_by_pn)
+
+    def append(self, bom_obj_by_pn: dict):
+        # add rows at the end, e.g. as they are grouped by a background thread
+        for symbol_pn, item in bom_obj_by_pn.items():
+            self._keys.append(symbol_pn)
+            self._items.append(item)
+            self.part_numbers.append(symbol_pn)
+            self.quantities.append(str(item['quantity']))
+            self.cus_refs.append('')
+            self.notes.append('')
+        self._bom = None
+
+    def update_parts(self, bom_obj_by_pn: dict, part_numbers):
+        # Rows of `part_numbers` (as grouped, not as edited) follow a change of the schematic, see `sch_watch`:
+        # replaced by their entry in `bom_obj_by_pn`, added at the end if new, removed if not in `bom_obj_by_pn`.
+        # What the user typed in a row (Customer Reference, Note, other cells) stays with its part number,
+        # the quantity is the new one.
+        # --> rows updated, or None if rows were added or removed (the whole list must be shown again)
+        rows_by_key = {_key: _row for _row, _key in enumerate(self._keys)}
+        updated = []
+        removed = set()
+        added = {}
+        for symbol_pn in part_numbers:
+            row = rows_by_key.get(symbol_pn)
+            item = bom_obj_by_pn.get(symbol_pn)
+            if row is None:
+                if item is not None:
+                    added[symbol_pn] = item
+            elif item is None:
+                removed.add(row)
+            else:
+                self._items[row] = item
+                self.quantities[row] = str(item['quantity'])
+                updated.append(row)
+        self._bom = None
+        if removed:
+            self._remove_rows(removed)
+        if added:
+            self.append(added)
+        return None if removed or added else updated
+
+    def _remove_rows(self, rows: set):
+        kept = [_row for _row in range(len(self._keys)) if _row not in rows]
+        new_rows = {_old: _new for _new, _old in enumerate(kept)}
+        for name in ('_keys', '_items', 'part_numbers', 'quantities', 'cus_refs', 'notes'):
+            values = getattr(self, name)
+            setattr(self, name, [values[_row] for _row in kept])
+        self._edits = {(new_rows[_row], _col): _text for (_row, _col), _text in self._edits.items() if _row in new_rows}
+        self.dirty_rows = {new_rows[_row] for _row in self.dirty_rows if _row in new_rows}
+
+    def carry_over(self, other):
+        # Customer References and Notes typed in `other` (a model of the same part number field),
+        # for the rows of the same part numbers here
+        rows_by_key = {_key: _row for _row, _key in enumerate(self._keys)}
+        for other_row, symbol_pn in enumerate(other._keys):
+            row = rows_by_key.get(symbol_pn)
+            if row is not None:
+                self.part_numbers[row] = other.part_numbers[other_row]
+                self.cus_refs[row] = other.cus_refs[other_row]
+                self.notes[row] = other.notes[other_row]
+        self._bom = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_text(self, row: int, col: int):
+        if col == PN_COL:
+            return self.part_numbers[row]
+        if col == QTY_COL:
+            return self.quantities[row]
+        if col == self.cus_ref_col:
+            return self.cus_refs[row]
+        if col == self.note_col:
+            return self.notes[row]
+        text = self._edits.get((row, col))
+        if text is not None:
+            return text
+        if col == ROW_COL:
+            return str(row + 1)  # numbering the rows for better navigation
+        p_obj = self._items[row].get(self.fields[col - 3])
+        # e.g.: 'DKPN': {'name': 'DKPN', 'values': ['1234-ND', '5678-ND']}
+        return to_string(p_obj['values']) if p_obj else ''
+
+    def set_text(self, row: int, col: int, text: str):
+        if text == self.get_text(row, col):
+            return
+        if col == PN_COL:
+            self.part_numbers[row] = text
+            self._bom = None  # entries are keyed by part number: rebuilt on next use
+        elif col == QTY_COL:
+            self.quantities[row] = text
+        elif col == self.cus_ref_col:
+            self.cus_refs[row] = text
+        elif col == self.note_col:
+            self.notes[row] = text
+        else:
+            self._edits[(row, col)] = text
+        if self._bom is not None and col in (QTY_COL, self.cus_ref_col, self.note_col):
+            self._update_bom_entry(row)
+        self.dirty_rows.add(row)
+        for listener in list(self._listeners):
+            listener(self, row, col)
+
+    def add_listener(self, listener):
+        # listener(model, row, col), called after each edit
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def clear_dirty(self):
+        self.dirty_rows.clear()
+
+    def _bom_entry(self, row: int):
+        return {
+            'mpn': self.part_numbers[row],
+            'qty': self.quantities[row],
+            'cusRef': self.cus_refs[row],
+            'note': self.notes[row],
+        }
+
+    def _update_bom_entry(self, row: int):
+        mpn = self.part_numbers[row]
+        if self._bom_rows.get(mpn) == row:  # else another row with the same part number wins
+            self._bom[mpn].update(self._bom_entry(row))
+
+    def bom(self):
+        # {part number: {'mpn', 'qty', 'cusRef', 'note'}}, what is pushed to myLists.
+        # The same dict is kept up to date by edits, until a part number is edited.
+        if self._bom is None:
+            self.refresh()
+        return self._bom
+
+    def refresh(self):
+        # rebuild `bom()` from every row
+        bom = {}
+        bom_rows = {}
+        for row, mpn in enumerate(self.part_numbers):
+            bom[mpn] = self._bom_entry(row)
+            bom_rows[mpn] = row  # the last row with a part number wins, as when it was read from the list
+        self._bom = bom
+        self._bom_rows = bom_rows
+        return bom
@@ -0,0 +1,171 @@
+import argparse
+import csv
+import json
+import pathlib
+import sys
+from .bom_index import BOMIndex
+from .bom_model import BOMModel
+from .pn_normalize import make_normalizer
+from .push_client import PushError, push_bom
+from .sch_cache import SheetCache
+from .sch_hierarchy import get_hierarchy_symbol_table
+from .utils import auto_select_part_number_field, get_sch_file_name, get_symbol_table, \
+    json_from_bom__with_pn_as_key, parse_fields, pcb_2_sch_path
+
+# Command line version of the dialog, without wx or pcbnew: the BOM of a schematic, as the dialog
+# would push it (myLists JSON), as CSV (the columns of the dialog), or pushed to myLists.
+#
+# Usage:
+#     python -m src board.kicad_sch                          # myLists JSON on stdout
+#     python -m src --format csv -o bom.csv board.kicad_pcb  # the .kicad_sch next to the PCB
+#     python -m src --output-dir boms/ */*.kicad_sch         # one boms/<name>.json per schematic
+#     python -m src --push --list-name 'Rev B' board.kicad_sch
+#     python -m src --push --split 500 board.kicad_sch       # lists of 500 parts, "board (1/3)", ...
+#
+# Exit status: 0, 1 if any schematic failed (the others are still processed), 2 for usage errors.
+
+FORMATS = ('json', 'csv')
+
+
+class NoSymbolsError(Exception):
+    # the schematic and its sheets have no symbols: no part number field, no BOM
+    pass
+
+
+def schematic_path(path: str):
+    # a .kicad_pcb (or any project file) stands for the .kicad_sch of the same name, as in the plugin
+    p = pathlib.Path(path)
+    if p.suffix.lower() == '.kicad_sch':
+        return p.resolve()
+    return pcb_2_sch_path(str(p.with_suffix('.kicad_pcb')))
+
+
+def load_bom(kicad_sch_path, pn_field=None, hierarchy=True, cache=True, normalize=True, fold_packaging=False):
+    # --> (BOMModel, auto-selected part number field or None, merged variants)
+    # `normalize`: spellings of a part number are grouped on one line, see `pn_normalize`
+    # `fold_packaging`: Tape & Reel and Digi-Reel part numbers are counted as Cut Tape
+    # merged variants: see `BOMIndex.merged_variants`
+    # raises NoSymbolsError if there is nothing to group, as the dialog reports 'no_symbols'
+    if hierarchy:
+        symbol_table = get_hierarchy_symbol_table(kicad_sch_path, cache=SheetCache() if cache else None)
+    else:
+        symbol_table = get_symbol_table(kicad_sch_path)
+    if not len(symbol_table):
+        raise NoSymbolsError(kicad_sch_path)
+    fields = parse_fields(symbol_table)
+    auto_pn_field_dict = None
+    if pn_field is None:
+        auto_pn_field_dict = auto_select_part_number_field(symbol_table, sampled=True)
+        pn_field = auto_pn_field_dict['name']
+    elif pn_field not in fields:
+        raise KeyError(pn_field)
+    bom_index = BOMIndex(symbol_table, normalizer=make_normalizer(normalize, fold_packaging))
+    bom_obj_by_pn = bom_index.make_quantity(pn_field)
+    return BOMModel(bom_obj_by_pn, fields, pn_field), auto_pn_field_dict, bom_index.merged_variants(pn_field)
+
+
+def write_json(model, fo):
+    json.dump(json_from_bom__with_pn_as_key(model.bom()), fo, indent=2, ensure_ascii=False)
+    fo.write('\n')
+
+
+def write_csv(model, fo):
+    # same columns and cells as the list in the dialog
+    writer = csv.writer(fo)
+    writer.writerow([_title for _title, _width in model.columns])
+    for row in range(len(model)):
+        writer.writerow([model.get_text(row, _col) for _col in range(len(model.columns))])
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m src', description='Collect the parts of KiCad schematics, as the "Push to Digi-Key myLists" '
+                                          'plugin does, without KiCad.')
+    parser.add_argument('paths', nargs='+', metavar='SCHEMATIC',
+                        help='.kicad_sch file, or .kicad_pcb file next to its .kicad_sch')
+    parser.add_argument('--pn-field', help='field with the part numbers (default: detected, as "Auto" in the dialog)')
+    parser.add_argument('--format', choices=FORMATS, default='json', help='output format (default: json)')
+    parser.add_argument('-o', '--output', help='output file, "-" for stdout (default), one schematic only')
+    parser.add_argument('--output-dir', help='write <schematic name>.<format> files in this directory')
+    parser.add_argument('--push', action='store_true', help='push the parts to Digi-Key myLists, print the list URLs')
+    parser.add_argument('--list-name', help='name of the pushed list (default: schematic name)')
+    parser.add_argument('--gzip', action='store_true',
+                        help='gzip the pushed parts, for endpoints that take compressed bodies (default: plain JSON)')
+    parser.add_argument('--split', type=int, metavar='N',
+                        help='push large BOMs as several lists of N parts, "name (1/3)", ... (default: one list)')
+    parser.add_argument('--no-hierarchy', action='store_true', help='only the given sheet, not its sub-sheets')
+    parser.add_argument('--no-cache', action='store_true', help="don't use or update the parse cache")
+    parser.add_argument('--no-normalize', action='store_true',
+                        help='group part numbers as they are written (default: ignore case, spaces, Unicode forms)')
+    parser.add_argument('--fold-packaging', action='store_true',
+                        help='count Tape & Reel and Digi-Reel part numbers as Cut Tape (TR-ND, DKR-ND --> CT-ND)')
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    if args.output and args.output != '-' and len(args.paths) > 1:
+        parser.error('--output takes one schematic, use --output-dir for more')
+    if args.output and args.output_dir:
+        parser.error('--output and --output-dir are exclusive')
+    if args.split is not None and args.split < 1:
+        parser.error('--split takes a number of parts, 1 or more')
+    if args.output_dir:
+        pathlib.Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    write = write_csv if args.format == 'csv' else write_json
+
+    status = 0
+    for path in args.paths:
+        kicad_sch_path = schematic_path(path)
+        try:
+            model, auto_pn_field_dict, merged_variants = load_bom(
+                kicad_sch_path, args.pn_field, not args.no_hierarchy, not args.no_cache, not args.no_normalize,
+                args.fold_packaging)
+        except FileNotFoundError:
+            print('{p}: schematic file (.kicad_sch) not found'.format(p=kicad_sch_path), file=sys.stderr)
+            status = 1
+            continue
+        except NoSymbolsError:
+            print('{p}: no symbols in the schematic or its sheets'.format(p=kicad_sch_path), file=sys.stderr)
+            status = 1
+            continue
+        except KeyError:
+            print('{p}: no field named {f!r}'.format(p=kicad_sch_path, f=args.pn_field), file=sys.stderr)
+            status = 1
+            continue
+        except Exception as e:
+            print('{p}: error parsing schematic file: {e!r}'.format(p=kicad_sch_path, e=e), file=sys.stderr)
+            status = 1
+            continue
+        if auto_pn_field_dict is not None:
+            print('{p}: part numbers in {f!r} ({n} parts)'.format(
+                p=kicad_sch_path, f=model.pn_field, n=len(model)), file=sys.stderr)
+        for part_number, variants in merged_variants.items():
+            print('{p}: {pn} merged from {v}'.format(
+                p=kicad_sch_path, pn=part_number,
+                v=', '.join('{v!r} ({n})'.format(v=_v, n=_n) for _v, _n in variants.items())), file=sys.stderr)
+
+        if args.push:
+            list_name = args.list_name or get_sch_file_name(str(kicad_sch_path))
+            try:
+                for short_url in push_bom(json_from_bom__with_pn_as_key(model.bom()), list_name,
+                                          chunk_size=args.split, compress=args.gzip):
+                    print(short_url)
+            except PushError as e:
+                print('{p}: push failed: {s} {d}'.format(p=kicad_sch_path, s=e.state, d=e.data), file=sys.stderr)
+                status = 1
+            if not args.output and not args.output_dir:
+                continue
+
+        if args.output_dir:
+            out_path = pathlib.Path(args.output_dir).joinpath(
+                '{n}.{f}'.format(n=kicad_sch_path.stem, f=args.format))
+        else:
+            out_path = args.output if args.output and args.output != '-' else None
+        if out_path is None:
+            write(model, sys.stdout)
+        else:
+            with open(out_path, 'w', encoding='utf-8', newline='' if args.format == 'csv' else None) as fo:
+                write(model, fo)
+    return status
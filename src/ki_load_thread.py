@@ -0,0 +1,127 @@
+import wx
+from threading import Event, Thread
+from .ki_result_event import ResultEvent
+from .bom_index import BOMIndex
+from .profiling import NULL_PROFILER
+from .sch_cache import SheetCache
+from .sch_watch import SchematicWatcher
+from .utils import auto_select_part_number_field
+
+# Reads the schematic for the BOM dialog, so that the dialog shows before the design is parsed.
+# Same pattern as `PushThread`: the UI is only updated from `BOMFrame.message_handler`,
+# with the states below.
+#
+# 'LOAD_PROGRESS': {'text', 'gauge_int'}
+# 'LOAD_SYMBOLS': {'symbol_dict', 'bom_index', 'auto_pn_field_dict', 'watcher'}, parsing and scoring are done
+#                 `watcher`: a `sch_watch.SchematicWatcher` of the sheets read, to follow their changes
+# 'LOAD_ROWS': {'pn_field', 'rows', 'gauge_int'}, next `rows` of `BOMIndex.make_quantity(pn_field)`
+# 'LOAD_DONE'
+# 'LOAD_ERROR': {'error': 'file_not_found' | 'parse' | 'no_symbols'}
+#
+# Nothing is posted once `cancel()` is called.
+
+LOAD_BATCH_SIZE = 500  # parts per 'LOAD_ROWS'
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class LoadThread(Thread):
+    def __init__(self, wx_object, kicad_sch_path, batch_size=LOAD_BATCH_SIZE, profiler=NULL_PROFILER,
+                 normalizer=None):
+        # `profiler`: see `profiling.get_profiler`
+        # `normalizer`: see `pn_normalize.normalizer_from_environ`, None: part numbers are grouped as written
+        Thread.__init__(self, daemon=True)
+        self.wx_object = wx_object
+        self.kicad_sch_path = kicad_sch_path
+        self.batch_size = batch_size
+        self.profiler = profiler
+        self.normalizer = normalizer
+        self._cancelled = Event()
+        self.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        try:
+            self._load()
+        except LoadCancelled:
+            pass
+        except FileNotFoundError:
+            self._post_error('file_not_found')
+        except Exception:
+            self._post_error('parse')
+
+    def _load(self):
+        cache = SheetCache()
+        watcher = SchematicWatcher(self.kicad_sch_path, parse=cache.parse_sheet)
+        parsed = []
+        profiler = self.profiler
+
+        def parse(path, project=None):
+            if self.cancelled:
+                raise LoadCancelled()
+            # read and parsed in one pass, or read from the parse cache
+            with profiler.phase('parse_sheet', 'load', path=str(path)):
+                sheet = watcher.parse_sheet(path, project)
+            parsed.append(path)
+            # the number of sheets is only known at the end, the gauge slows down as it goes
+            self._post_event({'state': 'LOAD_PROGRESS', 'text': 'Reading sheets ({n})...'.format(n=len(parsed)),
+                              'gauge_int': 40 - 30 // len(parsed)})
+            return sheet
+
+        self._post_event({'state': 'LOAD_PROGRESS', 'text': 'Reading schematic...', 'gauge_int': 5})
+        # symbols of every sheet instance, so that parts in sub-sheets are counted too
+        # unchanged sheets come from the parse cache.
+        with profiler.phase('read_schematic', 'load', path=str(self.kicad_sch_path)) as phase:
+            watcher.load(parse=parse)
+            phase.set(n_sheets=len(parsed))
+        with profiler.phase('symbol_table', 'load') as phase:
+            symbol_dict = watcher.symbol_table()
+            phase.set(n_symbols=len(symbol_dict))
+        if not len(symbol_dict):  # nothing to score or group
+            self._post_error('no_symbols')
+            return
+
+        self._post_event({'state': 'LOAD_PROGRESS', 'text': 'Finding part numbers...', 'gauge_int': 50})
+        # on large designs, a sample of the symbols is enough to find the part number column
+        with profiler.phase('field_scoring', 'load') as phase:
+            auto_pn_field_dict = auto_select_part_number_field(symbol_dict, sampled=True)
+            phase.set(pn_field=auto_pn_field_dict['name'], values_examined=auto_pn_field_dict['values_examined'])
+        # spellings of a part number (case, spaces...) are counted on one line, unless turned off
+        bom_index = BOMIndex(symbol_dict, normalizer=self.normalizer)
+        self._post_event({'state': 'LOAD_SYMBOLS', 'symbol_dict': symbol_dict, 'bom_index': bom_index,
+                          'auto_pn_field_dict': auto_pn_field_dict, 'watcher': watcher})
+
+        pn_field = auto_pn_field_dict['name']
+        n_symbols = max(1, len(symbol_dict))
+        n_grouped = 0
+        # one phase per batch of rows, the UI shows each batch while the next one is grouped
+        phase = profiler.phase('aggregation', 'load', pn_field=pn_field)
+        for rows in bom_index.iter_quantity(pn_field, self.batch_size):
+            phase.set(n_parts=len(rows))
+            phase.end()
+            n_grouped += sum(_item['quantity'] for _item in rows.values())
+            self._post_event({'state': 'LOAD_ROWS', 'pn_field': pn_field, 'rows': rows,
+                              'gauge_int': 60 + 40 * n_grouped // n_symbols})
+            phase = profiler.phase('aggregation', 'load', pn_field=pn_field)
+        phase.end()
+        self._post_event({'state': 'LOAD_DONE'})
+
+    def _post_error(self, error):
+        # the dialog may be closing already: an error after `cancel()` isn't posted either
+        try:
+            self._post_event({'state': 'LOAD_ERROR', 'error': error})
+        except LoadCancelled:
+            pass
+
+    def _post_event(self, event_data):
+        if self.cancelled:
+            raise LoadCancelled()
+        wx.PostEvent(self.wx_object, ResultEvent(event_data))
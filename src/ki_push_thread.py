@@ -1,71 +1,132 @@
-import json
-import re
-import requests
-import time
+import sqlite3
 import wx
 from threading import Thread
 from .ki_result_event import ResultEvent
+from .profiling import NULL_PROFILER
+from .push_client import API_URL, push_bom, PhaseTimer, PushError, PushMetrics
 
 
 class PushThread(Thread):
-    def __init__(self, wx_object, json_data, list_name):
+    def __init__(self, wx_object, json_data, list_name, outbox=None, profiler=NULL_PROFILER, chunk_size=None):
+        # `outbox`: a `push_outbox.PushOutbox`, the push is stored there first and kept if it fails
+        # `profiler`: see `profiling.get_profiler`
+        # `chunk_size`: see `push_client.push_bom`, None: the BOM is pushed as one list
         Thread.__init__(self)
         self.wx_object = wx_object
         self.json_data = json_data
         self.list_name = list_name
+        self.outbox = outbox
+        self.profiler = profiler
+        self.chunk_size = chunk_size
+        self._requests = {}  # chunk index: its 'http_round_trip' phase, see `_on_push_event`
         self.start()
 
     def run(self):
-        base_api_url = 'https://www.digikey.com/mylists/api/thirdparty'
-        json_data = self.json_data
-
-        # This below variable helps myLists team keep track of projects that are using myLists API.
-        # Feel free to change it to your project name.
-        tags = 'KiCad'
-
-        params = {
-            'listName': self.list_name,
-            'tags': tags
-        }
-
+        # progress follows the push as it happens: no fixed delays here,
+        # the frame keeps each state on screen long enough (see `BOMFrame.show_push_progress`)
+        timer = PhaseTimer(self.profiler)
+        timer.start('initialize')
         self._post_event({'state': 'Initializing...', 'gauge_int': 10})
-        time.sleep(0.5)
-
-        self._post_event({'state': 'Uploading your BOM...', 'gauge_int': 40})
+        if self.outbox is not None:
+            timer.start('outbox')
+        entry, own = self._add_to_outbox()
+        if not own:
+            # the same BOM is being sent in the background
+            timer.stop()
+            self._post_event({'state': 'PUSH_QUEUED'})
+            return
 
-        r = None
+        # with a `chunk_size`, BOMs are sent in chunks, the gauge moves as they are done
+        # transient errors are retried, see `push_client`
+        metrics = PushMetrics()
+        timer.start('upload')
+        push_kwargs = {'on_chunk_done': self._on_chunk_done, 'metrics': metrics, 'on_event': self._on_push_event}
         try:
-            r = requests.post(base_api_url, json=json_data, params=params, verify=True, timeout=10)
-        except requests.exceptions.RequestException:
-            self._post_event({'state': 'ERR_REQUESTS_EXCEPTION', 'api_url': base_api_url})
+            if entry is None:
+                short_urls = push_bom(self.json_data, self.list_name, chunk_size=self.chunk_size, **push_kwargs)
+            else:
+                short_urls = self.outbox.send(entry['id'], **push_kwargs)
+        except PushError as e:
+            self._end_requests(error='no response')
+            timer.stop()
+            self._log_timings('Push failed', timer, metrics)
+            if entry is not None and e.transient:
+                self._post_event(dict(e.data, state='PUSH_QUEUED'))  # sent later by the outbox drainer
+            else:
+                self._post_event(dict(e.data, state=e.state))
             return
-        except Exception:
-            self._post_event({'state': 'ERR_SENDING_REQUEST', 'api_url': base_api_url})
+        except sqlite3.Error as e:
+            print('Outbox error: {e}'.format(e=e))
+            self._post_event({'state': 'ERR_SENDING_REQUEST', 'api_url': API_URL})
             return
 
-        self._post_event({'state': 'Preparing the webpage...', 'gauge_int': 70})
-        time.sleep(0.5)
-
-        returned_short_url = ''
-        try:
-            returned_short_url = json.loads(r.text)
-            short_url_regex = r'^http.+digikey\.com/short/[0-9a-z]{7}'
-            if not re.match(short_url_regex, returned_short_url):
-                self._post_event({'state': 'SHORT_URL_NOT_RETURNED', 'r_text': returned_short_url})
-                return
-        except json.decoder.JSONDecodeError:
-            self._post_event({'state': 'SHORT_URL_NOT_RETURNED', 'r_text': returned_short_url})
+        # every list is opened, the URLs of those that couldn't be are all given to the user
+        timer.start('launch_browser')
+        not_launched = []
+        for returned_short_url in short_urls:
+            try:
+                if not wx.LaunchDefaultBrowser(returned_short_url):
+                    not_launched.append(returned_short_url)
+            except:
+                not_launched.append(returned_short_url)
+        timer.stop()
+        if not_launched:
+            self._log_timings('Push done, browser not launched', timer, metrics)
+            self._post_event({'state': 'CANNOT_LAUNCH_DEFAULT_BROWSER', 'urls': not_launched})
             return
-
+        self._log_timings('Push done', timer, metrics)
         self._post_event({'state': 'Done', 'gauge_int': 100})
-        time.sleep(0.5)
+        self._post_event({'state': 'Finished'})  # keyword: "Finished", to close the wxForm.
 
+    def _add_to_outbox(self):
+        # --> (outbox entry of this push, claimed by this thread, None without outbox;
+        #      True if this thread sends the push, False if the same push is being sent in the background)
+        if self.outbox is None:
+            return None, True
         try:
-            wx.LaunchDefaultBrowser(returned_short_url)
-        except:
-            self._post_event({'state': 'CANNOT_LAUNCH_DEFAULT_BROWSER', 'url': returned_short_url})
-            return
-        self._post_event({'state': 'Finished'})  # keyword: "Finished", to close the wxForm.
+            entry, _added = self.outbox.add(self.json_data, self.list_name, chunk_size=self.chunk_size, claim=True)
+            return entry, entry is not None
+        except sqlite3.Error as e:
+            print('Push not stored in the outbox: {e}'.format(e=e))
+            return None, True
+
+    def _on_push_event(self, name, chunk_idx, n_chunks):
+        # see `push_client.push_chunk`, one chunk: each step of the request, more chunks: see `_on_chunk_done`
+        if name == 'request_sent':
+            self._end_requests(chunk_idx, error='no response')  # sent again after a connection error
+            self._requests[chunk_idx] = self.profiler.phase('http_round_trip', 'push', chunk=chunk_idx,
+                                                            n_chunks=n_chunks)
+        elif name == 'response_received':
+            self._end_requests(chunk_idx)
+        if n_chunks > 1:
+            if name == 'request_sent' and chunk_idx == 0:
+                self._post_event({'state': 'Uploading your BOM (0/{n})...'.format(n=n_chunks), 'gauge_int': 20})
+        elif name == 'request_sent':
+            self._post_event({'state': 'Uploading your BOM...', 'gauge_int': 20})
+        elif name == 'response_received':
+            self._post_event({'state': 'Preparing the webpage...', 'gauge_int': 70})
+        elif name == 'url_validated':
+            self._post_event({'state': 'Opening the list...', 'gauge_int': 90})
+
+    def _end_requests(self, chunk_idx=None, **args):
+        # ends the 'http_round_trip' phase of a chunk, or of every chunk
+        for _idx in list(self._requests) if chunk_idx is None else [chunk_idx]:
+            phase = self._requests.pop(_idx, None)
+            if phase is not None:
+                phase.set(**args)
+                phase.end()
+
+    def _on_chunk_done(self, n_done, n_chunks):
+        if n_chunks > 1:
+            state = 'Uploading your BOM ({d}/{n})...'.format(d=n_done, n=n_chunks)
+            self._post_event({'state': state, 'gauge_int': 20 + 70 * n_done // n_chunks})
+
+    @staticmethod
+    def _log_timings(title, timer, metrics):
+        # SAMPLE OUTPUT
+        # Push done: initialize 0.000 s, outbox 0.004 s, upload 0.812 s, launch_browser 0.054 s; {...}
+        timings = ', '.join('{p} {t:.3f} s'.format(p=_phase, t=_t) for _phase, _t in timer.timings.items())
+        print('{title}: {timings}; {m}'.format(title=title, timings=timings, m=metrics.summary()))
 
     def _post_event(self, event_data):
         wx.PostEvent(self.wx_object, ResultEvent(event_data))
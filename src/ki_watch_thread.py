@@ -0,0 +1,38 @@
+import wx
+from threading import Event, Thread
+from .ki_result_event import ResultEvent
+from .sch_watch import POLL_INTERVAL
+
+# Polls the sheets of the design while "watch" is on in the dialog, see `sch_watch.SchematicWatcher`.
+# Same pattern as `LoadThread`: the change is applied by `BOMFrame.message_handler`, with the state below.
+#
+# 'WATCH_CHANGE': {'change'}, see `SchematicWatcher.poll`
+#
+# The watcher doesn't poll once `stop()` is called. A change already polled is still posted:
+# each change follows the previous one, the dialog must see them all.
+
+
+class WatchThread(Thread):
+    def __init__(self, wx_object, watcher, interval=POLL_INTERVAL):
+        Thread.__init__(self, daemon=True)
+        self.wx_object = wx_object
+        self.watcher = watcher
+        self.interval = interval
+        self._stopped = Event()
+        self.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.watcher.poll(on_change=self._post_change)
+            except Exception as e:  # the dialog keeps the last good state
+                print('Schematic not updated: {e!r}'.format(e=e))
+
+    def _post_change(self, change):
+        try:
+            wx.PostEvent(self.wx_object, ResultEvent({'state': 'WATCH_CHANGE', 'change': change}))
+        except RuntimeError:  # the dialog is closed
+            self.stop()
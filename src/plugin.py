@@ -9,28 +9,63 @@ except:
 
 
 import os
+import sqlite3
 import pcbnew
 import wx
 import wx.lib.mixins.listctrl as listmix
 from .ki_result_event import EVT_RESULT
 from .ki_push_thread import PushThread
-from .utils import get_symbol_dict, auto_select_part_number_field, make_quantity, parse_fields, to_string, \
+from .ki_load_thread import LoadThread
+from .ki_watch_thread import WatchThread
+from .pn_normalize import normalizer_from_environ
+from .profiling import get_profiler
+from .push_outbox import PushOutbox, OutboxDrainer
+from .bom_model import BOMModel
+from .sch_watch import affected_part_numbers, apply_change
+from .utils import make_quantity, parse_fields, \
     score_fields_as_part_number, pcb_2_sch_path, get_sch_file_name, json_from_bom__with_pn_as_key
 
 
 class EditableListCtrl(wx.ListCtrl, listmix.TextEditMixin):
-    """ TextEditMixin allows any column to be edited. """
+    """ TextEditMixin allows any column to be edited.
+    With `wx.LC_VIRTUAL`, rows are rendered from a `BOMModel`, only when they are shown. """
     def __init__(self, parent, _id=wx.ID_ANY, pos=wx.DefaultPosition,
                  size=wx.DefaultSize, style=0):
         # use `_id` to avoid built-in `id`
         wx.ListCtrl.__init__(self, parent, _id, pos, size, style)
         listmix.TextEditMixin.__init__(self)
+        self.model = None
+
+    def set_model(self, model):
+        if self.model is not None:
+            self.model.remove_listener(self.on_model_change)
+        self.model = model
+        model.add_listener(self.on_model_change)
+        self.ClearAll()
+        for col_idx, (title, width) in enumerate(model.columns):
+            self.InsertColumn(col_idx, title, wx.LIST_FORMAT_LEFT, width)
+        self.SetItemCount(len(model))
+        self.Refresh()
+
+    def OnGetItemText(self, item, col):
+        return self.model.get_text(item, col) if self.model is not None else ''
+
+    def SetVirtualData(self, row, col, text):
+        # called by TextEditMixin when an edit is done, the only path of edits to the model
+        self.model.set_text(row, col, text)
+
+    def on_model_change(self, model, row, col):
+        self.RefreshItem(row)
 
 
 # no code outside of class, or the plugin will not show
 
 
 class BOMFrame(wx.Frame):
+    # pushes that failed are stored in the outbox, and sent by one drainer thread for the whole KiCad session
+    outbox = None
+    outbox_drainer = None
+
     def __init__(self, parent=None, title='Save parts to Digi-Key myLists'):
         super(BOMFrame, self).__init__(parent, title=title, size=(1000, 600))
 
@@ -40,7 +75,7 @@ class BOMFrame(wx.Frame):
         # data
         self.bom = {}
         self.bom_by_pn_field = {}
-        self.max_list_length = 1_000_000
+        self.bom_models = {}  # part number field: BOMModel, rows of the list with the user's edits
 
         board = pcbnew.GetBoard()
         pcb_path = board.GetFileName()
@@ -48,29 +83,21 @@ class BOMFrame(wx.Frame):
         self.list_name = get_sch_file_name(self.kicad_sch_path)
 
         self.wx_md = None
-
-        try:
-            self.symbol_dict = get_symbol_dict(self.kicad_sch_path)
-        except FileNotFoundError:
-            error_caption = 'Schematic file (.kicad_sch) not found'
-            error_message = \
-                'The "Push to Digi-Key myLists" plugin requires KiCad schematic file (.kicad_sch).\n\n' \
-                'If you have an old schematic file (.sch), save it with the Schematic Editor. ' \
-                'This will create the equivalent KiCad schematic file (.kicad_sch).\n\n' \
-                'The schematic file (.kicad_sch) and the PCB file (.kicad_pcb) must have the same name.'.format()
-            self.show_error_message_then_exit(error_message, error_caption)
-        except:
-            error_caption = 'Error parsing schematic file'
-            error_message = \
-                'There was an error parsing \n{path}.\n\n' \
-                'If you have an old schematic file (.sch), save it with the Schematic Editor. ' \
-                'This will create the equivalent KiCad schematic file (.kicad_sch).\n\n' \
-                'The schematic file (.kicad_sch) and the PCB file (.kicad_pcb) must have the same name.' \
-                .format(path=self.kicad_sch_path)
-            self.show_error_message_then_exit(error_message, error_caption)
-
-        self.auto_pn_field_dict = auto_select_part_number_field(self.symbol_dict)
-        self.current_pn_field_str = self.auto_pn_field_dict['name']
+        # opt-in phase timings, written when the dialog closes (see `profiling`)
+        self.profiler = get_profiler()
+        # each progress state of a push stays at least this long on screen, 0: shown as they come
+        self.progress_min_display_ms = 300
+        self._progress_queue = []
+        self._progress_timer = None
+
+        # filled by the load thread, see 'LOAD_SYMBOLS' in `message_handler`
+        self.symbol_dict = {}
+        self.bom_index = None  # grouping by part number, for every field the user picks
+        self.auto_pn_field_dict = None
+        self.current_pn_field_str = None
+        # "Update when the schematic is saved": sheets are polled, see `on_schematic_change`
+        self.watcher = None
+        self.watch_thread = None
 
         # layout
         self.panel = wx.Panel(self)
@@ -85,39 +112,49 @@ class BOMFrame(wx.Frame):
         self.wx_pn_field_dropdown = None
         self.wx_list_name_label = None
         self.wx_list_name_input = None
+        self.wx_watch_checkbox = None
         self.wx_progress_gauge = None
         self.wx_progress_text = None
         self.wx_push_btn = None
+        self.wx_cancel_btn = None
         self.wx_dummy_text_1 = None
         self.wx_tos_text = None
-        self.wx_bom_lc = EditableListCtrl(self.panel, size=(970, 480), style=wx.LC_REPORT | wx.LC_HRULES)
+        self.wx_bom_lc = EditableListCtrl(self.panel, size=(970, 480), style=wx.LC_REPORT | wx.LC_HRULES | wx.LC_VIRTUAL)
         self.InitUI()
         self.Centre()
         self.Show()
 
+        self.start_outbox_drainer()
+
+        # the schematic is read in the background, rows are added to the list as they are grouped
+        self.load_thread = LoadThread(self, self.kicad_sch_path, profiler=self.profiler,
+                                      normalizer=normalizer_from_environ())
+
     def InitUI(self):
-        fields = parse_fields(self.symbol_dict)
-        # place 'auto' option as the first item
-        auto_item = 'Auto ({fn})'.format(fn=self.auto_pn_field_dict['name'])
-        field_list_cb = [auto_item]
-        for fname in fields:
-            field_list_cb.append(fname)
+        # the fields are only known once the schematic is read, see `on_symbols_loaded`
+        field_list_cb = ['Auto (...)']
 
         self.wx_pn_field_question = wx.StaticText(self.panel, label='In which column are part numbers listed?')
         self.wx_pn_field_dropdown = wx.ComboBox(self.panel, choices=field_list_cb, size=(250, 28), style=wx.CB_READONLY)
         self.wx_pn_field_dropdown.SetValue(field_list_cb[0])
         self.wx_pn_field_dropdown.Bind(wx.EVT_COMBOBOX, self.on_pn_field_select)
-        self.update_listctrl_with_qty(self.symbol_dict, self.auto_pn_field_dict['name'])
-        self.update_bom_from_listctrl()
-        self.update_bom_by_pn_field(self.current_pn_field_str)
+        self.wx_pn_field_dropdown.Disable()
 
         self.wx_list_name_label = wx.StaticText(self.panel, label='List name')
         self.wx_list_name_input = wx.TextCtrl(self.panel, value=self.list_name)
         self.wx_list_name_input.Bind(wx.EVT_TEXT, self.on_list_name_change)
 
+        self.wx_watch_checkbox = wx.CheckBox(self.panel, label='Update the list when the schematic is saved')
+        self.wx_watch_checkbox.Bind(wx.EVT_CHECKBOX, self.on_watch_toggle)
+        self.wx_watch_checkbox.Disable()
+
         self.wx_push_btn = wx.Button(self.panel, label='Create DigiKey List', size=(200, 40))
         # self.wx_push_btn.Bind(wx.EVT_BUTTON, self.on_push_button_click)
         self.wx_push_btn.Bind(wx.EVT_BUTTON, self.post_bom_data)
+        self.wx_push_btn.Disable()
+
+        self.wx_cancel_btn = wx.Button(self.panel, label='Cancel', size=(200, 40))
+        self.wx_cancel_btn.Bind(wx.EVT_BUTTON, self.on_cancel_button_click)
 
         self.wx_dummy_text_1 = wx.StaticText(self.panel, label=' ', size=(200, 2))
         self.wx_progress_text = wx.StaticText(self.panel, label='PROGRESS TEXT', size=(200, 25))
@@ -131,8 +168,11 @@ class BOMFrame(wx.Frame):
                             flag=wx.EXPAND | wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, border=5)
         self.gbs_inputs.Add(self.wx_list_name_input, pos=(1, 1), span=(1, 1),
                             flag=wx.EXPAND | wx.ALL | wx.ALIGN_LEFT | wx.ALIGN_CENTER_VERTICAL, border=5)
+        self.gbs_inputs.Add(self.wx_watch_checkbox, pos=(2, 1), span=(1, 1),
+                            flag=wx.EXPAND | wx.ALL | wx.ALIGN_LEFT | wx.ALIGN_CENTER_VERTICAL, border=5)
 
         self.gbs_button.Add(self.wx_push_btn, pos=(0, 0), span=(1, 1))
+        self.gbs_button.Add(self.wx_cancel_btn, pos=(1, 0), span=(1, 1))
 
         self.gbs_progress.Add(self.wx_dummy_text_1, pos=(0, 0), span=(1, 1))
         self.gbs_progress.Add(self.wx_progress_text, pos=(1, 0), span=(1, 1))
@@ -155,113 +195,164 @@ class BOMFrame(wx.Frame):
 
         self.panel.SetSizerAndFit(self.gbs)
 
-        # Hide controls after `SetSizerAndFit()`
+        # the progress of the load thread is shown until the rows are all in the list
+        self.wx_progress_text.SetLabel('Reading schematic...')
+        self.wx_progress_gauge.SetValue(0)
+
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        EVT_RESULT(self, self.message_handler)  # sync state between Load/Push Threads and the UI
+
+    def on_symbols_loaded(self, data):
+        self.symbol_dict = data['symbol_dict']
+        self.bom_index = data['bom_index']
+        self.watcher = data['watcher']
+        self.auto_pn_field_dict = data['auto_pn_field_dict']
+        self.current_pn_field_str = self.auto_pn_field_dict['name']
+        # place 'auto' option as the first item
+        auto_item = 'Auto ({fn})'.format(fn=self.auto_pn_field_dict['name'])
+        field_list_cb = [auto_item]
+        for fname in parse_fields(self.symbol_dict):
+            field_list_cb.append(fname)
+        self.wx_pn_field_dropdown.Set(field_list_cb)
+        self.wx_pn_field_dropdown.SetValue(field_list_cb[0])
+        # an empty list, the load thread sends its rows in batches
+        self.bom_models[self.current_pn_field_str] = BOMModel({}, parse_fields(self.symbol_dict),
+                                                              self.current_pn_field_str)
+        self.bom_models[self.current_pn_field_str].add_listener(self.on_bom_model_change)
+        self.wx_bom_lc.set_model(self.bom_models[self.current_pn_field_str])
+
+    def on_rows_loaded(self, data):
+        model = self.bom_models[data['pn_field']]
+        model.append(data['rows'])
+        if model is self.wx_bom_lc.model:
+            self.wx_bom_lc.SetItemCount(len(model))
+        self.wx_progress_gauge.SetValue(data['gauge_int'])
+
+    def on_load_done(self):
+        self.update_bom_from_listctrl()
+        self.update_bom_by_pn_field(self.current_pn_field_str)
+        self.wx_pn_field_dropdown.Enable()
+        self.wx_push_btn.Enable()
+        self.wx_watch_checkbox.Enable()
+        self.wx_cancel_btn.Hide()
         self.wx_progress_text.Hide()
         self.wx_progress_gauge.Hide()
+        self.panel.Layout()
 
-        EVT_RESULT(self, self.message_handler)  # sync state between Push Thread and the UI
-
-    def update_listctrl(self, symbol_dict):
-        """ update the `self.wx_bom_lc` """
-        fields = parse_fields(symbol_dict)
-        # header
-        self.wx_bom_lc.ClearAll()
-        self.wx_bom_lc.InsertColumn(0, 'Row', wx.LIST_FORMAT_LEFT, 75)
-        field_name_str_to_col_number_int = {}
-        _col_idx = 0
-        for _fname in fields:
-            self.wx_bom_lc.InsertColumn(_col_idx + 1, _fname, wx.LIST_FORMAT_LEFT, 200)
-            field_name_str_to_col_number_int[_fname] = _col_idx + 1
-            _col_idx += 1
-        self.wx_bom_lc.InsertColumn(_col_idx + 2, 'Customer Reference', wx.LIST_FORMAT_LEFT, 150)
-        self.wx_bom_lc.InsertColumn(_col_idx + 3, 'Note', wx.LIST_FORMAT_LEFT, 150)
-
-        # rows
-        _idx = 0
-        for _idx, symbol_uuid in enumerate(symbol_dict):
-            row_index = self.wx_bom_lc.InsertItem(self.max_list_length, _idx)
-            self.wx_bom_lc.SetItem(row_index, 0, str(_idx + 1))
-            for symbol_property in symbol_dict[symbol_uuid]:
-                if symbol_property['name'] in field_name_str_to_col_number_int:
-                    col_index = field_name_str_to_col_number_int[symbol_property['name']]
-                    self.wx_bom_lc.SetItem(row_index, col_index, to_string(symbol_property['value']))
-        self.wx_bom_lc.Bind(wx.EVT_LIST_END_LABEL_EDIT, self.on_listctrl_update)
+    @classmethod
+    def start_outbox_drainer(cls):
+        if cls.outbox_drainer is not None:
+            return
+        try:
+            cls.outbox = PushOutbox()
+        except (OSError, sqlite3.Error) as e:
+            print('No outbox: {e}'.format(e=e))
+            return
+        cls.outbox_drainer = OutboxDrainer(cls.outbox, on_sent=cls.on_outbox_sent)
+        cls.outbox_drainer.start()
+
+    @staticmethod
+    def on_outbox_sent(entry, short_urls):
+        # called from the drainer thread, once a push that failed before is sent
+        for returned_short_url in short_urls:
+            wx.CallAfter(wx.LaunchDefaultBrowser, returned_short_url)
+
+    def on_cancel_button_click(self, event):
+        self.Close()
+
+    def on_close(self, event):
+        # stop reading the schematic: the load thread doesn't post anything to a closed frame
+        self.load_thread.cancel()
+        self.stop_watch()
+        self.stop_push_progress()
+        self.save_profile()
+        event.Skip()
+
+    def save_profile(self):
+        try:
+            trace_path = self.profiler.save()
+        except OSError as e:
+            print('Profile not saved: {e}'.format(e=e))
+            return
+        if trace_path is not None:
+            print('Profile saved: {p}'.format(p=trace_path))
+
+    def on_watch_toggle(self, event):
+        if self.wx_watch_checkbox.GetValue():
+            if self.watch_thread is None and self.watcher is not None:
+                self.watch_thread = WatchThread(self, self.watcher)
+        else:
+            self.stop_watch()
+
+    def stop_watch(self):
+        if self.watch_thread is not None:
+            self.watch_thread.stop()
+            self.watch_thread = None
+
+    def on_schematic_change(self, change):
+        # Sheets saved in Eeschema (see `sch_watch`): the symbols that changed are updated in the table,
+        # and only the rows of their part numbers are grouped again, in every list the user has seen.
+        # Customer References and Notes stay with their part numbers.
+        old_fields = list(self.symbol_dict.fields)
+        apply_change(self.symbol_dict, change)
+        self.bom_index.clear()
+        fields = parse_fields(self.symbol_dict)
+        for pn_field, model in list(self.bom_models.items()):
+            if list(fields) != old_fields:
+                # a new field: new columns, the rows are grouped again
+                new_model = BOMModel(self.bom_index.make_quantity(pn_field), fields, pn_field)
+                new_model.carry_over(model)
+                model.remove_listener(self.on_bom_model_change)
+                new_model.add_listener(self.on_bom_model_change)
+                self.bom_models[pn_field] = new_model
+                if model is self.wx_bom_lc.model:
+                    self.wx_bom_lc.set_model(new_model)
+                model = new_model
+            else:
+                part_numbers = self.bom_index.canonical_part_numbers(affected_part_numbers(change, pn_field))
+                rows = model.update_parts(self.bom_index.make_quantity_for(pn_field, part_numbers), part_numbers)
+                if model is self.wx_bom_lc.model:
+                    if rows is None:
+                        self.wx_bom_lc.SetItemCount(len(model))
+                        self.wx_bom_lc.Refresh()
+                    else:
+                        for row in rows:
+                            self.wx_bom_lc.RefreshItem(row)
+            if pn_field in self.bom_by_pn_field:
+                self.bom_by_pn_field[pn_field] = model.bom()
+        self.bom = self.wx_bom_lc.model.bom()
+        if list(fields) != old_fields:
+            auto_selected = self.wx_pn_field_dropdown.GetSelection() == 0
+            auto_item = self.wx_pn_field_dropdown.GetString(0)
+            self.wx_pn_field_dropdown.Set([auto_item] + list(fields))
+            self.wx_pn_field_dropdown.SetValue(auto_item if auto_selected else self.current_pn_field_str)
 
     def update_listctrl_with_qty(self, symbol_dict, pn_field: str):
         """ update the `self.wx_bom_lc` """
-        bom_obj_by_pn = make_quantity(symbol_dict, pn_field)
-        fields = parse_fields(symbol_dict)
-
-        # header
-        self.wx_bom_lc.ClearAll()
-        self.wx_bom_lc.InsertColumn(0, 'Row', wx.LIST_FORMAT_LEFT, 75)  # numbering the rows for better navigation
-        self.wx_bom_lc.InsertColumn(1, 'Part Number*', wx.LIST_FORMAT_LEFT, 200)  # *: mandatory
-        self.wx_bom_lc.InsertColumn(2, 'Quantity*', wx.LIST_FORMAT_LEFT, 75)
-        # fill the rest
-        field_name_str_to_col_number_int = {}
-        _idx = 0
-        for _fname in fields:
-            if _fname != pn_field:
-                self.wx_bom_lc.InsertColumn(_idx + 3, _fname, wx.LIST_FORMAT_LEFT, 200)
-                field_name_str_to_col_number_int[_fname] = _idx + 3
-                _idx += 1
-        # the last 2 are optional
-        self.wx_bom_lc.InsertColumn(_idx + 4, 'Customer Reference', wx.LIST_FORMAT_LEFT, 150)
-        self.wx_bom_lc.InsertColumn(_idx + 5, 'Note', wx.LIST_FORMAT_LEFT, 150)
-
-        # rows
-        _idx = 0
-        for _idx, symbol_pn in enumerate(bom_obj_by_pn):
-            row_index = self.wx_bom_lc.InsertItem(self.max_list_length, _idx)
-            self.wx_bom_lc.SetItem(row_index, 0, str(_idx + 1))
-            self.wx_bom_lc.SetItem(row_index, 1, symbol_pn)
-            self.wx_bom_lc.SetItem(row_index, 2, str(bom_obj_by_pn[symbol_pn]['quantity']))
-            for p_name, p_obj in bom_obj_by_pn[symbol_pn].items():
-                # e.g.: 'DKPN': {'name': 'DKPN', 'values': ['1234-ND', '5678-ND']}
-                if p_name in field_name_str_to_col_number_int:
-                    col_index = field_name_str_to_col_number_int[p_name]
-                    self.wx_bom_lc.SetItem(row_index, col_index, to_string(p_obj['values']))
-        self.wx_bom_lc.Bind(wx.EVT_LIST_END_LABEL_EDIT, self.on_listctrl_update)
+        if symbol_dict is self.symbol_dict:
+            bom_obj_by_pn = self.bom_index.make_quantity(pn_field)
+        else:
+            bom_obj_by_pn = make_quantity(symbol_dict, pn_field)
+        self.bom_models[pn_field] = BOMModel(bom_obj_by_pn, parse_fields(symbol_dict), pn_field)
+        self.bom_models[pn_field].add_listener(self.on_bom_model_change)
+        self.wx_bom_lc.set_model(self.bom_models[pn_field])
 
     def update_listctrl_from_bom(self, pn_field_str: str):
-        self.update_listctrl_with_qty(self.symbol_dict, pn_field_str)
-        column_count = self.wx_bom_lc.GetColumnCount()
-        customer_ref_col_idx = column_count - 2
-        note_col_idx = column_count - 1
-        bom = self.bom_by_pn_field[pn_field_str]
-        for row_idx, mpn in enumerate(bom):
-            self.wx_bom_lc.SetItem(row_idx, customer_ref_col_idx, bom[mpn]['cusRef'])
-            self.wx_bom_lc.SetItem(row_idx, note_col_idx, bom[mpn]['note'])
+        # the rows of that field, as the user left them
+        self.wx_bom_lc.set_model(self.bom_models[pn_field_str])
 
     def update_bom_from_listctrl(self):
-        column_count = self.wx_bom_lc.GetColumnCount()
-        customer_ref_col_idx = column_count - 2
-        note_col_idx = column_count - 1
-        self.bom = {}
-        for row_idx in range(self.wx_bom_lc.GetItemCount()):
-            mpn = self.wx_bom_lc.GetItemText(row_idx, 1)
-            qty = self.wx_bom_lc.GetItemText(row_idx, 2)
-            cus_ref = self.wx_bom_lc.GetItemText(row_idx, customer_ref_col_idx)
-            note = self.wx_bom_lc.GetItemText(row_idx, note_col_idx)
-            self.bom[mpn] = {
-                'mpn': mpn,
-                'qty': qty,
-                'cusRef': cus_ref,
-                'note': note,
-            }
+        # full resynchronization, edits keep `self.bom` up to date (see `on_bom_model_change`)
+        self.bom = self.wx_bom_lc.model.refresh()
 
     def update_bom_by_pn_field(self, pn_field: str):
         self.bom_by_pn_field[pn_field] = self.bom
 
-    def on_listctrl_update(self, event):
-        row_id = event.GetIndex()  # Get the current row
-        col_id = event.GetColumn()  # Get the current column
-        new_data = event.GetLabel()  # Get the changed data
-
-        print('Item change at ({r}, {c}): {d}'.format(r=row_id, c=col_id, d=new_data))
-        self.wx_bom_lc.SetItem(row_id, col_id, new_data)
-        self.update_bom_from_listctrl()
-        self.update_bom_by_pn_field(self.current_pn_field_str)
+    def on_bom_model_change(self, model, row, col):
+        # one row was edited, its entry in the model's BOM is already updated
+        if model is self.wx_bom_lc.model:
+            self.bom = model.bom()
+            self.update_bom_by_pn_field(self.current_pn_field_str)
 
     def on_pn_field_select(self, event):
         if self.wx_pn_field_dropdown.GetSelection() == 0:  # the first item is "Auto"
@@ -273,9 +364,11 @@ class BOMFrame(wx.Frame):
             self.update_listctrl_from_bom(_pn_field)
             self.bom = self.bom_by_pn_field[self.current_pn_field_str]
         else:
-            self.update_listctrl_with_qty(self.symbol_dict, _pn_field)
-            self.update_bom_from_listctrl()
-            self.update_bom_by_pn_field(self.current_pn_field_str)
+            # grouped (aggregation) and shown (list population) at once, on the UI thread
+            with self.profiler.phase('list_population', step='pn_field', pn_field=_pn_field):
+                self.update_listctrl_with_qty(self.symbol_dict, _pn_field)
+                self.update_bom_from_listctrl()
+                self.update_bom_by_pn_field(self.current_pn_field_str)
 
     def on_list_name_change(self, event):
         _str_value = self.wx_list_name_input.GetValue()
@@ -287,13 +380,64 @@ class BOMFrame(wx.Frame):
 
     def message_handler(self, message):
         _data = message.data
-        if _data['state'] == 'Finished':
-            self.Close()
+        if _data['state'] == 'LOAD_PROGRESS':
+            self.wx_progress_text.SetLabel(_data['text'])
+            self.wx_progress_gauge.SetValue(_data['gauge_int'])
+        elif _data['state'] == 'LOAD_SYMBOLS':
+            self.wx_progress_text.SetLabel('Listing parts...')
+            with self.profiler.phase('list_population', step='columns'):
+                self.on_symbols_loaded(_data)
+        elif _data['state'] == 'LOAD_ROWS':
+            with self.profiler.phase('list_population', step='rows', n_parts=len(_data['rows'])):
+                self.on_rows_loaded(_data)
+        elif _data['state'] == 'LOAD_DONE':
+            with self.profiler.phase('list_population', step='done'):
+                self.on_load_done()
+        elif _data['state'] == 'WATCH_CHANGE':
+            # applied even if watching was just turned off: the next changes follow this one
+            with self.profiler.phase('list_population', step='watch', n_sheets=len(_data['change']['sheets'])):
+                self.on_schematic_change(_data['change'])
+        elif _data['state'] == 'LOAD_ERROR' and _data['error'] == 'file_not_found':
+            error_caption = 'Schematic file (.kicad_sch) not found'
+            error_message = \
+                'The "Push to Digi-Key myLists" plugin requires KiCad schematic file (.kicad_sch).\n\n' \
+                'If you have an old schematic file (.sch), save it with the Schematic Editor. ' \
+                'This will create the equivalent KiCad schematic file (.kicad_sch).\n\n' \
+                'The schematic file (.kicad_sch) and the PCB file (.kicad_pcb) must have the same name.'.format()
+            self.show_error_message_then_exit(error_message, error_caption)
+        elif _data['state'] == 'LOAD_ERROR' and _data['error'] == 'no_symbols':
+            error_caption = 'No parts in the schematic'
+            error_message = \
+                'There are no symbols in \n{path}\nor in its sheets.\n\n' \
+                'Place the parts of the board in the Schematic Editor and save the schematic, ' \
+                'then open the plugin again.'.format(path=self.kicad_sch_path)
+            self.show_error_message_then_exit(error_message, error_caption)
+        elif _data['state'] == 'LOAD_ERROR':
+            error_caption = 'Error parsing schematic file'
+            error_message = \
+                'There was an error parsing \n{path}.\n\n' \
+                'If you have an old schematic file (.sch), save it with the Schematic Editor. ' \
+                'This will create the equivalent KiCad schematic file (.kicad_sch).\n\n' \
+                'The schematic file (.kicad_sch) and the PCB file (.kicad_pcb) must have the same name.' \
+                .format(path=self.kicad_sch_path)
+            self.show_error_message_then_exit(error_message, error_caption)
+        elif _data['state'] == 'Finished':
+            self.show_push_progress(_data)
+        elif _data['state'] == 'PUSH_QUEUED':
+            error_caption = 'Digi-Key myLists cannot be reached'
+            error_message = \
+                'The plugin cannot push part data to Digi-Key myLists right now.\n\n' \
+                'Your parts, notes and customer references are saved, and will be sent automatically ' \
+                'while KiCad is open, when the connection is back. The list will then open in your browser.\n\n' \
+                'If your computer is behind a proxy system, please contact your administrator.'
+            self.show_error_message_then_exit(message=error_message, caption=error_caption)
         elif _data['state'] == 'ERR_REQUESTS_EXCEPTION':
             error_caption = 'Cannot push part data to Digi-Key myLists'
             error_message = \
                 'The plugin cannot push part data to Digi-Key myLists.\n\n' \
-                'Cannot connect to {url}.\n\n' \
+                'Cannot connect to {url}, or the connection was lost before the answer.\n' \
+                'The list may have been created all the same: please check your lists ' \
+                'before pushing again.\n\n' \
                 'If your computer is behind a proxy system, please contact your administrator.' \
                 ''.format(url=_data['api_url'])
             self.show_error_message_then_exit(message=error_message, caption=error_caption)
@@ -314,36 +458,58 @@ class BOMFrame(wx.Frame):
                 'To view the list, you can open your preferred browser with this URL: {url}\n' \
                 'Hint: You don\'t have to type the URL manually, ' \
                 'Ctrl+C this message, then Ctrl+V elsewhere to get the message content, including the URL.' \
-                ''.format(url=_data['url'])
+                ''.format(url='\n'.join(_data['urls']))
+            if len(_data['urls']) > 1:
+                error_message = error_message.replace('the list', 'the lists').replace('this URL: ', 'these URLs:\n') \
+                    .replace('a Digi-Key list', 'Digi-Key lists').replace('including the URL', 'including the URLs')
             self.show_error_message_then_exit(message=error_message, caption=error_caption)
         else:
-            self.wx_progress_text.SetLabel(_data['state'])
-            self.wx_progress_gauge.SetValue(_data['gauge_int'])
+            self.show_push_progress(_data)
+
+    def show_push_progress(self, data):
+        # The push thread posts its states as they happen, a fast push would only flash them.
+        # States arriving while one is shown wait here (only the latest progress is kept, then 'Finished'),
+        # the push thread never waits for the UI.
+        queue = self._progress_queue
+        if queue and data['state'] != 'Finished' and queue[-1]['state'] != 'Finished':
+            queue[-1] = data
+        else:
+            queue.append(data)
+        if self._progress_timer is None:
+            self._show_next_progress()
+
+    def _show_next_progress(self):
+        self._progress_timer = None
+        while self._progress_queue:
+            data = self._progress_queue.pop(0)
+            if data['state'] == 'Finished':
+                self.Close()
+                return
+            self.wx_progress_text.SetLabel(data['state'])
+            self.wx_progress_gauge.SetValue(data['gauge_int'])
+            if self.progress_min_display_ms > 0:
+                self._progress_timer = wx.CallLater(self.progress_min_display_ms, self._show_next_progress)
+                return
+
+    def stop_push_progress(self):
+        if self._progress_timer is not None:
+            self._progress_timer.Stop()
+            self._progress_timer = None
+        self._progress_queue.clear()
 
     def post_bom_data(self, _bom=None):
         self.wx_push_btn.Disable()
         self.wx_progress_gauge.Show()
         self.wx_progress_text.Show()
 
-        PushThread(self, json_data=json_from_bom__with_pn_as_key(self.bom), list_name=self.list_name)
+        with self.profiler.phase('serialization', n_parts=len(self.bom)):
+            json_data = json_from_bom__with_pn_as_key(self.bom)
+        PushThread(self, json_data=json_data, list_name=self.list_name, outbox=self.outbox, profiler=self.profiler)
 
     def show_error_message_then_exit(self, message='Message content', caption='Caption'):
+        self.stop_push_progress()
         self.wx_md = wx.MessageDialog(parent=None, message=message, caption=caption)
         self.wx_md.ShowModal()
-        self.Destroy()
-
-
-class DigiKeyMyListsPlugin(pcbnew.ActionPlugin):
-    def __init__(self):
-        self.name = 'Push to DigiKey myLists'
-        self.category = 'Manufacturing'
-        self.pcbnew_icon_support = hasattr(self, 'show_toolbar_button')
-        self.show_toolbar_button = True
-        self.icon_file_name = os.path.join(
-            os.path.dirname(__file__), 'toolbar_icon.png')
-        self.dark_icon_file_name = os.path.join(
-            os.path.dirname(__file__), 'toolbar_icon.png')
-        self.description = 'Push schematic components to Digi-Key myLists for easy and quick part ordering.'
-
-    def Run(self):
-        BOMFrame().Show()
+        # through `on_close`: the background threads are stopped before the frame goes
+        self.Close()
+
@@ -0,0 +1,95 @@
+import os
+import unicodedata
+from .utils import _PACKAGING_SUFFIXES
+
+# Canonical part numbers, so that spellings of the same part number are grouped on one line:
+# ' 296-1234-1-ND', '296-1234-1-nd' and '２９６-1234-1-ND' are all '296-1234-1-ND'.
+# Values are normalized (NFKC), trimmed and case folded, then written in upper case as Digi-Key does.
+# Optionally, the Digi-Key packaging suffixes (see `utils.score_field_value_as_part_number`) are folded
+# to Cut Tape: Tape & Reel and Digi-Reel of a part are ordered as its Cut Tape.
+#
+# SAMPLE OUTPUT (`PartNumberNormalizer.merge`)
+# ({'296-1234-1-ND': [0, 3, 7], 'RC0603FR-0710KL': [1, 2]},
+#  {'296-1234-1-ND': {'296-1234-1-ND': 2, ' 296-1234-1-nd': 1}})  # merged variants, and their symbols
+
+# The dialog has no options window: it takes the settings of the command line (`--no-normalize`,
+# `--fold-packaging`) from the environment, set before starting KiCad, as for profiling:
+#   KICAD_DIGIKEY_NORMALIZE=0         part numbers are grouped as they are written
+#   KICAD_DIGIKEY_FOLD_PACKAGING=1    Tape & Reel and Digi-Reel part numbers are counted as Cut Tape
+NORMALIZE_ENV = 'KICAD_DIGIKEY_NORMALIZE'
+FOLD_PACKAGING_ENV = 'KICAD_DIGIKEY_FOLD_PACKAGING'
+
+# packaging suffix --> Cut Tape suffix, e.g. 'TR-ND' --> 'CT-ND', '-2-ND' --> '-1-ND'
+_CUT_TAPE_SUFFIXES = {_s: '-1-ND' if _s.startswith('-') else 'CT-ND' for _s in _PACKAGING_SUFFIXES}
+
+
+def fold_packaging(part_number: str):
+    # 'P5555TR-ND' --> 'P5555CT-ND', '296-1234-6-ND' --> '296-1234-1-ND', `part_number` is in upper case
+    for suffix, cut_tape in _CUT_TAPE_SUFFIXES.items():
+        if part_number.endswith(suffix):
+            return part_number[:-len(suffix)] + cut_tape
+    return part_number
+
+
+def canonical_part_number(value: str, fold_packaging_suffixes=False):
+    # ' 296-1234-2-nd ' --> '296-1234-2-ND', '296-1234-1-ND' with `fold_packaging_suffixes`
+    # '' for a blank value
+    part_number = unicodedata.normalize('NFKC', value).strip().casefold().upper()
+    if fold_packaging_suffixes:
+        part_number = fold_packaging(part_number)
+    return part_number
+
+
+class PartNumberNormalizer:
+    # `canonical_part_number` with a lookup table: each distinct value is normalized once,
+    # then found in O(1). Keep one per dialog or command, values repeat across fields and reloads.
+    def __init__(self, fold_packaging_suffixes=False):
+        self.fold_packaging_suffixes = fold_packaging_suffixes
+        self._canonical = {}  # value: canonical part number
+
+    def __call__(self, value: str):
+        part_number = self._canonical.get(value)
+        if part_number is None:
+            part_number = canonical_part_number(value, self.fold_packaging_suffixes)
+            self._canonical[value] = part_number
+        return part_number
+
+    def merge(self, groups: dict):
+        # {value: [row, ...]} --> ({canonical part number: [row, ...]}, merged variants), see the sample output
+        # Groups stay in order of first appearance, rows of merged groups are sorted again.
+        merged = {}
+        variants = {}  # canonical part number: {value: number of rows}, more than one value only
+        first_values = {}
+        for value, rows in groups.items():
+            part_number = self(value)
+            if not part_number:  # blank once trimmed
+                continue
+            other = merged.get(part_number)
+            if other is None:
+                merged[part_number] = rows
+                first_values[part_number] = value
+                continue
+            if part_number not in variants:
+                merged[part_number] = other = list(other)
+                variants[part_number] = {first_values[part_number]: len(other)}
+            other.extend(rows)
+            variants[part_number][value] = len(rows)
+        for part_number in variants:
+            merged[part_number].sort()
+        return merged, variants
+
+
+def make_normalizer(normalize=True, fold_packaging_suffixes=False):
+    # --> a PartNumberNormalizer, or None when part numbers are grouped as they are written
+    # folding the packaging suffixes implies normalizing
+    if not normalize and not fold_packaging_suffixes:
+        return None
+    return PartNumberNormalizer(fold_packaging_suffixes)
+
+
+def normalizer_from_environ(environ=None):
+    # `make_normalizer` with the settings of the dialog, see above
+    environ = os.environ if environ is None else environ
+    normalize = environ.get(NORMALIZE_ENV, '').strip().lower() not in ('0', 'false', 'no', 'off')
+    fold = environ.get(FOLD_PACKAGING_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
+    return make_normalizer(normalize, fold)
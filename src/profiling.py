@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from .sch_cache import user_cache_dir
+
+# Opt-in instrumentation of the dialog, for "the dialog is slow" reports.
+# Set KICAD_DIGIKEY_PROFILE before starting KiCad:
+#   KICAD_DIGIKEY_PROFILE=1           traces in <user cache dir>/profiles (see `sch_cache.user_cache_dir`)
+#   KICAD_DIGIKEY_PROFILE=/some/dir   traces in that directory
+#   KICAD_DIGIKEY_CPROFILE=1          also a cProfile dump (.prof, open with `python -m pstats` or snakeviz)
+#
+# Each dialog writes trace-<date>-<pid>.json when it closes, in the Chrome trace-event format
+# (open in chrome://tracing or https://ui.perfetto.dev): one event per phase, with its wall time,
+# and in `args` its CPU time and the peak of traced memory above the memory at its start.
+# CPU time is given twice: `thread_cpu_ms` of the thread of the phase only, which misses the work of thread
+# pools (e.g. sheets parsed in parallel by read_schematic), and `process_cpu_ms` of every thread of KiCad
+# during the phase, which includes them, and the work of the other threads at the same time.
+# Phases: read_schematic > parse_sheet, symbol_table, field_scoring, aggregation (load thread),
+# list_population, serialization (UI), outbox, upload > http_round_trip, launch_browser (push thread).
+#
+# Disabled (the default), `get_profiler()` is `NULL_PROFILER`: a phase is one method call that does nothing.
+#
+# SAMPLE OUTPUT (one event)
+# {'name': 'parse_sheet', 'cat': 'load', 'ph': 'X', 'ts': 1532.1, 'dur': 84210.5, 'pid': 4242, 'tid': 17,
+#  'args': {'path': '/proj/power.kicad_sch', 'thread_cpu_ms': 83.9, 'process_cpu_ms': 91.2, 'peak_kb': 5120.0}}
+
+PROFILE_ENV = 'KICAD_DIGIKEY_PROFILE'
+CPROFILE_ENV = 'KICAD_DIGIKEY_CPROFILE'
+
+
+class _NullPhase:
+    def set(self, **args):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullProfiler:
+    enabled = False
+
+    def phase(self, name: str, cat='ui', **args):
+        return _NULL_PHASE
+
+    def save(self):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Phase:
+    # one phase, from its creation to `end()` (or the end of its `with` block)
+    def __init__(self, profiler, name: str, cat: str, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.tid = threading.get_ident()
+        self.peak = None
+        self.mem0 = None
+        self._ended = False
+        profiler._open_phase(self)
+        self.cpu0 = (time.thread_time(), time.process_time())
+        self.t0 = time.perf_counter()
+
+    def set(self, **args):
+        # more `args` for the trace, e.g. what the phase found
+        self.args.update(args)
+
+    def end(self):
+        t1 = time.perf_counter()
+        cpu1 = (time.thread_time(), time.process_time())
+        if self._ended:
+            return
+        self._ended = True
+        self.profiler._close_phase(self, t1, cpu1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.end()
+        return False
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, directory, cprofile=False, trace_memory=True):
+        self.directory = directory
+        self.events = []
+        self._t_origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._open = []  # phases not ended yet, of every thread
+        self._thread_names = {}
+        # the peak of traced memory is reset for every phase, see `_fold_peak`
+        self.trace_memory = trace_memory and hasattr(tracemalloc, 'reset_peak')  # Python 3.9+
+        self._started_tracemalloc = self.trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        self._cprofile = None
+        if cprofile:
+            import cProfile
+            # follows the thread that creates the profiler (every thread from Python 3.12)
+            self._cprofile = cProfile.Profile()
+            try:
+                self._cprofile.enable()
+            except ValueError:  # another profiler is active
+                self._cprofile = None
+        self.name = 'trace-{d}-{p}'.format(d=time.strftime('%Y%m%d-%H%M%S'), p=self._pid)
+
+    def phase(self, name: str, cat='ui', **args):
+        # with profiler.phase('parse_sheet', 'load', path=path): ...
+        # or phase = profiler.phase(...), then phase.end()
+        return Phase(self, name, cat, args)
+
+    def _fold_peak(self):
+        # the peak since the last reset counts for every open phase, then restarts from the current memory
+        _current, peak = tracemalloc.get_traced_memory()
+        for _phase in self._open:
+            _phase.peak = max(_phase.peak, peak)
+        tracemalloc.reset_peak()
+
+    def _open_phase(self, phase):
+        with self._lock:
+            if self.trace_memory:
+                self._fold_peak()
+                phase.mem0 = phase.peak = tracemalloc.get_traced_memory()[0]
+            self._open.append(phase)
+            if phase.tid not in self._thread_names:
+                self._thread_names[phase.tid] = threading.current_thread().name
+
+    def _close_phase(self, phase, t1, cpu1):
+        with self._lock:
+            if self.trace_memory and phase.mem0 is not None:
+                self._fold_peak()
+                phase.args['peak_kb'] = round((phase.peak - phase.mem0) / 1024, 1)
+            self._open.remove(phase)
+            phase.args['thread_cpu_ms'] = round(1000 * (cpu1[0] - phase.cpu0[0]), 3)
+            phase.args['process_cpu_ms'] = round(1000 * (cpu1[1] - phase.cpu0[1]), 3)
+            self.events.append({
+                'name': phase.name,
+                'cat': phase.cat,
+                'ph': 'X',
+                'ts': round(1e6 * (phase.t0 - self._t_origin), 1),
+                'dur': round(1e6 * (t1 - phase.t0), 1),
+                'pid': self._pid,
+                'tid': phase.tid,
+                'args': phase.args,
+            })
+
+    def trace(self):
+        # --> Chrome trace-event JSON object
+        with self._lock:
+            events = list(self.events)
+            thread_names = dict(self._thread_names)
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': _tid, 'args': {'name': _name}}
+                    for _tid, _name in thread_names.items()]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+
+    def save(self):
+        # --> path of the trace, written when the dialog closes
+        # cProfile and memory tracing stop here, KiCad runs at full speed again. Phases ended later
+        # (without memory) are written by the next call.
+        with self._lock:
+            if self._cprofile is not None:
+                self._cprofile.disable()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            self.trace_memory = False
+        os.makedirs(self.directory, exist_ok=True)
+        trace_path = os.path.join(self.directory, self.name + '.json')
+        with open(trace_path, 'w', encoding='utf-8') as fo:
+            json.dump(self.trace(), fo)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(os.path.join(self.directory, self.name + '.prof'))
+            self._cprofile = None
+        return trace_path
+
+
+def get_profiler(environ=None):
+    # --> a new `Profiler` if KICAD_DIGIKEY_PROFILE is set, `NULL_PROFILER` otherwise
+    environ = os.environ if environ is None else environ
+    value = environ.get(PROFILE_ENV, '').strip()
+    if value.lower() in ('', '0', 'false', 'no', 'off'):
+        return NULL_PROFILER
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        directory = str(user_cache_dir().joinpath('profiles'))
+    else:
+        directory = os.path.expanduser(value)
+    cprofile = environ.get(CPROFILE_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
+    return Profiler(directory, cprofile=cprofile)
@@ -0,0 +1,346 @@
+import json
+import random
+import re
+import requests
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from email.utils import parsedate_to_datetime
+
+# Upload of a BOM to myLists, without any UI (see `PushThread` for the dialog).
+# A BOM is one list by default. On request (`chunk_size`), a large BOM is split into chunks of `chunk_size`
+# parts, sent concurrently by `max_workers` threads, so one request doesn't have to carry the whole BOM
+# before the timeout, or fit the server's payload limit. Each chunk then becomes its own list:
+# 'name (1/3)', 'name (2/3)', ... A BOM of one chunk keeps its name.
+#
+# Requests go through one shared `requests.Session` (connections are kept alive and reused by the chunks).
+# A POST creates a list, so it's only sent again when the server can't have created it:
+# the connection failed, or the server answered 429 Too Many Requests or 5xx. Retries wait an exponential
+# backoff with jitter, or the `Retry-After` of the response. A read timeout, or any other error, is not retried,
+# and isn't transient (`PushError.transient`): the list may have been created, only the user can tell.
+#
+# Bodies are plain JSON by default: the myLists endpoint isn't documented to take compressed bodies.
+# With `compress` (`--gzip` on the command line), they're gzip-compressed (`Content-Encoding: gzip`)
+# piece by piece (`iter_json_body`), so the plain JSON text isn't held in memory next to the compressed body.
+# An endpoint refusing gzip bodies (415, or 400) then gets the plain JSON instead, and from then on.
+
+API_URL = 'https://www.digikey.com/mylists/api/thirdparty'
+# This below variable helps myLists team keep track of projects that are using myLists API.
+# Feel free to change it to your project name.
+TAGS = 'KiCad'
+
+DEFAULT_CHUNK_SIZE = 500  # parts per list, when splitting is asked for
+DEFAULT_MAX_WORKERS = 4
+POOL_MAXSIZE = 8  # connections kept alive, for up to as many workers
+DEFAULT_TIMEOUT = (5, 30)  # seconds, (connect, read) per request
+DEFAULT_RETRIES = 4  # after the first attempt
+DEFAULT_BACKOFF = 0.5  # seconds, doubled for each retry
+MAX_BACKOFF = 30  # seconds, also the longest `Retry-After` honored
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_COMPRESS = False  # gzip bodies only when asked for, see above
+GZIP_REFUSED_STATUSES = {400, 415}
+ENCODE_PIECE_SIZE = 64 * 1024  # characters of JSON per piece
+
+_SHORT_URL_RE = re.compile(r'^http.+digikey\.com/short/[0-9a-z]{7}')
+
+
+class PushError(Exception):
+    # `state`: same as the error states of `PushThread`
+    # 'ERR_REQUESTS_EXCEPTION': {'api_url'}, 'ERR_SENDING_REQUEST': {'api_url'},
+    # 'SHORT_URL_NOT_RETURNED': {'r_text'}
+    # `transient`: the same request may succeed later, and can't have created a list (network down, server busy)
+    def __init__(self, state: str, transient=False, **data):
+        super().__init__(state)
+        self.state = state
+        self.transient = transient
+        self.data = data
+
+
+class PushMetrics:
+    # attempts and latency of the requests of a push, updated from the worker threads
+    def __init__(self):
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0  # chunks given up on
+        self.latencies = []  # seconds, of each attempt that got a response
+        self.bytes_sent = 0  # request bodies, as sent
+        self.backoff_time = 0.0  # seconds spent waiting before retries
+        self._lock = threading.Lock()
+
+    def add_attempt(self, latency=None, n_bytes=0):
+        with self._lock:
+            self.attempts += 1
+            self.bytes_sent += n_bytes
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def add_retry(self, delay: float):
+        with self._lock:
+            self.retries += 1
+            self.backoff_time += delay
+
+    def add_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def summary(self):
+        # SAMPLE OUTPUT
+        # {'attempts': 12, 'retries': 2, 'failures': 0, 'latency_mean': 0.41, 'latency_max': 1.2, 'backoff_time': 1.3,
+        #  'bytes_sent': 48_213}
+        latencies = sorted(self.latencies)
+        return {
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'failures': self.failures,
+            'latency_mean': sum(latencies) / len(latencies) if latencies else None,
+            'latency_max': latencies[-1] if latencies else None,
+            'backoff_time': self.backoff_time,
+            'bytes_sent': self.bytes_sent,
+        }
+
+
+class PhaseTimer:
+    # wall time of consecutive phases, e.g. of a push in `PushThread`
+    # SAMPLE OUTPUT (`timings`)
+    # {'initialize': 0.0001, 'outbox': 0.004, 'upload': 0.812, 'launch_browser': 0.054}
+    # `profiler`: see `profiling.get_profiler`, the phases also go to its trace
+    def __init__(self, profiler=None, cat='push'):
+        self.timings = {}
+        self.profiler = profiler
+        self.cat = cat
+        self._phase = None
+        self._profiler_phase = None
+        self._t0 = None
+
+    def start(self, phase: str):
+        # ends the current phase, if any
+        self.stop()
+        self._phase = phase
+        if self.profiler is not None:
+            self._profiler_phase = self.profiler.phase(phase, self.cat)
+        self._t0 = time.perf_counter()
+
+    def stop(self):
+        if self._phase is not None:
+            self.timings[self._phase] = self.timings.get(self._phase, 0.0) + time.perf_counter() - self._t0
+            self._phase = None
+            if self._profiler_phase is not None:
+                self._profiler_phase.end()
+                self._profiler_phase = None
+
+
+_session = None
+_session_lock = threading.Lock()
+_gzip_refused = set()  # API URLs that don't take gzip bodies
+
+
+def get_session():
+    # the `requests.Session` shared by every push, created on first use
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # retries are done in `push_chunk`, where it's known whether a POST can be sent again
+            adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=POOL_MAXSIZE,
+                                                    max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def _retry_after(response):
+    # seconds of the `Retry-After` header (delay or HTTP date), None if there is none
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(retry: int, backoff: float, response=None):
+    # "full jitter": concurrent chunks failing together don't retry together
+    retry_after = _retry_after(response) if response is not None else None
+    if retry_after is not None:
+        return min(retry_after, MAX_BACKOFF)
+    return random.uniform(0, min(MAX_BACKOFF, backoff * 2 ** retry))
+
+
+_ENCODER = json.JSONEncoder(allow_nan=False)  # same output as `requests.post(json=...)`
+
+
+def iter_json_body(json_data, piece_size=ENCODE_PIECE_SIZE):
+    # the JSON array of `json_data` (any iterable of parts, e.g. `utils.iter_json_from_bom__with_pn_as_key`)
+    # as UTF-8 bytes, in pieces of about `piece_size` characters
+    pieces = ['[']
+    size = 1
+    for _i, _part in enumerate(json_data):
+        if _i:
+            pieces.append(', ')
+        _s = _ENCODER.encode(_part)
+        pieces.append(_s)
+        size += len(_s)
+        if size >= piece_size:
+            yield ''.join(pieces).encode('utf-8')
+            pieces = []
+            size = 0
+    pieces.append(']')
+    yield ''.join(pieces).encode('utf-8')
+
+
+def encode_body(json_data: list, compress=DEFAULT_COMPRESS):
+    # --> (request body, headers), the whole body in memory (plain or compressed):
+    # a body is sent again as is when the request is retried, a generator could only be sent once
+    headers = {'Content-Type': 'application/json'}
+    if not compress:
+        return _ENCODER.encode(json_data).encode('utf-8'), headers
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    body = [gzip.compress(_piece) for _piece in iter_json_body(json_data)]
+    body.append(gzip.flush())
+    headers['Content-Encoding'] = 'gzip'
+    return b''.join(body), headers
+
+
+def split_chunks(json_data: list, chunk_size=DEFAULT_CHUNK_SIZE):
+    # `json_data`: see `utils.json_from_bom__with_pn_as_key`
+    if not chunk_size or chunk_size < 1:
+        return [json_data]
+    return [json_data[_i:_i + chunk_size] for _i in range(0, len(json_data), chunk_size)] or [json_data]
+
+
+def chunk_list_name(list_name: str, chunk_idx: int, n_chunks: int):
+    if n_chunks == 1:
+        return list_name
+    return '{name} ({i}/{n})'.format(name=list_name, i=chunk_idx + 1, n=n_chunks)
+
+
+def push_chunk(json_data: list, list_name: str, api_url=API_URL, timeout=DEFAULT_TIMEOUT, session=None,
+               retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, metrics=None, on_event=None,
+               compress=DEFAULT_COMPRESS):
+    # one list, --> short URL of the created list
+    # `session`: `get_session()` by default
+    # `metrics`: a PushMetrics, updated with every attempt
+    # `on_event`: on_event(name), name: 'request_sent', 'response_received' (once per attempt), 'url_validated'
+    # `compress`: gzip the body, unless `api_url` refused it before. Plain JSON by default.
+    if on_event is None:
+        def on_event(_name):
+            pass
+    if session is None:
+        session = get_session()
+    if metrics is None:
+        metrics = PushMetrics()
+    params = {
+        'listName': list_name,
+        'tags': TAGS
+    }
+    compress = compress and api_url not in _gzip_refused
+    body, headers = encode_body(json_data, compress)
+    r = None
+    retry = 0
+    while True:
+        t0 = time.perf_counter()
+        on_event('request_sent')
+        try:
+            r = session.post(api_url, data=body, headers=headers, params=params, verify=True, timeout=timeout)
+        except requests.exceptions.ConnectionError:
+            # includes connect timeouts, but not read timeouts: the list may be created by then
+            metrics.add_attempt()
+            if retry < retries:
+                delay = _backoff_delay(retry, backoff)
+                metrics.add_retry(delay)
+                time.sleep(delay)
+                retry += 1
+                continue
+            metrics.add_failure()
+            raise PushError('ERR_REQUESTS_EXCEPTION', transient=True, api_url=api_url)
+        except requests.exceptions.RequestException:
+            # e.g. a read timeout: the request may have reached the server, it's not sent again
+            metrics.add_attempt()
+            metrics.add_failure()
+            raise PushError('ERR_REQUESTS_EXCEPTION', api_url=api_url)
+        except Exception:
+            metrics.add_attempt()
+            metrics.add_failure()
+            raise PushError('ERR_SENDING_REQUEST', api_url=api_url)
+        metrics.add_attempt(time.perf_counter() - t0, len(body))
+        on_event('response_received')
+        if compress and r.status_code in GZIP_REFUSED_STATUSES:
+            # a refused request doesn't create a list: sent again right away, as plain JSON
+            _gzip_refused.add(api_url)
+            compress = False
+            body, headers = encode_body(json_data, compress)
+            continue
+        if r.status_code not in RETRY_STATUSES or retry == retries:
+            break
+        delay = _backoff_delay(retry, backoff, r)
+        metrics.add_retry(delay)
+        time.sleep(delay)
+        retry += 1
+
+    transient = r.status_code in RETRY_STATUSES  # retries exhausted, the server may take it later
+    returned_short_url = ''
+    try:
+        returned_short_url = json.loads(r.text)
+    except json.decoder.JSONDecodeError:
+        metrics.add_failure()
+        raise PushError('SHORT_URL_NOT_RETURNED', transient=transient, r_text=returned_short_url)
+    if not isinstance(returned_short_url, str) or not _SHORT_URL_RE.match(returned_short_url):
+        metrics.add_failure()
+        raise PushError('SHORT_URL_NOT_RETURNED', transient=transient, r_text=returned_short_url)
+    on_event('url_validated')
+    return returned_short_url
+
+
+def push_bom(json_data: list, list_name: str, api_url=API_URL, chunk_size=None,
+             max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT, on_chunk_done=None, session=None,
+             retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, metrics=None, on_event=None,
+             compress=DEFAULT_COMPRESS, sent=None, on_chunk_sent=None):
+    # --> short URLs of the created lists, in chunk order
+    # `chunk_size`: parts per list, e.g. DEFAULT_CHUNK_SIZE. None: the whole BOM is one list.
+    # `on_chunk_done`: on_chunk_done(chunks done, number of chunks), called from the worker threads
+    # `on_event`: on_event(name, chunk index, number of chunks), see `push_chunk`, also from the worker threads
+    # `sent`: {chunk index: short URL} of the lists already created by an earlier push of the same chunks,
+    #         they aren't sent again
+    # `on_chunk_sent`: on_chunk_sent(chunk index, short URL) as soon as a list is created, from the worker threads
+    # The first failing chunk stops the chunks not sent yet, and its PushError is raised.
+    # The lists created before are kept by myLists: see `on_chunk_sent` to send only the others later.
+    # `session`, `retries`, `backoff`, `metrics`, `compress`: see `push_chunk`
+    chunks = split_chunks(json_data, chunk_size)
+    n_chunks = len(chunks)
+    sent = sent or {}
+    done = []
+
+    def push(chunk_idx):
+        if chunk_idx in sent:
+            return sent[chunk_idx]
+        chunk_on_event = None
+        if on_event is not None:
+            def chunk_on_event(name):
+                on_event(name, chunk_idx, n_chunks)
+        short_url = push_chunk(chunks[chunk_idx], chunk_list_name(list_name, chunk_idx, n_chunks),
+                               api_url=api_url, timeout=timeout, session=session, retries=retries,
+                               backoff=backoff, metrics=metrics, on_event=chunk_on_event,
+                               compress=compress)
+        if on_chunk_sent is not None:
+            on_chunk_sent(chunk_idx, short_url)
+        done.append(chunk_idx)  # atomic, the count is right even when chunks finish together
+        if on_chunk_done is not None:
+            on_chunk_done(len(done), n_chunks)
+        return short_url
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, n_chunks))) as executor:
+        futures = [executor.submit(push, _i) for _i in range(n_chunks)]
+        wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            future.cancel()  # no-op for the chunks already sent
+        for future in futures:
+            if not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+        return [_f.result() for _f in futures]
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from .push_client import API_URL, PushError, push_bom
+from .sch_cache import user_cache_dir
+
+# Durable queue of the pushes to myLists (SQLite), so a BOM and the user's edits (notes, customer
+# references) aren't lost when the network is down: a push is stored before it's sent, and a failed
+# push stays pending until `drain()` (e.g. from an OutboxDrainer thread) sends it.
+#
+# Pushes are identified by a hash of their content (list name and parts). The same BOM pushed again
+# while it's pending isn't added twice: the entry already there is returned. Once sent (or failed),
+# a push made again is a new entry, the user may have deleted the lists of the first one.
+# Sent and failed entries are kept SENT_RETENTION_SECONDS, then purged.
+#
+# Entry statuses: 'pending' --> 'sending' (claimed by one sender) --> 'sent' | 'pending' (retry later)
+#                 | 'failed' (MAX_ATTEMPTS reached, or refused by the server)
+#
+# A push split in chunks (see `push_client.push_bom`) records the short URL of each list as soon as
+# it's created: when chunk k of n fails, a retry only sends the chunks that have no list yet.
+
+OUTBOX_VERSION = 1
+MAX_ATTEMPTS = 10
+RETRY_BACKOFF = 30  # seconds, doubled for each attempt
+MAX_RETRY_BACKOFF = 3600
+CLAIM_TIMEOUT = 600  # seconds, a 'sending' entry older than this was left by a crashed sender
+SENT_RETENTION_SECONDS = 24 * 3600
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pushes (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    list_name TEXT NOT NULL,
+    api_url TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    short_urls TEXT,
+    chunk_size INTEGER,
+    chunk_urls TEXT
+);
+CREATE INDEX IF NOT EXISTS pushes_hash ON pushes (content_hash);
+CREATE INDEX IF NOT EXISTS pushes_due ON pushes (status, next_attempt);
+'''
+_ADDED_COLUMNS = (('chunk_size', 'INTEGER'), ('chunk_urls', 'TEXT'))  # not in outboxes created before
+
+
+def default_outbox_path():
+    return user_cache_dir().joinpath('outbox.sqlite3')
+
+
+def content_hash(json_data: list, list_name: str, api_url=API_URL, chunk_size=None):
+    # same parts in the same order, same list name, endpoint and split --> same hash
+    h = hashlib.sha256()
+    key = [OUTBOX_VERSION, api_url, list_name] + ([chunk_size] if chunk_size else [])
+    h.update(json.dumps(key, ensure_ascii=False).encode('utf-8'))
+    for _part in json_data:
+        h.update(json.dumps(_part, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def _retry_delay(attempts: int):
+    return random.uniform(0.5, 1.0) * min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+class PushOutbox:
+    # `path`: the SQLite file, `default_outbox_path()` by default.
+    # Each call opens its own connection: an outbox can be used from any thread, and by several processes.
+    def __init__(self, path=None):
+        self.path = str(path or default_outbox_path())
+        if path is None:
+            default_outbox_path().parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute('PRAGMA journal_mode=WAL')  # readers don't wait for a sender
+            db.executescript(_SCHEMA)
+            columns = {_row[1] for _row in db.execute('PRAGMA table_info(pushes)')}
+            for name, sql_type in _ADDED_COLUMNS:
+                if name not in columns:
+                    db.execute('ALTER TABLE pushes ADD COLUMN {n} {t}'.format(n=name, t=sql_type))
+        finally:
+            db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute('PRAGMA synchronous=NORMAL')  # with WAL: no fsync per transaction, still consistent
+        db.row_factory = sqlite3.Row
+        return _Transaction(db)
+
+    @staticmethod
+    def _entry(row):
+        # SAMPLE OUTPUT
+        # {'id': 3, 'content_hash': '9f2c...', 'list_name': 'board', 'api_url': 'https://...', 'status': 'sent',
+        #  'created': 1700000000.0, 'attempts': 1, 'last_error': None, 'short_urls': ['https://...'],
+        #  'chunk_size': None, 'chunk_urls': {0: 'https://...'}}  # chunk index: short URL of the lists created
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'content_hash': row['content_hash'],
+            'list_name': row['list_name'],
+            'api_url': row['api_url'],
+            'status': row['status'],
+            'created': row['created'],
+            'attempts': row['attempts'],
+            'last_error': row['last_error'],
+            'short_urls': json.loads(row['short_urls']) if row['short_urls'] else None,
+            'chunk_size': row['chunk_size'],
+            'chunk_urls': {int(_idx): _url for _idx, _url in json.loads(row['chunk_urls'] or '{}').items()},
+        }
+
+    def add(self, json_data: list, list_name: str, api_url=API_URL, chunk_size=None, claim=False):
+        # --> (entry, True if it was added, False if the same push is already pending)
+        # `chunk_size`: see `push_client.push_bom`
+        # `claim`: the entry is returned claimed by the caller (see `claim`, with `force`), in the same
+        #          transaction as it's added: no drainer can claim it in between.
+        #          --> (None, False) if the same push is already being sent by another sender
+        now = time.time()
+        digest = content_hash(json_data, list_name, api_url, chunk_size)
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT * FROM pushes WHERE content_hash = ? AND status IN ('pending', 'sending') "
+                "ORDER BY id DESC LIMIT 1", (digest,)).fetchone()
+            if row is not None:
+                if not claim:
+                    return self._entry(row), False
+                if not self._claim(db, row['id'], now, force=True):
+                    return None, False
+                return self.get(row['id'], db), False
+            payload = zlib.compress(json.dumps(json_data, ensure_ascii=False).encode('utf-8'))
+            cursor = db.execute(
+                "INSERT INTO pushes (content_hash, list_name, api_url, payload, status, created, updated, "
+                "next_attempt, chunk_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (digest, list_name, api_url, payload, 'sending' if claim else 'pending', now, now, now, chunk_size))
+            return self.get(cursor.lastrowid, db), True
+
+    def get(self, entry_id: int, db=None):
+        if db is None:
+            with self._connect() as db:
+                return self.get(entry_id, db)
+        return self._entry(db.execute('SELECT * FROM pushes WHERE id = ?', (entry_id,)).fetchone())
+
+    def payload(self, entry_id: int):
+        with self._connect() as db:
+            row = db.execute('SELECT payload FROM pushes WHERE id = ?', (entry_id,)).fetchone()
+        return json.loads(zlib.decompress(row['payload']).decode('utf-8')) if row is not None else None
+
+    def pending(self):
+        # entries not sent yet, oldest first
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM pushes WHERE status IN ('pending', 'sending') ORDER BY id").fetchall()
+        return [self._entry(_row) for _row in rows]
+
+    def claim(self, entry_id: int, force=False):
+        # --> True if the caller is now the only one sending the entry
+        # `force`: don't wait for `next_attempt`, e.g. when the user pushes again
+        with self._connect() as db:
+            return self._claim(db, entry_id, time.time(), force)
+
+    @staticmethod
+    def _claim(db, entry_id: int, now: float, force: bool):
+        cursor = db.execute(
+            "UPDATE pushes SET status = 'sending', updated = ? WHERE id = ? AND "
+            "((status = 'pending' AND (next_attempt <= ? OR ?)) OR (status = 'sending' AND updated < ?))",
+            (now, entry_id, now, bool(force), now - CLAIM_TIMEOUT))
+        return cursor.rowcount == 1
+
+    def claim_due(self):
+        # --> the next entry due, claimed, or None
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id FROM pushes WHERE (status = 'pending' AND next_attempt <= ?) "
+                "OR (status = 'sending' AND updated < ?) ORDER BY next_attempt, id LIMIT 1",
+                (now, now - CLAIM_TIMEOUT)).fetchone()
+        if row is None:
+            return None
+        return self.get(row['id']) if self.claim(row['id']) else self.claim_due()
+
+    def mark_sent(self, entry_id: int, short_urls: list):
+        with self._connect() as db:
+            db.execute("UPDATE pushes SET status = 'sent', updated = ?, attempts = attempts + 1, last_error = NULL, "
+                       "short_urls = ? WHERE id = ?", (time.time(), json.dumps(short_urls), entry_id))
+
+    def mark_chunk_sent(self, entry_id: int, chunk_idx: int, short_url: str):
+        # the list of one chunk is created, it's not sent again if another chunk fails
+        with self._connect() as db:
+            row = db.execute('SELECT chunk_urls FROM pushes WHERE id = ?', (entry_id,)).fetchone()
+            if row is None:
+                return
+            chunk_urls = json.loads(row['chunk_urls'] or '{}')
+            chunk_urls[str(chunk_idx)] = short_url
+            db.execute('UPDATE pushes SET chunk_urls = ?, updated = ? WHERE id = ?',
+                       (json.dumps(chunk_urls), time.time(), entry_id))
+
+    def mark_failed(self, entry_id: int, error: str, transient=True):
+        # a transient error (see `push_client.PushError`) leaves the entry pending, until MAX_ATTEMPTS
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute('SELECT attempts FROM pushes WHERE id = ?', (entry_id,)).fetchone()
+            if row is None:
+                return
+            attempts = row['attempts'] + 1
+            status = 'pending' if transient and attempts < MAX_ATTEMPTS else 'failed'
+            db.execute('UPDATE pushes SET status = ?, updated = ?, attempts = ?, last_error = ?, next_attempt = ? '
+                       'WHERE id = ?', (status, now, attempts, error, now + _retry_delay(attempts), entry_id))
+
+    def send(self, entry_id: int, push=push_bom, **push_kwargs):
+        # sends a claimed entry --> short URLs, or raises the PushError after recording it
+        # Only the chunks without a list yet are sent, see `mark_chunk_sent`.
+        entry = self.get(entry_id)
+
+        def on_chunk_sent(chunk_idx, short_url):
+            self.mark_chunk_sent(entry_id, chunk_idx, short_url)
+
+        try:
+            short_urls = push(self.payload(entry_id), entry['list_name'], api_url=entry['api_url'],
+                              chunk_size=entry['chunk_size'], sent=entry['chunk_urls'], on_chunk_sent=on_chunk_sent,
+                              **push_kwargs)
+        except PushError as e:
+            self.mark_failed(entry_id, e.state, e.transient)
+            raise
+        self.mark_sent(entry_id, short_urls)
+        return short_urls
+
+    def drain(self, push=push_bom, on_sent=None, **push_kwargs):
+        # sends every entry due --> number of entries sent
+        # `on_sent`: on_sent(entry, short URLs)
+        n_sent = 0
+        while True:
+            entry = self.claim_due()
+            if entry is None:
+                break
+            try:
+                short_urls = self.send(entry['id'], push, **push_kwargs)
+            except PushError:
+                continue
+            n_sent += 1
+            if on_sent is not None:
+                on_sent(self.get(entry['id']), short_urls)
+        self.purge()
+        return n_sent
+
+    def purge(self):
+        # sent and failed entries, SENT_RETENTION_SECONDS after their last attempt
+        with self._connect() as db:
+            db.execute("DELETE FROM pushes WHERE status IN ('sent', 'failed') AND updated < ?",
+                       (time.time() - SENT_RETENTION_SECONDS,))
+
+
+class _Transaction:
+    # `with`: one write transaction (BEGIN IMMEDIATE), the connection is closed at the end
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.db.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+        finally:
+            self.db.close()
+
+
+class OutboxDrainer(threading.Thread):
+    # sends the pending pushes of an outbox in the background, every `interval` seconds
+    # `on_sent`: see `PushOutbox.drain`, called from this thread
+    def __init__(self, outbox: PushOutbox, interval=60, on_sent=None, **push_kwargs):
+        threading.Thread.__init__(self, daemon=True)
+        self.outbox = outbox
+        self.interval = interval
+        self.on_sent = on_sent
+        self.push_kwargs = push_kwargs
+        self._stopped = threading.Event()
+        self._wake_up = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake_up.set()
+
+    def wake_up(self):
+        # drain now, e.g. after adding an entry
+        self._wake_up.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.outbox.drain(on_sent=self.on_sent, **self.push_kwargs)
+            except sqlite3.Error as e:
+                print('Outbox not drained: {e}'.format(e=e))
+            self._wake_up.wait(self.interval)
+            self._wake_up.clear()
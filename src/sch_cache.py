@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import zlib
+from .sch_parser import parse_sheet
+
+# Persistent cache of parsed sheets (see `sch_parser.parse_sheet`), so reopening the dialog
+# on an unchanged design doesn't parse anything, and only modified sheets are parsed again.
+# One entry per sheet file, shared by all projects, the least recently used entries are evicted.
+# Entries are compressed JSON: plain data only, reading an entry can't run code.
+
+CACHE_VERSION = 2
+_MAGIC = b'DKSC'
+_KEY_FIELDS = ('mtime_ns', 'size', 'hash')
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def user_cache_dir():
+    # Windows: %LOCALAPPDATA%\KiCad-Push-to-DigiKey
+    # macOS: ~/Library/Caches/KiCad-Push-to-DigiKey
+    # Linux: $XDG_CACHE_HOME/KiCad-Push-to-DigiKey, ~/.cache/KiCad-Push-to-DigiKey
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return pathlib.Path(base).joinpath('KiCad-Push-to-DigiKey')
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as fi:
+        for chunk in iter(lambda: fi.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SheetCache:
+    # `cache_dir`: defaults to `user_cache_dir()`
+    # `use_hash`: also compare a content hash. A sheet whose mtime changed but whose content didn't
+    #             (e.g. after a git checkout) is then still a hit; a modified sheet is a miss even
+    #             if it kept its mtime and size.
+    def __init__(self, cache_dir=None, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 use_hash=False, parse=parse_sheet):
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir else user_cache_dir().joinpath('sheets')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.use_hash = use_hash
+        self.parse = parse
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, path: str, project):
+        name = '{v}\n{p}\n{j}'.format(v=CACHE_VERSION, p=path, j=project)
+        return self.cache_dir.joinpath(hashlib.sha1(name.encode('utf-8')).hexdigest() + '.bin')
+
+    def _file_key(self, path):
+        st = os.stat(path)
+        return {
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+            'hash': file_hash(path) if self.use_hash else None,
+        }
+
+    def read_entry(self, path, project=None):
+        # --> (file key, sheet) as stored, even if `path` changed since, None if there's no usable entry
+        entry_path = self._entry_path(str(pathlib.Path(path).resolve()), project)
+        try:
+            with open(entry_path, 'rb') as fi:
+                data = fi.read()
+            if not data.startswith(_MAGIC):
+                return None
+            key, sheet = json.loads(zlib.decompress(data[len(_MAGIC):]).decode('utf-8'))
+        except Exception:  # missing, truncated or incompatible entry: parse again
+            return None
+        if not isinstance(key, dict) or any(_field not in key for _field in _KEY_FIELDS):
+            return None
+        return key, sheet
+
+    def get(self, path, project=None):
+        # the cached sheet if `path` didn't change since it was stored, else None
+        path = str(pathlib.Path(path).resolve())
+        entry_path = self._entry_path(path, project)
+        entry = self.read_entry(path, project)
+        if entry is None:
+            return None
+        key, sheet = entry
+        try:
+            file_key = self._file_key(path)
+        except OSError:
+            return None
+        if self.use_hash:
+            if key['size'] != file_key['size'] or key['hash'] != file_key['hash']:
+                return None
+        elif key['mtime_ns'] != file_key['mtime_ns'] or key['size'] != file_key['size']:
+            return None
+        try:
+            os.utime(entry_path)  # mark as recently used
+        except OSError:
+            pass
+        return sheet
+
+    def put(self, path, project, sheet, file_key=None):
+        path = str(pathlib.Path(path).resolve())
+        try:
+            file_key = file_key or self._file_key(path)
+            text = json.dumps([file_key, sheet], ensure_ascii=False, separators=(',', ':'))
+            data = _MAGIC + zlib.compress(text.encode('utf-8'), 1)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            entry_path = self._entry_path(path, project)
+            tmp_path = entry_path.with_suffix('.tmp{pid}'.format(pid=os.getpid()))
+            with open(tmp_path, 'wb') as fo:
+                fo.write(data)
+            os.replace(tmp_path, entry_path)
+        except OSError:  # a read-only or full disk must not break the plugin
+            return
+        self.evict()
+
+    def evict(self):
+        # drop the least recently used entries until the cache fits in `max_entries` and `max_bytes`
+        try:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.bin'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(_[1] for _ in entries)
+        entries.sort()
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _mtime, size, entry_path = entries.pop(0)
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total -= size
+
+    def parse_sheet(self, path, project=None):
+        # drop-in for `sch_parser.parse_sheet`
+        sheet = self.get(path, project)
+        if sheet is not None:
+            self.hits += 1
+            return sheet
+        self.misses += 1
+        # stat before parsing: if the file is saved while it's parsed, the next lookup is a miss
+        try:
+            file_key = self._file_key(path)
+        except OSError:
+            file_key = None
+        sheet = self.parse(path, project)
+        self.put(path, project, sheet, file_key)
+        return sheet
+
+    def clear(self):
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.bin'):
+                    os.remove(entry.path)
+        except OSError:
+            pass
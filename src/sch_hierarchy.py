@@ -0,0 +1,110 @@
+import pathlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .sch_parser import parse_sheet
+from .symbol_table import SymbolTable
+
+# A KiCad design is a tree of sheets: the root .kicad_sch, and `(sheet ...)` items pointing to
+# sub-sheet files, which can point to more sheets. The same file can be instantiated many times
+# (e.g. one "channel.kicad_sch" placed 8 times), each instance has its own references.
+
+
+def sheet_file_path(parent_path, sheet_file: str):
+    # KiCad resolves a sheet file relative to the directory of the sheet that contains it
+    return pathlib.Path(parent_path).parent.joinpath(sheet_file).resolve()
+
+
+def load_sheets(root_path, parse=parse_sheet, max_workers=None, use_processes=False):
+    # Parses the root schematic and every sheet reachable from it. Each file is parsed once,
+    # no matter how many times it is instantiated. Sheets of the same level are parsed concurrently.
+    # `parse`: parse(path, project) --> sheet dict, see `sch_parser.parse_sheet`
+    # `use_processes`: a process pool scales with cores, but can't be used inside KiCad
+    #                  (the interpreter is embedded, there is no python executable to spawn)
+    # SAMPLE OUTPUT
+    # {
+    # PosixPath('/project/board.kicad_sch'): {'uuid': ..., 'symbols': {...}, 'sheets': [...], ...},
+    # PosixPath('/project/power.kicad_sch'): {...},
+    # }
+    root_path = pathlib.Path(root_path).resolve()
+    project = root_path.stem
+    sheets = {}
+    pending = [root_path]
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_cls(max_workers=max_workers) as executor:
+        while pending:
+            discovered = []
+            results = executor.map(parse, [str(_) for _ in pending], [project] * len(pending))
+            for path, sheet in zip(pending, results):
+                sheets[path] = sheet
+                for sub_sheet in sheet['sheets']:
+                    if not sub_sheet['file']:
+                        continue
+                    sub_path = sheet_file_path(path, sub_sheet['file'])
+                    if sub_path not in sheets and sub_path not in pending and sub_path not in discovered:
+                        discovered.append(sub_path)
+            pending = discovered
+    return sheets
+
+
+def _with_reference(properties: list, instance):
+    # the `Reference` stored in a reused sheet belongs to one of its instances only
+    if not instance or 'reference' not in instance:
+        return properties
+    reference = instance['reference']
+    for _prop in properties:
+        if _prop['name'] == 'Reference':
+            if _prop['value'] == reference:
+                return properties
+            break
+    return [{'name': _prop['name'], 'value': reference} if _prop['name'] == 'Reference' else _prop
+            for _prop in properties]
+
+
+def iter_symbol_instances(sheets: dict, root_path):
+    # Yields (key, properties) for every symbol instance of the design.
+    # Symbols of the root sheet are keyed by their uuid (same as `get_symbol_dict`),
+    # symbols of sub-sheets by their sheet path: '/<sheet uuid>/.../<symbol uuid>'.
+    root_path = pathlib.Path(root_path).resolve()
+    root = sheets[root_path]
+    root_uuid = root['uuid']
+    kicad6_instances = root['symbol_instances']
+
+    def walk(path, sheet_path: str, ancestors: set):
+        sheet = sheets[path]
+        kicad7_path = '/{u}{p}'.format(u=root_uuid, p=sheet_path)
+        for uuid, properties in sheet['symbols'].items():
+            key = '{p}/{u}'.format(p=sheet_path, u=uuid) if sheet_path else uuid
+            instance = sheet['instances'].get(uuid, {}).get(kicad7_path) \
+                or kicad6_instances.get('{p}/{u}'.format(p=sheet_path, u=uuid))
+            yield key, _with_reference(properties, instance)
+        for sub_sheet in sheet['sheets']:
+            if not sub_sheet['file'] or not sub_sheet['uuid']:
+                continue
+            sub_path = sheet_file_path(path, sub_sheet['file'])
+            if sub_path in ancestors or sub_path not in sheets:  # a sheet can't contain itself
+                continue
+            yield from walk(sub_path, '{p}/{u}'.format(p=sheet_path, u=sub_sheet['uuid']), ancestors | {sub_path})
+
+    yield from walk(root_path, '', {root_path})
+
+
+def _load_hierarchy(kicad_sch_path, max_workers, use_processes, cache):
+    parse = cache.parse_sheet if cache is not None else parse_sheet
+    sheets = load_sheets(kicad_sch_path, parse=parse, max_workers=max_workers, use_processes=use_processes)
+    return iter_symbol_instances(sheets, kicad_sch_path)
+
+
+def get_hierarchy_symbol_dict(kicad_sch_path, max_workers=None, use_processes=False, cache=None):
+    # same as `utils.get_symbol_dict`, for the whole hierarchy of the root schematic `kicad_sch_path`
+    # `cache`: a `sch_cache.SheetCache`, only sheets modified since they were cached are parsed
+    # SAMPLE OUTPUT
+    # {
+    # '00000000-0000-0000-0000-00006319aa5a': [{'name': 'Reference', 'value': 'R1'}, ...],  # root sheet
+    # '/9a1b.../0b9e...': [{'name': 'Reference', 'value': 'R101'}, ...],  # 1st instance of a sub-sheet
+    # '/7c2d.../0b9e...': [{'name': 'Reference', 'value': 'R201'}, ...],  # 2nd instance of the same sheet
+    # }
+    return dict(_load_hierarchy(kicad_sch_path, max_workers, use_processes, cache))
+
+
+def get_hierarchy_symbol_table(kicad_sch_path, max_workers=None, use_processes=False, cache=None):
+    # same content as `get_hierarchy_symbol_dict`, as a column store (see `symbol_table`)
+    return SymbolTable.from_items(_load_hierarchy(kicad_sch_path, max_workers, use_processes, cache))
@@ -0,0 +1,88 @@
+from .sch_cache import SheetCache, user_cache_dir
+from .sch_parser import CHUNK_SIZE, index_entry, iter_items, symbol_record
+
+# Byte-offset index of the symbols of a .kicad_sch file: where each `(symbol ...)` block starts in the file,
+# its length, a hash of its bytes and the names of its fields. With it, a few symbols can be read again
+# with a seek instead of a pass over the file, and the symbols changed by a save are found by comparing
+# block hashes. Indexes are kept in the user cache dir (`IndexCache`), one entry per sheet file,
+# next to the parse cache.
+#
+# SAMPLE OUTPUT (`build_index`)
+# {
+# '0b9e...': {'offset': 10523, 'length': 1384, 'hash': 'a94a8fe5...', 'fields': ['Reference', 'Value', ...]},
+# '77aa...': {'offset': 11907, 'length': 1391, 'hash': '9d4e1e23...', 'fields': ['Reference', 'Value', ...]},
+# }
+
+_SYMBOL_HEAD = b'(symbol'
+
+
+def build_index(kicad_sch_path, project=None, chunk_size=CHUNK_SIZE):
+    # uuid: `sch_parser.index_entry` of every symbol placed in the schematic
+    # `project` isn't used, same signature as `sch_parser.parse_sheet`
+    index = {}
+    with open(kicad_sch_path, 'r', encoding='utf-8', newline='') as fi:
+        for _head, text, offset in iter_items(fi, ('symbol',), chunk_size, offsets=True):
+            uuid, properties = symbol_record(text)
+            if uuid:
+                index[uuid] = index_entry(text, offset, properties)
+    return index
+
+
+def read_symbols(kicad_sch_path, index: dict, uuids=None):
+    # --> {uuid: properties} of `uuids` (all the symbols of `index` by default), as `sch_parser.iter_symbols`
+    # Blocks are read in file order, with one seek each. Raises ValueError if `index` is stale.
+    entries = sorted((index[_uuid]['offset'], _uuid) for _uuid in (index if uuids is None else uuids))
+    symbols = {}
+    with open(kicad_sch_path, 'rb') as fi:
+        for offset, uuid in entries:
+            entry = index[uuid]
+            fi.seek(offset)
+            data = fi.read(entry['length'])
+            if not data.startswith(_SYMBOL_HEAD) or len(data) != entry['length']:
+                raise ValueError('Stale symbol index for {p}'.format(p=kicad_sch_path))
+            record_uuid, properties = symbol_record(data.decode('utf-8'))
+            if record_uuid != uuid:
+                raise ValueError('Stale symbol index for {p}'.format(p=kicad_sch_path))
+            symbols[uuid] = properties
+    return symbols
+
+
+def read_symbol(kicad_sch_path, index: dict, uuid: str):
+    # --> properties of one symbol, see `read_symbols`
+    return read_symbols(kicad_sch_path, index, (uuid,))[uuid]
+
+
+def diff_index(previous: dict, current: dict):
+    # --> (added, modified, removed) uuids, a symbol is modified when the bytes of its block changed
+    # (a symbol only moved in the file, e.g. after a symbol before it was edited, isn't)
+    added = []
+    modified = []
+    for uuid, entry in current.items():
+        old = previous.get(uuid)
+        if old is None:
+            added.append(uuid)
+        elif old['hash'] != entry['hash']:
+            modified.append(uuid)
+    removed = [_uuid for _uuid in previous if _uuid not in current]
+    return added, modified, removed
+
+
+class IndexCache(SheetCache):
+    # `SheetCache` of symbol indexes instead of parsed sheets, in <user cache dir>/index by default.
+    # One entry per file (not per project), validated the same way as parsed sheets.
+    def __init__(self, cache_dir=None, **kwargs):
+        kwargs.setdefault('parse', build_index)
+        SheetCache.__init__(self, cache_dir or user_cache_dir().joinpath('index'), **kwargs)
+
+    def index(self, path):
+        # --> the index of `path`, built if it's not in the cache or stale
+        return self.parse_sheet(path)
+
+    def update(self, path):
+        # --> (index, (added, modified, removed)): the index of `path`, and the symbols changed since the
+        # index that was stored, even if `path` was saved since then (every symbol is added if none was)
+        entry = self.read_entry(path)
+        index = self.index(path)
+        previous = entry[1] if entry is not None else {}
+        return index, diff_index(previous, index)
+
@@ -0,0 +1,67 @@
+import mmap
+import re
+
+# Memory-mapped scanning of .kicad_sch files, for the largest (usually generated) schematics.
+# The file is never read into Python strings: compiled bytes regexes run directly over the mapping,
+# and only the uuids, property names and property values that are kept get decoded.
+#
+# Unlike `sch_parser`, parentheses are not balanced. A symbol runs from its `(symbol (lib_id ...`
+# to the next top-level item that can carry properties, which relies on the order Eeschema writes
+# items in: the embedded library (`lib_symbols`) first, then graphic items, symbols and sheets.
+
+_STRING_BODY = rb'[^"\\]*(?:\\.[^"\\]*)*'
+
+_SCAN_RE = re.compile(
+    # a single literal prefix lets the regex engine jump from one '(' to the next
+    rb'\((?:'
+    # 1: a placed symbol (library symbols have no `lib_id`), KiCad 7 may write `lib_name` first
+    rb'(symbol\s+\((?:lib_name\s+"' + _STRING_BODY + rb'"\s*\)\s*\()?lib_id[\s"])'
+    # 2, 3: name and value of a property
+    rb'|property\s+"(' + _STRING_BODY + rb')"\s+"(' + _STRING_BODY + rb')"'
+    # anything else with properties ends the current symbol
+    rb'|(?:sheet|global_label|hierarchical_label|label|netclass_flag|directive_label'
+    rb'|text|text_box|table|rule_area)[\s()])')
+_UUID_RE = re.compile(rb'\(uuid\s+"?([^\s()"]+)')
+_ESCAPE_RE = re.compile(rb'\\(.)', re.S)
+
+
+def _unescape(m):
+    c = m.group(1)
+    return b'\n' if c == b'n' else c
+
+
+def _decode(b: bytes):
+    if b'\\' in b:
+        b = _ESCAPE_RE.sub(_unescape, b)
+    return b.decode('utf-8')
+
+
+def get_symbol_dict_mmap(kicad_sch_path):
+    # same output as `utils.get_symbol_dict`
+    symbols = {}
+    with open(kicad_sch_path, 'rb') as fi:
+        try:
+            mm = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return symbols
+        try:
+            properties = None
+            for m in _SCAN_RE.finditer(mm):
+                if m.start(1) >= 0:
+                    um = _UUID_RE.search(mm, m.end())
+                    properties = None
+                    if um:
+                        properties = []
+                        symbols[um.group(1).decode('ascii')] = properties
+                elif m.start(2) >= 0:
+                    if properties is not None:
+                        properties.append({
+                            'name': _decode(m.group(2)),
+                            'value': _decode(m.group(3)),
+                        })
+                else:
+                    properties = None
+        finally:
+            m = um = None  # matches must not outlive the mapping
+            mm.close()
+    return symbols
@@ -0,0 +1,327 @@
+import hashlib
+import re
+
+# Streaming S-expression reader for .kicad_sch files.
+# The file is read in fixed-size chunks and walked one top-level item at a time
+# (direct children of `(kicad_sch ...)`), so memory stays flat no matter how big the schematic is.
+# Nothing depends on the whitespace layout of the file: KiCad 6/7 pretty-printed,
+# KiCad 8 one-item-per-line and minified files are all read the same way.
+
+CHUNK_SIZE = 64 * 1024
+
+_STRING_BODY = r'[^"\\]*(?:\\.[^"\\]*)*'
+_STRING = '"' + _STRING_BODY + '"'
+_ATOM = r'[^\s()"]+'
+
+
+def _balanced_list_pattern(max_depth: int):
+    # a balanced list nested at most `max_depth` levels, strings may contain parentheses.
+    # Written as "unrolled loops" so that a failed match backtracks in linear time.
+    pattern = r'\([^()"]*(?:' + _STRING + r'[^()"]*)*\)'
+    for _ in range(max_depth - 1):
+        pattern = r'\([^()"]*(?:(?:' + _STRING + '|' + pattern + r')[^()"]*)*\)'
+    return pattern
+
+
+# one regex match skips/collects a whole item, deeper items go through `_SCAN_RE` instead
+_LIST_RE = re.compile(_balanced_list_pattern(10))
+_SCAN_RE = re.compile(r'[()]|' + _STRING + r'|"')
+# what comes next inside a list: an opening parenthesis and the head of the list, a closing one, or an atom
+_NEXT_RE = re.compile(r'\s*(?:(\()\s*(' + _ATOM + r')?|(\))|(' + _STRING + '|' + _ATOM + '))')
+_TOKEN_RE = re.compile(r'[()]|' + _STRING + '|' + _ATOM)
+_ESCAPE_RE = re.compile(r'\\(.)', re.S)
+
+# KiCad always writes property names and values as quoted strings, and escapes quotes inside strings,
+# so `(property "` can only be the start of a property, never part of a value.
+_PROPERTY_RE = re.compile(r'\(property\s+"(' + _STRING_BODY + r')"\s+"(' + _STRING_BODY + ')"')
+# the first `(uuid` of a symbol is its own, pins and instances come after it
+_UUID_RE = re.compile(r'\(uuid\s+(' + _STRING + '|' + _ATOM + ')')
+_INSTANCES_RE = re.compile(r'\(instances[\s()]')
+# `(project "name"`, or `(path "/a/b"` and the flat items that follow, e.g. `(reference "R1") (unit 1)`
+_INSTANCE_RE = re.compile(r'\((?:project\s+"(' + _STRING_BODY + r')"|path\s+"(' + _STRING_BODY + r')"'
+                          r'((?:\s*\([^()"]*(?:' + _STRING + r'[^()"]*)*\))*))')
+_FIELD_RE = re.compile(r'\((' + _ATOM + r')\s+(' + _STRING + '|' + _ATOM + ')')
+
+# KiCad 6 / KiCad 7+
+SHEET_NAME_FIELDS = ('Sheet name', 'Sheetname')
+SHEET_FILE_FIELDS = ('Sheet file', 'Sheetfile')
+
+
+def _unescape(m):
+    c = m.group(1)
+    return '\n' if c == 'n' else c
+
+
+def unescape(s: str):
+    # 'inch \\"10\\"' --> 'inch "10"'
+    if '\\' in s:
+        s = _ESCAPE_RE.sub(_unescape, s)
+    return s
+
+
+def unquote(token: str):
+    # '"Digikey Part Number"' --> 'Digikey Part Number'
+    # '"10\\" rack"' --> '10" rack'
+    # 'yes' --> 'yes' (atoms are returned as they are)
+    if not token.startswith('"'):
+        return token
+    return unescape(token[1:-1])
+
+
+def parse_sexpr(text: str):
+    # '(pin "1" (uuid 0b9e))' --> ['pin', '1', ['uuid', '0b9e']]
+    stack = [[]]
+    for tok in _TOKEN_RE.findall(text):
+        if tok == '(':
+            node = []
+            stack[-1].append(node)
+            stack.append(node)
+        elif tok == ')':
+            if len(stack) == 1:
+                raise ValueError('Unbalanced parentheses')
+            stack.pop()
+        else:
+            stack[-1].append(unquote(tok))
+    if len(stack) != 1 or not stack[0]:
+        raise ValueError('Unbalanced parentheses')
+    return stack[0][0]
+
+
+class _ChunkReader:
+    # A window over a text file. `buf[pos:]` is the unread part, it grows on demand
+    # and everything before `pos` is dropped, so only the current item is ever held in memory.
+    # `offsets`: keep track of the position in bytes of the window in the file, see `byte_offset`
+    def __init__(self, fi, chunk_size, offsets=False):
+        self.fi = fi
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.offsets = offsets
+        self.mark = 0  # a position in `buf`...
+        self.mark_offset = 0  # ...and its offset in bytes in the file
+
+    def fill(self, size=None):
+        chunk = self.fi.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+        if self.offsets:
+            self.byte_offset(self.pos)
+            self.mark = 0
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def byte_offset(self, pos: int):
+        # offset in the file of `buf[pos]`, only the text since the previous call is encoded again
+        # `pos` never goes backwards, it is at most the current position
+        gap = self.buf[self.mark:pos]
+        self.mark_offset += len(gap) if gap.isascii() else len(gap.encode('utf-8'))
+        self.mark = pos
+        return self.mark_offset
+
+    def match(self, regex):
+        # a match that reaches the end of the buffer could continue in the next chunk
+        while True:
+            m = regex.match(self.buf, self.pos)
+            if self.eof or (m is not None and m.end() < len(self.buf)):
+                return m
+            self.fill()
+
+    def read_list(self):
+        # `pos` is at '(', returns the text of the whole list and moves past it
+        m = _LIST_RE.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return m.group()
+        # nested too deep for `_LIST_RE`, or not entirely in the buffer yet
+        depth, end = _scan_list(self.buf, self.pos, 0)
+        size = self.chunk_size
+        while depth:
+            if self.eof:
+                raise ValueError('Unbalanced parentheses in the schematic file')
+            # a big item: read ahead more and more, and resume the scan where it stopped
+            offset = end - self.pos
+            self.fill(size)
+            size *= 2
+            depth, end = _scan_list(self.buf, self.pos + offset, depth)
+        text = self.buf[self.pos:end]
+        self.pos = end
+        return text
+
+    def skip_list(self):
+        # `pos` is at '(', moves past the whole list without keeping it
+        m = _LIST_RE.match(self.buf, self.pos)
+        if m is not None:
+            self.pos = m.end()
+            return
+        depth = 0
+        while True:
+            depth, self.pos = _scan_list(self.buf, self.pos, depth)
+            if depth == 0:
+                return
+            if self.eof:
+                raise ValueError('Unbalanced parentheses in the schematic file')
+            self.fill()
+
+
+def _scan_list(buf: str, pos: int, depth: int):
+    # Walks parentheses from `pos` until `depth` gets back to 0.
+    # Returns (0, end of the list), or (depth, where to resume) when the list goes on in the next chunk.
+    for m in _SCAN_RE.finditer(buf, pos):
+        tok = m.group()
+        if tok == '(':
+            depth += 1
+        elif tok == ')':
+            depth -= 1
+            if depth == 0:
+                return 0, m.end()
+        elif tok == '"':  # unterminated string, continues in the next chunk
+            return depth, m.start()
+        pos = m.end()
+    return depth, pos
+
+
+def iter_items(fi, heads, chunk_size=CHUNK_SIZE, offsets=False):
+    # Yields the top-level items of a schematic (direct children of `(kicad_sch ...)`)
+    # whose head is in `heads`, as (head, text). Other items are skipped.
+    # `fi`: a text file object
+    # `offsets`: yields (head, text, offset in bytes of the item in the file) instead,
+    #            `fi` must then be opened with newline='' (no translation of line endings) and read from the start
+    # SAMPLE OUTPUT (heads={'symbol'}):
+    # ('symbol', '(symbol (lib_id "Device:R") (at 90.17 80.645 0) (unit 1)\n'
+    #            '    (in_bom yes) (on_board yes) (fields_autoplaced)\n'
+    #            '    (uuid 00000000-0000-0000-0000-00006319aa5a)\n'
+    #            '    (property "Reference" "R2" (at 92.71 79.375 0)\n ...')
+    reader = _ChunkReader(fi, chunk_size, offsets)
+    depth = 0
+    while True:
+        m = reader.match(_NEXT_RE)
+        if m is None:
+            if reader.buf[reader.pos:].strip():
+                raise ValueError('Unexpected content in the schematic file')
+            break
+        if m.group(1) and depth == 1:  # a top-level item
+            reader.pos = m.start(1)
+            if m.group(2) in heads:
+                if offsets:
+                    offset = reader.byte_offset(reader.pos)
+                    yield m.group(2), reader.read_list(), offset
+                else:
+                    yield m.group(2), reader.read_list()
+            else:
+                reader.skip_list()
+            continue
+        reader.pos = m.end()
+        if m.group(1):
+            depth += 1
+        elif m.group(3):
+            depth -= 1
+    if depth != 0:
+        raise ValueError('Unbalanced parentheses in the schematic file')
+
+
+def symbol_record(text: str):
+    # '(symbol (lib_id "Device:R") ... (uuid X) (property "Reference" "R2" ...) ...)'
+    # --> ('X', [{'name': 'Reference', 'value': 'R2'}, ...])
+    m = _UUID_RE.search(text)
+    uuid = unquote(m.group(1)) if m else None
+    properties = []
+    for _name, _value in _PROPERTY_RE.findall(text):
+        properties.append({
+            'name': unescape(_name) if '\\' in _name else _name,
+            'value': unescape(_value) if '\\' in _value else _value,
+        })
+    return uuid, properties
+
+
+def index_entry(text: str, offset: int, properties: list):
+    # where a symbol is in its file, see `sch_index`
+    # '(symbol ... (property "Reference" "R2" ...) ...)' at 10523
+    # --> {'offset': 10523, 'length': 1384, 'hash': 'a94a8fe5...', 'fields': ['Reference', ...]}
+    data = text.encode('utf-8')
+    return {
+        'offset': offset,
+        'length': len(data),
+        'hash': hashlib.sha1(data).hexdigest(),
+        'fields': [_prop['name'] for _prop in properties],
+    }
+
+
+def iter_symbols(kicad_sch_path, chunk_size=CHUNK_SIZE):
+    # Yields (uuid, properties) for every symbol placed in the schematic, in file order.
+    # Symbols of the embedded library (`lib_symbols`) are not top-level items, they are skipped.
+    with open(kicad_sch_path, 'r', encoding='utf-8') as fi:
+        for _head, text in iter_items(fi, ('symbol',), chunk_size):
+            uuid, properties = symbol_record(text)
+            if uuid:
+                yield uuid, properties
+
+
+def _instance_paths(text: str, project=None):
+    # KiCad 7+: '(instances (project "name" (path "/root-uuid/sheet-uuid" (reference "R1") (unit 1))))'
+    # KiCad 6: '(symbol_instances (path "/sheet-uuid/symbol-uuid" (reference "R1") (unit 1) ...))'
+    # --> {'/root-uuid/sheet-uuid': {'reference': 'R1', 'unit': '1'}}
+    paths = {}
+    by_project = {}
+    for m in _INSTANCE_RE.finditer(text):
+        if m.group(1) is not None:
+            paths = by_project.setdefault(unescape(m.group(1)), {})
+        else:
+            paths[unescape(m.group(2))] = {_k: unquote(_v) for _k, _v in _FIELD_RE.findall(m.group(3))}
+    if not by_project:
+        return paths
+    # a sheet shared between projects carries the instances of each of them
+    if project in by_project:
+        return by_project[project]
+    return next(iter(by_project.values()))
+
+
+def _symbol_instances(text: str, project=None):
+    m = _INSTANCES_RE.search(text)
+    if not m:
+        return {}
+    return _instance_paths(text[m.start():], project)
+
+
+def parse_sheet(kicad_sch_path, project=None, chunk_size=CHUNK_SIZE):
+    # Everything the hierarchy walker needs from one .kicad_sch file, in one pass.
+    # `project`: name of the project, picks the right instances of sheets shared between projects.
+    # SAMPLE OUTPUT
+    # {
+    # 'uuid': 'e3e70682-c209-4cac-a29f-6fbed82c07cd',  # None for KiCad 6 sub-sheets
+    # 'symbols': {'0b9e...': [{'name': 'Reference', 'value': 'R2'}, ...], ...},
+    # 'instances': {'0b9e...': {'/e3e7.../9a1b...': {'reference': 'R2', 'unit': '1'}}, ...},  # KiCad 7+
+    # 'sheets': [{'uuid': '9a1b...', 'name': 'Power', 'file': 'power.kicad_sch'}, ...],
+    # 'symbol_instances': {'/9a1b.../0b9e...': {'reference': 'R2', 'unit': '1', ...}},  # KiCad 6, root only
+    # }
+    sheet = {
+        'uuid': None,
+        'symbols': {},
+        'instances': {},
+        'sheets': [],
+        'symbol_instances': {},
+    }
+    heads = ('symbol', 'sheet', 'uuid', 'symbol_instances')
+    with open(kicad_sch_path, 'r', encoding='utf-8') as fi:
+        for head, text in iter_items(fi, heads, chunk_size):
+            if head == 'symbol':
+                uuid, properties = symbol_record(text)
+                if uuid:
+                    sheet['symbols'][uuid] = properties
+                    instances = _symbol_instances(text, project)
+                    if instances:
+                        sheet['instances'][uuid] = instances
+            elif head == 'sheet':
+                uuid, properties = symbol_record(text)
+                fields = {_['name']: _['value'] for _ in properties}
+                sheet['sheets'].append({
+                    'uuid': uuid,
+                    'name': next((fields[_] for _ in SHEET_NAME_FIELDS if _ in fields), ''),
+                    'file': next((fields[_] for _ in SHEET_FILE_FIELDS if _ in fields), ''),
+                })
+            elif head == 'uuid':
+                sheet['uuid'] = parse_sexpr(text)[1]
+            elif head == 'symbol_instances':
+                sheet['symbol_instances'] = _instance_paths(text)
+    return sheet
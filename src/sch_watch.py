@@ -0,0 +1,175 @@
+import os
+import pathlib
+import threading
+from .sch_hierarchy import load_sheets, iter_symbol_instances, sheet_file_path
+from .sch_parser import parse_sheet
+from .symbol_table import SymbolTable
+
+# Follows the sheets of a design while the dialog is open, so that part numbers fixed in Eeschema
+# show up without reopening it. Sheet files are polled (mtime and size, no extra dependency):
+# a modified sheet is parsed again once it stopped changing for one poll (Eeschema may still be writing it),
+# the other sheets are not read. Symbols are then compared by key (uuid, or sheet path for sub-sheets)
+# with the previous state, and only the parts of the symbols that changed are grouped again.
+#
+# Threads: `poll` runs in the watch thread and only touches the watcher,
+# `apply_change` updates the SymbolTable of the dialog, in the UI thread.
+#
+# SAMPLE OUTPUT (`poll`)
+# {
+# 'sheets': [PosixPath('/project/power.kicad_sch')],  # parsed again
+# 'added': {'/9a1b.../77aa...': [{'name': 'Reference', 'value': 'C12'}, ...]},
+# 'modified': {'/9a1b.../0b9e...': [{'name': 'Reference', 'value': 'R2'}, ...]},  # new properties
+# 'removed': ['/9a1b.../5c3d...'],
+# 'previous': {'/9a1b.../0b9e...': [...], '/9a1b.../5c3d...': [...]},  # properties before the change
+# }
+
+POLL_INTERVAL = 1.0  # s
+
+
+def file_stat(path):
+    # --> (mtime, size), None if the file doesn't exist
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def diff_symbols(previous: dict, current: dict):
+    # --> (added, modified, removed), see `poll`
+    # symbols of unchanged sheets are the same objects as before, they are not compared value by value
+    added = {}
+    modified = {}
+    for key, properties in current.items():
+        old = previous.get(key)
+        if old is None:
+            added[key] = properties
+        elif old is not properties and old != properties:
+            modified[key] = properties
+    removed = [_key for _key in previous if _key not in current]
+    return added, modified, removed
+
+
+def affected_part_numbers(change: dict, pn_field: str):
+    # part numbers whose rows change, before and after the change, in the `pn_field` column
+    part_numbers = {}
+    for properties in list(change['previous'].values()) + list(change['added'].values()) \
+            + list(change['modified'].values()):
+        for _prop in properties:
+            if _prop['name'] == pn_field:
+                if _prop['value']:
+                    part_numbers[_prop['value']] = None
+    return list(part_numbers)
+
+
+def apply_change(table: SymbolTable, change: dict):
+    # the symbols of `table` as they are after `change`
+    for key in change['removed']:
+        table.remove(key)
+    for key, properties in change['modified'].items():
+        table.add(key, properties)
+    for key, properties in change['added'].items():
+        table.add(key, properties)
+
+
+class SchematicWatcher:
+    def __init__(self, kicad_sch_path, parse=parse_sheet):
+        # `parse`: parse(path, project) --> sheet dict, e.g. `SheetCache.parse_sheet`
+        self.root_path = pathlib.Path(kicad_sch_path).resolve()
+        self.project = self.root_path.stem
+        self.parse = parse
+        self.sheets = {}  # path: sheet dict, see `sch_hierarchy.load_sheets`
+        self.stats = {}  # path: `file_stat` when it was parsed
+        self.symbols = {}  # key: properties, as of the last `load` or `poll`
+        self._pending = {}  # path: `file_stat` of a modified sheet, parsed when it doesn't change anymore
+        self._lock = threading.Lock()  # `load_sheets` parses in threads
+        self._poll_lock = threading.Lock()  # one poll at a time, e.g. watch stopped and started again
+
+    def parse_sheet(self, path, project=None):
+        # `parse`, and the file stats to compare with on the next `poll`
+        # stats are taken before reading: a change during the read is seen by the next poll
+        stat = file_stat(path)
+        sheet = self.parse(path, project)
+        with self._lock:
+            self.stats[pathlib.Path(path).resolve()] = stat
+        return sheet
+
+    def load(self, parse=None):
+        # parses every sheet, `parse` must call `parse_sheet`, e.g. to report progress
+        self.sheets = load_sheets(self.root_path, parse=parse or self.parse_sheet)
+        return self.sheets
+
+    def symbol_table(self):
+        # --> SymbolTable of the loaded sheets
+        self.symbols = dict(iter_symbol_instances(self.sheets, self.root_path))
+        return SymbolTable.from_items(self.symbols.items())
+
+    def modified_sheets(self):
+        # --> paths of the sheets modified since they were parsed, that stopped changing
+        modified = []
+        for path, stat in list(self.stats.items()):
+            new_stat = file_stat(path)
+            if new_stat == stat or new_stat is None:  # deleted, or being replaced: seen at a next poll
+                self._pending.pop(path, None)
+            elif self._pending.get(path) == new_stat:
+                modified.append(path)
+            else:
+                self._pending[path] = new_stat
+        return modified
+
+    def poll(self, on_change=None):
+        # --> the change of the symbols since the last `load` or `poll`, None if nothing changed
+        # `on_change`: on_change(change), called before the next poll can start, so changes are seen in order
+        with self._poll_lock:
+            change = self._poll()
+            if change is not None and on_change is not None:
+                on_change(change)
+            return change
+
+    def _poll(self):
+        paths = self.modified_sheets()
+        if not paths:
+            return None
+        parsed = []
+        for path in paths:
+            stat = self._pending.pop(path)
+            try:
+                self.sheets[path] = self.parse_sheet(str(path), self.project)
+            except Exception:  # not readable as it is, tried again at the next change
+                self.stats[path] = stat
+                continue
+            parsed.append(path)
+        if not parsed:
+            return None
+        self._load_new_sheets()
+        symbols = dict(iter_symbol_instances(self.sheets, self.root_path))
+        added, modified, removed = diff_symbols(self.symbols, symbols)
+        previous = {_key: self.symbols[_key] for _key in list(modified) + removed}
+        self.symbols = symbols
+        if not added and not modified and not removed:
+            return None
+        return {'sheets': parsed, 'added': added, 'modified': modified, 'removed': removed, 'previous': previous}
+
+    def _load_new_sheets(self):
+        # sheets added to the design by the change are parsed, sheets not used anymore are forgotten
+        reachable = set()
+        pending = [self.root_path]
+        while pending:
+            path = pending.pop()
+            if path in reachable:
+                continue
+            reachable.add(path)
+            if path not in self.sheets:
+                try:
+                    self.sheets[path] = self.parse_sheet(str(path), self.project)
+                except Exception:  # e.g. not saved yet: watched, parsed when it is
+                    self.stats.setdefault(path, None)
+                    continue
+            for sub_sheet in self.sheets[path]['sheets']:
+                if sub_sheet['file']:
+                    pending.append(sheet_file_path(path, sub_sheet['file']))
+        for path in set(self.sheets) | set(self.stats):
+            if path not in reachable:
+                self.sheets.pop(path, None)
+                self.stats.pop(path, None)
+                self._pending.pop(path, None)
@@ -0,0 +1,84 @@
+import numpy as np
+from .utils import _CHAR_AND_LENGTH_RE, _PACKAGING_SUFFIXES, score_field_value_as_part_number
+
+# NumPy version of `utils.score_field_value_as_part_number`, for a whole column of values at once.
+# Only imported when NumPy is installed (it isn't bundled with every KiCad), see
+# `utils.score_field_values_as_part_number`.
+#
+# Values are stored as a fixed-width bytes array: the case and suffix tests run as `np.char`
+# string operations, the character-class test as a lookup over the matrix of bytes.
+# The kernel covers ASCII. The rest is scored one by one: non-ASCII (`upper()` can change
+# the length), newlines (`$` also matches before a final '\n'), trailing NULs (NumPy strips them),
+# and values longer than MAX_WIDTH (so one long value doesn't widen the whole array).
+
+MAX_WIDTH = 64
+
+# characters accepted by the character-class test, indexed by byte
+_ALLOWED = np.array([_ < 128 and bool(_CHAR_AND_LENGTH_RE.match(chr(_))) for _ in range(256)])
+_PACKAGING_SUFFIXES_BYTES = [_.encode('ascii') for _ in _PACKAGING_SUFFIXES]
+
+
+def _as_bytes(array, n):
+    # fixed-width bytes array --> (n, width) matrix of uint8
+    return array.view(np.uint8).reshape(n, array.dtype.itemsize)
+
+
+def score_values(field_values):
+    # same as `[score_field_value_as_part_number(_) for _ in field_values]`, as an int64 array
+    n = len(field_values)
+    scores = np.zeros(n, dtype=np.int64)
+    if not n:
+        return scores
+    lengths = np.fromiter(map(len, field_values), dtype=np.int64, count=n)
+    one_by_one = lengths > MAX_WIDTH
+    values = None
+    if not one_by_one.any():
+        try:
+            values = np.array(field_values, dtype=bytes)
+        except UnicodeEncodeError:
+            pass
+    if values is None:
+        one_by_one |= np.fromiter((not _v.isascii() for _v in field_values), dtype=bool, count=n)
+        values = np.array([b'' if _skip else _v.encode('ascii')
+                           for _v, _skip in zip(field_values, one_by_one.tolist())], dtype=bytes)
+        lengths = np.where(one_by_one, 0, lengths)
+    one_by_one |= np.char.str_len(values) != lengths
+    one_by_one |= np.char.find(values, b'\n') >= 0
+
+    # upper/lower case
+    scores += 20 * np.char.isupper(values)
+
+    # known allowed characters
+    chars = _as_bytes(values, n)
+    padding = np.arange(chars.shape[1]) >= lengths[:, None]
+    allowed = (_ALLOWED[chars] | padding).all(axis=1)
+    scores += 10 * (allowed & (lengths >= 1) & (lengths <= 49))
+
+    # length
+    scores += np.select(
+        [(lengths >= 11) & (lengths <= 24),
+         (lengths == 10) | ((lengths >= 25) & (lengths <= 31)),
+         ((lengths >= 8) & (lengths <= 9)) | ((lengths >= 32) & (lengths <= 37))],
+        [10, 5, 2], 0)
+
+    # known regexes
+    upper_chars = chars - (((chars >= ord('a')) & (chars <= ord('z'))).view(np.uint8) << 5)
+    fv = upper_chars.view(values.dtype).reshape(n)  # upper()
+    nd = np.char.endswith(fv, b'-ND')
+    scores += 50 * nd
+    nd_rows = np.flatnonzero(nd)
+    packaging = np.zeros(len(nd_rows), dtype=bool)
+    for suffix in _PACKAGING_SUFFIXES_BYTES:
+        packaging |= np.char.endswith(fv[nd_rows], suffix)
+    scores[nd_rows] += 10 * packaging
+    # categorized: 1 to 4 digits, a dash, anything, then -ND
+    head = np.zeros((n, 6), dtype=np.uint8)
+    head[:, :min(6, upper_chars.shape[1])] = upper_chars[:, :6]
+    leading = np.argmin((head >= ord('0')) & (head <= ord('9')), axis=1)
+    categorized = nd & (leading >= 1) & (leading <= 4) \
+        & (head[np.arange(n), leading] == ord('-')) & (lengths - 3 > leading)
+    scores += 10 * categorized
+
+    for i in np.flatnonzero(one_by_one).tolist():
+        scores[i] = score_field_value_as_part_number(field_values[i])
+    return scores
@@ -0,0 +1,154 @@
+import sys
+from array import array
+from collections.abc import Mapping
+
+# Column store for the symbols of a design.
+# `get_symbol_dict` returns {uuid: [{'name': ..., 'value': ...}, ...]}: one dict per property per symbol,
+# and every consumer walks those lists again to find a field. Here each field is one column
+# (a list with one value per symbol, None when the symbol doesn't have the field), field names are
+# interned, and rows are found by uuid in O(1).
+#
+# A SymbolTable is also a read-only Mapping with the same shape as the symbol dict,
+# so existing callers keep working: table[uuid] builds the property list of that symbol on demand.
+
+
+class SymbolRow:
+    """ One symbol of a SymbolTable: row[field_name] --> value, or None """
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index: int):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, field_name: str):
+        column = self.table.columns.get(field_name)
+        return None if column is None else column[self.index]
+
+    def get(self, field_name: str, default=None):
+        value = self[field_name]
+        return default if value is None else value
+
+    @property
+    def uuid(self):
+        return self.table.uuids[self.index]
+
+    def properties(self):
+        return self.table.properties(self.index)
+
+
+class SymbolTable(Mapping):
+    __slots__ = ('fields', 'columns', 'uuids', 'index', '_layouts', '_layout_ids', '_row_layouts')
+
+    def __init__(self):
+        self.fields = []  # field names, in order of first appearance
+        self.columns = {}  # field name: [value of row 0, value of row 1, ...]
+        self.uuids = []  # row: uuid
+        self.index = {}  # uuid: row
+        # field order of each row, to give back properties in file order.
+        # Symbols from the same library share a layout, so a row only stores a small layout id.
+        self._layouts = []
+        self._layout_ids = {}
+        self._row_layouts = array('I')
+
+    @classmethod
+    def from_items(cls, items):
+        # `items`: (uuid, properties) pairs, e.g. `sch_parser.iter_symbols(path)`
+        table = cls()
+        for uuid, properties in items:
+            table.add(uuid, properties)
+        return table
+
+    @classmethod
+    def from_symbol_dict(cls, symbol_dict: dict):
+        if isinstance(symbol_dict, cls):
+            return symbol_dict
+        return cls.from_items(symbol_dict.items())
+
+    def add(self, uuid, properties: list):
+        # same as symbol_dict[uuid] = properties
+        if uuid in self.index:  # a duplicated uuid replaces the symbol, like in a dict
+            self._clear_row(self.index[uuid])
+            row = self.index[uuid]
+        else:
+            row = len(self.uuids)
+            self.uuids.append(uuid)
+            self.index[uuid] = row
+            for column in self.columns.values():
+                column.append(None)
+            self._row_layouts.append(0)
+        layout = []
+        for _prop in properties:
+            name = sys.intern(_prop['name'])
+            column = self.columns.get(name)
+            if column is None:
+                column = [None] * len(self.uuids)
+                self.columns[name] = column
+                self.fields.append(name)
+            column[row] = _prop['value']
+            layout.append(name)
+        layout = tuple(layout)
+        layout_id = self._layout_ids.get(layout)
+        if layout_id is None:
+            layout_id = len(self._layouts)
+            self._layouts.append(layout)
+            self._layout_ids[layout] = layout_id
+        self._row_layouts[row] = layout_id
+
+    def remove(self, uuid):
+        # same as del symbol_dict[uuid]. The last row takes the place of the removed one,
+        # so the row of another symbol can change: look rows up by uuid again after a removal.
+        row = self.index.pop(uuid)
+        last = len(self.uuids) - 1
+        if row != last:
+            moved = self.uuids[last]
+            self.uuids[row] = moved
+            self.index[moved] = row
+            for column in self.columns.values():
+                column[row] = column[last]
+            self._row_layouts[row] = self._row_layouts[last]
+        self.uuids.pop()
+        for column in self.columns.values():
+            column.pop()
+        self._row_layouts.pop()
+
+    def _clear_row(self, row: int):
+        for column in self.columns.values():
+            column[row] = None
+
+    def row(self, uuid):
+        return SymbolRow(self, self.index[uuid])
+
+    def rows(self):
+        return (SymbolRow(self, _) for _ in range(len(self.uuids)))
+
+    def column(self, field_name: str):
+        # values of a field for every row, None where a symbol doesn't have it
+        column = self.columns.get(field_name)
+        return column if column is not None else [None] * len(self.uuids)
+
+    def layout(self, row: int):
+        # field names of a row, in file order
+        return self._layouts[self._row_layouts[row]]
+
+    def field_names(self, rows):
+        # field names of some rows, in order of first appearance. Rows usually share a few layouts.
+        field_names = {}
+        for layout_id in dict.fromkeys(map(self._row_layouts.__getitem__, rows)):
+            field_names.update(dict.fromkeys(self._layouts[layout_id]))
+        return list(field_names)
+
+    def properties(self, row: int):
+        return [{'name': _name, 'value': self.columns[_name][row]} for _name in self.layout(row)]
+
+    # Mapping (compatibility view): {uuid: [{'name': ..., 'value': ...}, ...]}
+    def __getitem__(self, uuid):
+        return self.properties(self.index[uuid])
+
+    def __iter__(self):
+        return iter(self.uuids)
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def __contains__(self, uuid):
+        return uuid in self.index
@@ -1,5 +1,14 @@
+import math
+import random
 import re
 import pathlib
+from collections import Counter
+from itertools import chain
+from operator import mul
+from statistics import NormalDist
+from .sch_mmap import get_symbol_dict_mmap
+from .sch_parser import iter_symbols
+from .symbol_table import SymbolTable
 
 
 def get_sch_file_name(p: str):
@@ -27,10 +36,14 @@ def pcb_2_sch_path(p: str):
 
 def json_from_bom__with_pn_as_key(bom):
     # comply with: /mylists/api/thirdparty
-    json_object = []
+    return list(iter_json_from_bom__with_pn_as_key(bom))
+
+
+def iter_json_from_bom__with_pn_as_key(bom):
+    # same parts as `json_from_bom__with_pn_as_key`, one at a time
     for _pn in bom:
         _item = bom[_pn]
-        json_object.append({
+        yield {
             "requestedPartNumber": _pn,
             "quantities": [
                 {
@@ -39,8 +52,7 @@ def json_from_bom__with_pn_as_key(bom):
             ],
             "customerReference": _item.get('cusRef', ''),
             "notes": _item.get('note', ''),
-        })
-    return json_object
+        }
 
 
 def to_string(_list):
@@ -79,8 +91,10 @@ def parse_uuid(s: str):
     return uuid_regex.findall(s)[0]  # first matched
 
 
-def get_symbol_dict(kicad_sch_path):
+def get_symbol_dict(kicad_sch_path, engine='stream'):
     # one traversal to improve performance: 18s -->0.07s
+    # `engine`: 'stream' reads the file in chunks (see `sch_parser`),
+    #           'mmap' scans a memory-mapped file with bytes regexes (see `sch_mmap`)
     # SAMPLE OUTPUT
     # {
     # '00000000-0000-0000-0000-00006319aa5a': [
@@ -99,25 +113,49 @@ def get_symbol_dict(kicad_sch_path):
     #   ...
     #  ]
     # }
+    if engine == 'mmap':
+        return get_symbol_dict_mmap(kicad_sch_path)
+    if engine != 'stream':
+        raise ValueError('Unknown engine: {e}'.format(e=engine))
+    # The schematic is tokenized as a stream of S-expressions (see `sch_parser`),
+    # so this works on any layout of the file and memory doesn't grow with the file size.
     symbols = {}
-    new_symbol = False
-    curr_uuid = None
-    with open(kicad_sch_path, 'r', encoding='utf-8') as fi:
-        lines = fi.readlines()
-    for num, line in enumerate(lines):
-        if '  (symbol (lib_id' in line:
-            new_symbol = True
-            curr_uuid = None
-        if '    (uuid' in line and new_symbol:
-            new_symbol = False
-            curr_uuid = parse_uuid(line)
-            symbols[curr_uuid] = []
-        if '    (property ' in line and curr_uuid:
-            symbol_property = parse_property_line(line)
-            symbols[curr_uuid].append(symbol_property)
+    for uuid, properties in iter_symbols(kicad_sch_path):
+        symbols[uuid] = properties
     return symbols
 
 
+def get_symbol_table(kicad_sch_path, engine='stream'):
+    # same content as `get_symbol_dict`, as a column store (see `symbol_table`)
+    if engine == 'stream':
+        return SymbolTable.from_items(iter_symbols(kicad_sch_path))
+    return SymbolTable.from_symbol_dict(get_symbol_dict(kicad_sch_path, engine))
+
+
+_NOT_PART_NUMBER_FIELD_NAMES = frozenset([
+    'caution', 'datasheet', 'designnote', 'designator', 'designnotes',
+    'distributed', 'distributedby', 'distributor',
+    'environmentalinformation', 'environmentinfo',
+    'environmentinformation', 'footprint', 'installation', 'made',
+    'madeby', 'madein', 'make', 'maker', 'mfg', 'mfg.', 'mfr',
+    'mfr.', 'note', 'notes', 'package', 'packages', 'packaging',
+    'pin', 'pincount', 'pins', 'productpage', 'ref', 'refdes',
+    'reference', 'series', 'url', 'usage', 'use', 'warning', 'web',
+    'webpage', 'website', 'year'])
+
+# known allowed characters
+# may contain:
+#   - /, -, #, _, comma, dot, space
+#   - +, (, ), =, &, \, _, *, ;, ", ', %, [, ]
+_CHAR_AND_LENGTH_RE = re.compile(r'^[A-Z0-9#+()/\-\s,.=&:\\_*;"\'%\[\]]{1,49}$')
+# Digi-Key packaging:
+#   - Tape & Reel (TR): TR-ND, -2-ND
+#   - Cut Tape (CT): CT-ND, -1-ND
+#   - Digi-Reel (DKR): DKR-ND, -6-ND
+_PACKAGING_SUFFIXES = ('TR-ND', '-2-ND', 'CT-ND', '-1-ND', 'DKR-ND', '-6-ND')
+_CATEGORIZED_RE = re.compile(r'^\d{1,4}-.*-ND$')
+
+
 def score_field_name_as_part_number(field_name: str):
     score = 0
     # fname = field_name.lower()
@@ -133,15 +171,7 @@ def score_field_name_as_part_number(field_name: str):
     if 'value' in fname:  # Cody: sometimes I spotted PN was entered here
         score += 5
     # these fields are known not to be part number
-    if fname in ['caution', 'datasheet', 'designnote', 'designator', 'designnotes',
-                 'distributed', 'distributedby', 'distributor',
-                 'environmentalinformation', 'environmentinfo',
-                 'environmentinformation', 'footprint', 'installation', 'made',
-                 'madeby', 'madein', 'make', 'maker', 'mfg', 'mfg.', 'mfr',
-                 'mfr.', 'note', 'notes', 'package', 'packages', 'packaging',
-                 'pin', 'pincount', 'pins', 'productpage', 'ref', 'refdes',
-                 'reference', 'series', 'url', 'usage', 'use', 'warning', 'web',
-                 'webpage', 'website', 'year']:
+    if fname in _NOT_PART_NUMBER_FIELD_NAMES:
         score -= 20
     return score
 
@@ -166,11 +196,7 @@ def score_field_value_as_part_number(field_value: str):
     fv = field_value.upper()
 
     # known allowed characters
-    # may contain:
-    #   - /, -, #, _, comma, dot, space
-    #   - +, (, ), =, &, \, _, *, ;, ", ', %, [, ]
-    char_and_length_regex = re.compile(r'^[A-Z0-9#+()/\-\s,.=&:\\_*;"\'%\[\]]{1,49}$')
-    if char_and_length_regex.match(field_value):
+    if _CHAR_AND_LENGTH_RE.match(field_value):
         score += 10
     # penalty if not ASCII
     if not fv.isascii():
@@ -182,30 +208,48 @@ def score_field_value_as_part_number(field_value: str):
     # - [10], [25, 31]
     # - [8, 9], [32, 37]
     # - the rest
-    if len(fv) in range(11, 25):
+    fv_len = len(fv)
+    if 11 <= fv_len <= 24:
         score += 10
-    elif len(fv) in range(10, 11) or len(fv) in range(25, 32):
+    elif fv_len == 10 or 25 <= fv_len <= 31:
         score += 5
-    elif len(fv) in range(8, 10) or len(fv) in range(32, 38):
+    elif 8 <= fv_len <= 9 or 32 <= fv_len <= 37:
         score += 2
 
     # known regexes
-    # Digi-Key packaging:
-    #   - Tape & Reel (TR): TR-ND, -2-ND
-    #   - Cut Tape (CT): CT-ND, -1-ND
-    #   - Digi-Reel (DKR): DKR-ND, -6-ND
     if fv.endswith('-ND'):
         score += 50
-    if fv.endswith('TR-ND') or fv.endswith('-2-ND') \
-            or fv.endswith('CT-ND') or fv.endswith('-1-ND') \
-            or fv.endswith('DKR-ND') or fv.endswith('-6-ND'):
-        score += 10
-    categorized_regex = re.compile(r'^\d{1,4}-.*-ND$')
-    if categorized_regex.match(fv):
+        if fv.endswith(_PACKAGING_SUFFIXES):
+            score += 10
+    if _CATEGORIZED_RE.match(fv):
         score += 10
     return score
 
 
+_score_numpy = None  # `score_numpy` module, False when NumPy isn't installed
+# below this, scoring one by one is faster than building the NumPy arrays
+_NUMPY_MIN_VALUES = 256
+
+
+def score_field_values_as_part_number(field_values, use_numpy=None):
+    # batch version of `score_field_value_as_part_number`: one score per value, in order.
+    # Vectorized with NumPy when it's installed, a plain loop otherwise.
+    # `use_numpy`: None picks automatically, False forces the pure-Python loop
+    # SAMPLE OUTPUT
+    # array([ 50, 100,   5])  (a list without NumPy)
+    global _score_numpy
+    if use_numpy is None:
+        use_numpy = len(field_values) >= _NUMPY_MIN_VALUES
+    if use_numpy and _score_numpy is None:
+        try:
+            from . import score_numpy as _score_numpy
+        except ImportError:
+            _score_numpy = False
+    if use_numpy and _score_numpy:
+        return _score_numpy.score_values(field_values)
+    return [score_field_value_as_part_number(_v) for _v in field_values]
+
+
 def parse_fields(symbol_dict: dict):
     # `id` is no longer a reliable for the identifier of a property,
     # now use `name` instead. Beware: it's case-sensitive.
@@ -221,6 +265,8 @@ def parse_fields(symbol_dict: dict):
     # 'Manufacturer Part Number': {'name': 'Manufacturer Part Number'},
     # 'Digikey Part Number': {'name': 'Digikey Part Number},
     # }
+    if isinstance(symbol_dict, SymbolTable):
+        return {fname: {'name': fname} for fname in symbol_dict.fields}
     fields = {}  # name (as str): {name, scores}
     for _k, _v_symbol in symbol_dict.items():  # every symbol
         for _prop in _v_symbol:  # every field in symbol
@@ -243,21 +289,51 @@ def score_fields_as_part_number(symbol_dict: dict):
     # 'Manufacturer Part Number': {'name': 'Manufacturer Part Number', 'name_score': 50, 'values_score': 360, 'field_score': 18_000},
     # 'Digikey Part Number': {'name': 'Digikey Part Number', 'name_score': 60, 'values_score': 480, 'field_score': 28_800}
     # }
-    fields_with_score = parse_fields(symbol_dict)
-    for fname in fields_with_score:
+    return _score_field_value_counts(_count_field_values(symbol_dict))
+
+
+def _score_field_value_counts(field_value_counts: dict):
+    # `field_value_counts`: see `_count_field_values`
+    # score every distinct value once, in one batch
+    distinct_values = list(dict.fromkeys(chain.from_iterable(field_value_counts.values())))
+    value_scores = dict(zip(distinct_values, _to_list(score_field_values_as_part_number(distinct_values))))
+    fields_with_score = {}
+    for fname, fvalue_counts in field_value_counts.items():
         fname_score = score_field_name_as_part_number(fname)
-        fvalues_score = 0
-        for symbol_properties in symbol_dict.values():
-            for symbol_property in symbol_properties:
-                if symbol_property['name'] == fname:
-                    fvalue = symbol_property['value']
-                    fvalues_score += score_field_value_as_part_number(fvalue)
-        fields_with_score[fname]['name_score'] = fname_score
-        fields_with_score[fname]['values_score'] = fvalues_score
-        fields_with_score[fname]['field_score'] = fname_score * fvalues_score
+        fvalues_score = sum(map(mul, map(value_scores.__getitem__, fvalue_counts), fvalue_counts.values()))
+        fields_with_score[fname] = {
+            'name': fname,
+            'name_score': fname_score,
+            'values_score': fvalues_score,
+            'field_score': fname_score * fvalues_score,
+        }
     return fields_with_score
 
 
+def _to_list(scores):
+    # NumPy array or list --> list of int
+    return scores.tolist() if hasattr(scores, 'tolist') else scores
+
+
+def _count_field_values(symbol_dict):
+    # {field name: Counter({value: number of symbols})}, fields in order of first appearance.
+    # One pass over the symbols, instead of one pass per field.
+    if isinstance(symbol_dict, SymbolTable):
+        fields = {}
+        for fname in symbol_dict.fields:
+            counts = fields[fname] = Counter(symbol_dict.columns[fname])
+            counts.pop(None, None)  # symbols without the field
+        return fields
+    fields = {}
+    for _v_symbol in symbol_dict.values():
+        for _prop in _v_symbol:
+            counts = fields.get(_prop['name'])
+            if counts is None:
+                counts = fields[_prop['name']] = Counter()
+            counts[_prop['value']] += 1
+    return fields
+
+
 # get symbol list
 # get fields (headers only)
 # choose the field with the highest Part Number score
@@ -270,10 +346,31 @@ def score_fields_as_part_number(symbol_dict: dict):
 # if 2 or more fields have the highest sum score
 #   pick the field with higher id
 # if user picks a column manually (they don't have to), honor user's choice
-def auto_select_part_number_field(symbol_dict):
+def auto_select_part_number_field(symbol_dict, sampled=False, confidence=0.99):
     # SAMPLE OUTPUT:
-    # {'name': 'DK_PN', 'name_score': 80, 'values_score': 1310, 'field_score': 104_800}
-    field_scores = score_fields_as_part_number(symbol_dict)
+    # {'name': 'DK_PN', 'name_score': 80, 'values_score': 1310, 'field_score': 104_800,
+    #  'confidence': 1.0, 'values_examined': 5_204}
+    # `sampled`: score a sample of the symbols, and stop as soon as the leading field wins with
+    #            at least `confidence`. Scores are then estimates for the whole design.
+    #            When the sample isn't decisive, every value is scored (`confidence` 1.0).
+    # `values_examined`: number of field values that were scored
+    values_examined = 0
+    if sampled:
+        selected, values_examined = _auto_select_sampled(symbol_dict, confidence)
+        if selected is not None:
+            return selected
+    field_value_counts = _count_field_values(symbol_dict)
+    field_scores = _score_field_value_counts(field_value_counts)
+    _hi_fname = _pick_part_number_field(field_scores)
+    values_examined += sum(sum(_counts.values()) for _counts in field_value_counts.values())
+    return dict(field_scores[_hi_fname], confidence=1.0, values_examined=values_examined)
+    # only fields with name_score >= threshold are considered
+    # pick the last highest field_score
+    # if all fields have name_score < threshold, pick the last field with the highest score
+
+
+def _pick_part_number_field(field_scores: dict):
+    # name of the part number field, see `auto_select_part_number_field`
     _first_field = list(field_scores.keys())[0]
     _hi_score = field_scores[_first_field]['field_score']
     _hi_fname = field_scores[_first_field]['name']
@@ -282,16 +379,124 @@ def auto_select_part_number_field(symbol_dict):
             if field_scores[fname]['field_score'] > _hi_score:
                 _hi_score = field_scores[fname]['field_score']
                 _hi_fname = field_scores[fname]['name']
-    return field_scores[_hi_fname]
-    # only fields with name_score >= threshold are considered
-    # pick the last highest field_score
-    # if all fields have name_score < threshold, pick the last field with the highest score
+    return _hi_fname
+
+
+# Sampled auto-detection.
+# The symbols are split into SAMPLE_STRATA contiguous strata (symbols of the same sheet are next to
+# each other), and every round scores one random symbol of each stratum. The values score of a field is
+# estimated from the mean score of its sampled values, times the number of symbols having the field.
+# Sampling stops when the leader beats the runner-up with the requested confidence (normal approximation),
+# or gives up after SAMPLE_MAX_FRACTION of the symbols.
+SAMPLE_STRATA = 64
+SAMPLE_MIN_VALUES = 32  # per field, below this the spread of its scores is taken as the worst case
+SAMPLE_MAX_FRACTION = 0.25
+# bounds of `score_field_value_as_part_number`
+_VALUE_SCORE_MIN = -20
+_VALUE_SCORE_MAX = 20 + 10 + 10 + 50 + 10 + 10
+
+
+def _estimate_values_score(stats: list, field_size: int, name_score: int):
+    # --> (estimated values score of a field, standard error of its field score)
+    # `stats`: [number of sampled values, sum of their scores, sum of their squared scores]
+    count, total, total_sq = stats
+    if name_score == 0 or field_size == 0:  # the field score is 0 whatever the values
+        return (field_size * total / count if count else 0.0), 0.0
+    if count >= min(SAMPLE_MIN_VALUES, field_size) and count > 1:
+        mean = total / count
+        variance = max(0.0, total_sq / count - mean * mean) * count / (count - 1)
+    else:  # too few values: assume the widest possible spread
+        mean = total / count if count else (_VALUE_SCORE_MIN + _VALUE_SCORE_MAX) / 2
+        variance = ((_VALUE_SCORE_MAX - _VALUE_SCORE_MIN) / 2) ** 2
+    return field_size * mean, abs(name_score) * field_size * math.sqrt(variance / max(count, 1))
+
+
+def _auto_select_sampled(symbol_dict, confidence: float):
+    # --> (selected field like `auto_select_part_number_field`, or None when not decisive; values examined)
+    n_symbols = len(symbol_dict)
+    if n_symbols < SAMPLE_STRATA * SAMPLE_MIN_VALUES / SAMPLE_MAX_FRACTION:
+        return None, 0  # small enough to score everything
+    if isinstance(symbol_dict, SymbolTable):
+        columns = symbol_dict.columns
+        field_sizes = {fname: n_symbols - columns[fname].count(None) for fname in symbol_dict.fields}
+    else:
+        symbols = list(symbol_dict.values())
+        field_sizes = Counter(_prop['name'] for _v_symbol in symbols for _prop in _v_symbol)
+    if not field_sizes:
+        return None, 0
+    name_scores = {fname: score_field_name_as_part_number(fname) for fname in field_sizes}
+    # only these fields can be picked, see `_pick_part_number_field`
+    _first_field = next(iter(field_sizes))
+    candidates = [fname for fname in field_sizes if fname == _first_field or name_scores[fname] >= 0]
+
+    def sample_values(rows):
+        # {field name: values of the field in `rows`}
+        if isinstance(symbol_dict, SymbolTable):
+            return {fname: [_v for _v in map(columns[fname].__getitem__, rows) if _v is not None]
+                    for fname in candidates}
+        values = {fname: [] for fname in candidates}
+        for row in rows:
+            for _prop in symbols[row]:
+                if _prop['name'] in values:
+                    values[_prop['name']].append(_prop['value'])
+        return values
+
+    # per field: [number of sampled values, sum of their scores, sum of their squared scores]
+    stats = {fname: [0, 0, 0] for fname in candidates}
+    value_scores = {}
+    rng = random.Random(0)
+    bounds = [n_symbols * _ // SAMPLE_STRATA for _ in range(SAMPLE_STRATA + 1)]
+    values_examined = 0
+    n_rounds = int(n_symbols * SAMPLE_MAX_FRACTION) // SAMPLE_STRATA
+    # the leader is checked after 1, 2, 4, 8... rounds; every check can be wrong,
+    # so each one must be more confident than asked, for the whole run to be as confident as asked
+    checkpoints = {2 ** _ for _ in range(n_rounds.bit_length())}
+    check_confidence = 1 - (1 - confidence) / len(checkpoints)
+    for _round in range(1, n_rounds + 1):
+        rows = [rng.randrange(bounds[_], bounds[_ + 1]) for _ in range(SAMPLE_STRATA)]
+        sampled = sample_values(rows)
+        new_values = list({_v: None for _values in sampled.values() for _v in _values if _v not in value_scores})
+        value_scores.update(zip(new_values, _to_list(score_field_values_as_part_number(new_values))))
+        for fname in candidates:
+            scores = [value_scores[_v] for _v in sampled[fname]]
+            _stats = stats[fname]
+            _stats[0] += len(scores)
+            _stats[1] += sum(scores)
+            _stats[2] += sum(_ * _ for _ in scores)
+            values_examined += len(scores)
+        if _round not in checkpoints:
+            continue
+
+        estimates = {}  # field name: (values score, standard error of the field score)
+        for fname in candidates:
+            estimates[fname] = _estimate_values_score(stats[fname], field_sizes[fname], name_scores[fname])
+        field_scores = {fname: {'name': fname,
+                                'name_score': name_scores[fname],
+                                'values_score': round(estimates[fname][0]),
+                                'field_score': round(name_scores[fname] * estimates[fname][0])}
+                        for fname in candidates}
+        leader = _pick_part_number_field(field_scores)
+        margin, error = math.inf, 0.0
+        for fname in candidates:
+            if fname != leader:
+                _margin = name_scores[leader] * estimates[leader][0] - name_scores[fname] * estimates[fname][0]
+                if _margin < margin:
+                    margin = _margin
+                    error = math.hypot(estimates[leader][1], estimates[fname][1])
+        if margin > 0:
+            leader_confidence = 1.0 if error == 0 else NormalDist().cdf(margin / error)
+            if leader_confidence >= check_confidence:
+                selected = dict(field_scores[leader], confidence=leader_confidence, values_examined=values_examined)
+                return selected, values_examined
+    return None, values_examined
 
 
 def make_quantity(symbol_dict: dict, pn_field_str: str):
     # input: symbol_dict with uuid as key
     # output: symbol_dict with part number as key (symbol_dict_by_pn),
     #         with new column: quantity
+    if isinstance(symbol_dict, SymbolTable):
+        return _make_quantity_from_table(symbol_dict, pn_field_str)
     symbol_dict_by_pn = {}
     for k_symbol_uuid, v_symbol_properties in symbol_dict.items():
         symbol_key = None
@@ -326,3 +531,26 @@ def make_quantity(symbol_dict: dict, pn_field_str: str):
                         symbol_dict_by_pn[symbol_key][property_name]['name'] = property_name
                         symbol_dict_by_pn[symbol_key][property_name]['values'] = [property_value]
     return symbol_dict_by_pn
+
+
+def _make_quantity_from_table(table: SymbolTable, pn_field_str: str):
+    # same as `make_quantity`, the part number of a symbol is found in O(1) in its column
+    symbol_dict_by_pn = {}
+    columns = table.columns
+    uuids = table.uuids
+    for row, symbol_key in enumerate(table.column(pn_field_str)):
+        if not symbol_key:  # ignore None or '' values
+            continue
+        item = symbol_dict_by_pn.get(symbol_key)
+        if item is None:  # add new
+            item = symbol_dict_by_pn[symbol_key] = {'symbol_uuids': [], 'quantity': 0}
+        item['symbol_uuids'].append(uuids[row])
+        item['quantity'] += 1
+        for property_name in table.layout(row):
+            if property_name != pn_field_str:
+                property_value = columns[property_name][row]
+                if property_name in item:
+                    item[property_name]['values'].append(property_value)
+                else:
+                    item[property_name] = {'name': property_name, 'values': [property_value]}
+    return symbol_dict_by_pn
@@ -0,0 +1,13 @@
+import os
+import sys
+
+# The tests run without KiCad or wx, as the benchmarks: `src` is loaded as a bare package (see
+# `bench/common.load_src`), and the synthetic schematics (`synth`) and the local myLists stand-in
+# (`mylists_server`) come from bench/.
+BENCH_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench')
+if BENCH_PATH not in sys.path:
+    sys.path.insert(0, BENCH_PATH)
+
+from common import load_src  # noqa: E402
+
+load_src()
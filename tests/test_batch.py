@@ -0,0 +1,49 @@
+import json
+import os
+import pytest
+import synth
+from bench_batch import sequential, write_projects
+from src import batch
+
+N_PROJECTS = 4
+
+
+@pytest.fixture(scope='module')
+def projects(tmp_path_factory):
+    # (root, projects, their BOMs processed one by one)
+    root = str(tmp_path_factory.mktemp('batch').joinpath('repo'))
+    write_projects(root, N_PROJECTS, 200)
+    projects = batch.discover_projects(root)
+    return root, projects, sequential(projects)
+
+
+def test_discover_projects(projects):
+    # the orphan sub-sheet isn't a project
+    _root, found, _expected = projects
+    assert len(found) == N_PROJECTS
+
+
+@pytest.mark.parametrize('max_workers', (1, 2))
+def test_run_batch(projects, tmp_path, max_workers):
+    root, found, expected = projects
+    output_dir = str(tmp_path / 'boms')
+    n_done, errors = batch.run_batch(found, output_dir, [root], max_workers=max_workers, cache=False)
+    assert (n_done, errors) == (N_PROJECTS, [])
+    merged = {}
+    for path, parts in expected.items():
+        name = batch.project_name(path, [root])
+        with open(os.path.join(output_dir, name + '.json'), encoding='utf-8') as fi:
+            assert json.load(fi) == parts, name
+        for _part in parts:
+            pn = _part['requestedPartNumber']
+            merged[pn] = merged.get(pn, 0) + int(_part['quantities'][0]['quantity'])
+    with open(os.path.join(output_dir, 'merged.json'), encoding='utf-8') as fi:
+        assert {_p['requestedPartNumber']: int(_p['quantities'][0]['quantity']) for _p in json.load(fi)} == merged
+
+
+def test_project_errors(tmp_path):
+    # reported in the summary of the project, as the command line does
+    empty = synth.write_schematic(str(tmp_path / 'empty.kicad_sch'), n_symbols=0)
+    assert batch.process_project(empty, cache=False)['error'] == 'no symbols in the schematic or its sheets'
+    missing = str(tmp_path / 'missing.kicad_sch')
+    assert batch.process_project(missing, cache=False)['error'] == 'schematic file (.kicad_sch) not found'
@@ -0,0 +1,15 @@
+import synth
+from src import utils
+from src.bom_index import BOMIndex
+
+
+def test_grouping_matches_make_quantity(tmp_path):
+    path = synth.write_schematic(str(tmp_path / 'flat.kicad_sch'), n_symbols=2_000, n_fields=12, unique_parts=100)
+    symbol_table = utils.get_symbol_table(path)
+    index = BOMIndex(symbol_table)
+    for fname in symbol_table.fields:
+        expected = utils.make_quantity(dict(symbol_table.items()), fname)
+        actual = index.make_quantity(fname)
+        # same parts in the same order, each with the same columns in the same order
+        assert list(actual.items()) == list(expected.items()), fname
+        assert all(list(actual[_pn]) == list(expected[_pn]) for _pn in expected), fname
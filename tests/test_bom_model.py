@@ -0,0 +1,143 @@
+from src.bom_model import PN_COL, QTY_COL, ROW_COL, BOMModel
+
+PN_FIELD = 'Digikey Part Number'
+FIELDS = ['Reference', 'Value', PN_FIELD]
+
+
+def bom_obj_by_pn():
+    # see `utils.make_quantity`
+    return {
+        '311-10.0KHRCT-ND': {'symbol_uuids': ['u1', 'u2'], 'quantity': 2,
+                             'Reference': {'name': 'Reference', 'values': ['R1', 'R2']},
+                             'Value': {'name': 'Value', 'values': ['10k', '10k']}},
+        '311-1.00KHRCT-ND': {'symbol_uuids': ['u3'], 'quantity': 1,
+                             'Reference': {'name': 'Reference', 'values': ['R3']},
+                             'Value': {'name': 'Value', 'values': ['1k']}},
+        '399-1284-1-ND': {'symbol_uuids': ['u4'], 'quantity': 1,
+                          'Reference': {'name': 'Reference', 'values': ['C1']}},
+    }
+
+
+def test_rows():
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    assert len(model) == 3
+    assert [_name for _name, _width in model.columns] == \
+        ['Row', 'Part Number*', 'Quantity*', 'Reference', 'Value', 'Customer Reference', 'Note']
+    assert [model.get_text(0, _col) for _col in range(len(model.columns))] == \
+        ['1', '311-10.0KHRCT-ND', '2', 'R1,R2', '10k,10k', '', '']
+    assert model.get_text(2, 4) == ''  # no Value field
+    assert model.bom() == {
+        '311-10.0KHRCT-ND': {'mpn': '311-10.0KHRCT-ND', 'qty': '2', 'cusRef': '', 'note': ''},
+        '311-1.00KHRCT-ND': {'mpn': '311-1.00KHRCT-ND', 'qty': '1', 'cusRef': '', 'note': ''},
+        '399-1284-1-ND': {'mpn': '399-1284-1-ND', 'qty': '1', 'cusRef': '', 'note': ''},
+    }
+
+
+def test_edit_reaches_the_bom():
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    model.set_text(1, QTY_COL, '10')
+    model.set_text(1, model.cus_ref_col, 'R3 spare')
+    model.set_text(2, model.note_col, 'X7R')
+    model.set_text(0, 4, '10k 1%')
+    assert model.get_text(0, 4) == '10k 1%'
+    assert model.bom()['311-1.00KHRCT-ND'] == {'mpn': '311-1.00KHRCT-ND', 'qty': '10', 'cusRef': 'R3 spare',
+                                               'note': ''}
+    assert model.bom()['399-1284-1-ND']['note'] == 'X7R'
+
+
+def test_part_number_edit_rebuilds_the_bom():
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    model.bom()
+    model.set_text(1, PN_COL, '311-1.00KFRCT-ND')
+    assert list(model.bom()) == ['311-10.0KHRCT-ND', '311-1.00KFRCT-ND', '399-1284-1-ND']
+    assert model.bom()['311-1.00KFRCT-ND'] == {'mpn': '311-1.00KFRCT-ND', 'qty': '1', 'cusRef': '', 'note': ''}
+
+
+def test_duplicate_part_numbers_after_an_edit():
+    # as when the BOM was read from the list: the last row with a part number wins
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    model.set_text(0, model.note_col, 'first')
+    model.set_text(1, model.note_col, 'second')
+    model.set_text(0, PN_COL, '311-1.00KHRCT-ND')
+    assert list(model.bom()) == ['311-1.00KHRCT-ND', '399-1284-1-ND']
+    assert model.bom()['311-1.00KHRCT-ND']['note'] == 'second'
+    assert model.get_text(0, ROW_COL) == '1'
+
+
+def test_edit_updates_the_bom_in_place():
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    bom = model.bom()
+    entry = bom['311-1.00KHRCT-ND']
+    model.set_text(1, QTY_COL, '10')
+    model.set_text(1, model.cus_ref_col, 'R3 spare')
+    model.set_text(1, model.note_col, 'X7R')
+    model.set_text(1, 4, '1k 1%')  # not pushed
+    assert model.bom() is bom
+    assert bom['311-1.00KHRCT-ND'] is entry
+    assert entry == {'mpn': '311-1.00KHRCT-ND', 'qty': '10', 'cusRef': 'R3 spare', 'note': 'X7R'}
+    assert bom == dict(BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD).refresh(), **{'311-1.00KHRCT-ND': entry})
+
+
+def test_edit_of_a_duplicate_part_number():
+    # only the row whose entry is in the BOM changes it
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    model.set_text(0, PN_COL, '311-1.00KHRCT-ND')
+    bom = model.bom()
+    model.set_text(0, model.note_col, 'first')
+    assert bom['311-1.00KHRCT-ND']['note'] == ''
+    model.set_text(1, model.note_col, 'second')
+    assert bom['311-1.00KHRCT-ND']['note'] == 'second'
+    assert model.refresh() == bom
+
+
+def test_listeners():
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    calls = []
+
+    def listener(_model, row, col):
+        assert _model is model
+        assert model.get_text(row, col) == 'edited'  # called after the edit
+        calls.append((row, col))
+
+    model.add_listener(listener)
+    model.set_text(0, model.note_col, 'edited')
+    model.set_text(2, PN_COL, 'edited')
+    model.set_text(2, PN_COL, 'edited')  # same text: no edit
+    assert calls == [(0, model.note_col), (2, PN_COL)]
+    assert model.dirty_rows == {0, 2}
+    model.clear_dirty()
+    model.remove_listener(listener)
+    model.set_text(1, model.note_col, 'edited')
+    assert calls == [(0, model.note_col), (2, PN_COL)]
+    assert model.dirty_rows == {1}
+
+
+def test_update_parts():
+    model = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    model.set_text(1, model.note_col, 'kept')
+    changed = bom_obj_by_pn()
+    changed['311-1.00KHRCT-ND']['quantity'] = 3
+    # a quantity changed: the row is updated in place
+    assert model.update_parts(changed, ['311-1.00KHRCT-ND']) == [1]
+    assert (model.quantities[1], model.notes[1]) == ('3', 'kept')
+    # a part removed, another one added: the rows move, edits stay with their part number
+    del changed['311-10.0KHRCT-ND']
+    changed['490-1532-1-ND'] = {'symbol_uuids': ['u5'], 'quantity': 1}
+    assert model.update_parts(changed, ['311-10.0KHRCT-ND', '490-1532-1-ND']) is None
+    assert model.part_numbers == ['311-1.00KHRCT-ND', '399-1284-1-ND', '490-1532-1-ND']
+    assert (model.notes[0], model.dirty_rows) == ('kept', {0})
+    assert model.bom()['490-1532-1-ND']['qty'] == '1'
+
+
+def test_carry_over():
+    # Customer References, Notes and edited part numbers of the previous model of the same field
+    previous = BOMModel(bom_obj_by_pn(), FIELDS, PN_FIELD)
+    previous.set_text(0, previous.cus_ref_col, 'R1-R2')
+    previous.set_text(2, previous.note_col, 'X7R')
+    previous.set_text(2, PN_COL, '399-1284-2-ND')
+    regrouped = bom_obj_by_pn()
+    del regrouped['311-1.00KHRCT-ND']
+    model = BOMModel(regrouped, FIELDS, PN_FIELD)
+    model.carry_over(previous)
+    assert model.cus_refs == ['R1-R2', '']
+    assert model.bom()['399-1284-2-ND'] == {'mpn': '399-1284-2-ND', 'qty': '1', 'cusRef': '', 'note': 'X7R'}
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import pytest
+import synth
+from src import cli, utils
+from src.bom_index import BOMIndex
+from src.bom_model import BOMModel
+
+PN_FIELD = 'Digikey Part Number'
+
+
+@pytest.fixture
+def schematic(tmp_path):
+    return synth.write_schematic(str(tmp_path / 'board.kicad_sch'), n_symbols=200, n_fields=10, unique_parts=20)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # the parse cache of the tests isn't the user's
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+
+
+def test_write_json(schematic):
+    model, _auto_pn_field_dict, _merged_variants = cli.load_bom(schematic, normalize=False)
+    fo = io.StringIO()
+    cli.write_json(model, fo)
+    assert json.loads(fo.getvalue()) == utils.json_from_bom__with_pn_as_key(model.bom())
+    assert sum(int(_p['quantities'][0]['quantity']) for _p in json.loads(fo.getvalue())) == 200
+
+
+def test_write_csv(schematic):
+    model, _auto_pn_field_dict, _merged_variants = cli.load_bom(schematic, PN_FIELD)
+    model.set_text(0, model.note_col, 'a "note", with a comma')
+    fo = io.StringIO(newline='')
+    cli.write_csv(model, fo)
+    rows = list(csv.reader(io.StringIO(fo.getvalue(), newline='')))
+    # the columns and cells of the dialog
+    assert rows[0] == [_title for _title, _width in model.columns]
+    assert len(rows) == len(model) + 1
+    assert rows[1] == [model.get_text(0, _col) for _col in range(len(model.columns))]
+    assert rows[1][model.note_col] == 'a "note", with a comma'
+
+
+def test_main_json(schematic, tmp_path, capsys):
+    out_path = tmp_path / 'bom.json'
+    assert cli.main([schematic, '-o', str(out_path)]) == 0
+    symbol_table = utils.get_symbol_table(schematic)
+    bom_obj_by_pn = BOMIndex(symbol_table).make_quantity(PN_FIELD)
+    expected = BOMModel(bom_obj_by_pn, utils.parse_fields(symbol_table), PN_FIELD).bom()
+    assert json.loads(out_path.read_text(encoding='utf-8')) == utils.json_from_bom__with_pn_as_key(expected)
+    assert "part numbers in 'Digikey Part Number'" in capsys.readouterr().err
+
+
+def test_main_stdout_and_output_dir(schematic, tmp_path, capsys):
+    assert cli.main(['--format', 'csv', '--no-cache', schematic]) == 0
+    stdout = capsys.readouterr().out
+    other = synth.write_schematic(str(tmp_path / 'other.kicad_sch'), n_symbols=50, seed=1)
+    assert cli.main(['--format', 'csv', '--output-dir', str(tmp_path / 'boms'), schematic, other]) == 0
+    assert sorted(_p.name for _p in (tmp_path / 'boms').iterdir()) == ['board.csv', 'other.csv']
+    assert (tmp_path / 'boms' / 'board.csv').read_text(encoding='utf-8').splitlines() == stdout.splitlines()
+
+
+def test_main_errors(schematic, tmp_path, capsys):
+    # every schematic is processed, the status tells that one failed
+    empty = synth.write_schematic(str(tmp_path / 'empty.kicad_sch'), n_symbols=0)
+    missing = str(tmp_path / 'missing.kicad_sch')
+    assert cli.main(['--output-dir', str(tmp_path / 'boms'), empty, missing, schematic]) == 1
+    err = capsys.readouterr().err
+    assert 'empty.kicad_sch: no symbols in the schematic or its sheets' in err
+    assert 'missing.kicad_sch: schematic file (.kicad_sch) not found' in err
+    assert [_p.name for _p in (tmp_path / 'boms').iterdir()] == ['board.json']
+    assert cli.main(['--pn-field', 'Nope', schematic]) == 1
+    assert "no field named 'Nope'" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('argv', (['--split', '0', 'a.kicad_sch'], ['-o', 'bom.json', 'a.kicad_sch', 'b.kicad_sch'],
+                                  ['-o', 'bom.json', '--output-dir', 'boms', 'a.kicad_sch']))
+def test_usage_errors(argv):
+    with pytest.raises(SystemExit) as e:
+        cli.main(argv)
+    assert e.value.code == 2
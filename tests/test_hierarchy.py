@@ -0,0 +1,37 @@
+import collections
+import pytest
+import synth
+from src.sch_hierarchy import get_hierarchy_symbol_dict
+
+
+def reference(properties):
+    return next(_prop['value'] for _prop in properties if _prop['name'] == 'Reference')
+
+
+@pytest.mark.parametrize('kicad_version', (6, 7))
+@pytest.mark.parametrize('depth,fanout', ((1, 2), (2, 3)))
+def test_every_instance_of_the_hierarchy(tmp_path, kicad_version, depth, fanout):
+    symbols_per_sheet = 10
+    path = synth.write_hierarchy(str(tmp_path), depth=depth, fanout=fanout, symbols_per_sheet=symbols_per_sheet,
+                                 kicad_version=kicad_version)
+    symbol_dict = get_hierarchy_symbol_dict(path)
+    assert len(symbol_dict) == symbols_per_sheet * sum(fanout ** _level for _level in range(depth + 1))
+    # each instance of a reused sheet has its own references
+    references = [reference(_props) for _props in symbol_dict.values()]
+    assert len(set(references)) == len(references)
+
+
+@pytest.mark.parametrize('kicad_version', (6, 7))
+def test_sheet_used_twice(tmp_path, kicad_version):
+    path = synth.write_hierarchy(str(tmp_path), depth=1, fanout=2, symbols_per_sheet=5, kicad_version=kicad_version)
+    symbol_dict = get_hierarchy_symbol_dict(path)
+    instances = collections.defaultdict(list)
+    for key, properties in symbol_dict.items():
+        if key.startswith('/'):
+            sheet_uuid, symbol_uuid = key.split('/')[1:]
+            instances[symbol_uuid].append((sheet_uuid, reference(properties)))
+    assert len(instances) == 5
+    for _instances in instances.values():
+        # one instance per sheet item, with its own reference
+        assert len({_sheet for _sheet, _ref in _instances}) == 2
+        assert len({_ref for _sheet, _ref in _instances}) == 2
@@ -0,0 +1,16 @@
+import pytest
+from bench_import import has_pcbnew, import_times, registration_imports
+
+ALLOWED = {'os', 'pcbnew'}  # imported at registration, besides the modules of the plugin itself
+
+
+def test_registration_imports():
+    # read from the module-level imports of `__init__` and of the plugin modules it imports, without KiCad
+    _modules, external = registration_imports()
+    assert {_m.split('.')[0] for _m in external} <= ALLOWED
+
+
+@pytest.mark.skipif(not has_pcbnew(), reason='needs the Python of KiCad (pcbnew)')
+def test_nothing_heavy_imported_at_startup():
+    times = import_times('import pcbnew; import src')
+    assert not [_m for _m in times if _m.split('.')[0] in ('wx', 'requests') or _m == 'src.plugin']
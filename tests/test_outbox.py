@@ -0,0 +1,140 @@
+import threading
+import time
+import pytest
+from bench_push import make_bom
+from mylists_server import MyListsServer
+from src import push_outbox
+from src.push_outbox import PushOutbox, OutboxDrainer
+from src.utils import json_from_bom__with_pn_as_key
+
+PUSH_KWARGS = {'retries': 1, 'backoff': 0.01}
+
+
+@pytest.fixture(autouse=True)
+def retries_due_now(monkeypatch):
+    monkeypatch.setattr(push_outbox, 'RETRY_BACKOFF', 0)
+
+
+def test_offline_push_sent_after_restart(tmp_path):
+    path = str(tmp_path / 'outbox.sqlite3')
+    json_data = json_from_bom__with_pn_as_key(make_bom(50, note_length=100))
+    with MyListsServer() as server:
+        api_url = server.api_url
+        port = server.port
+    # the server is gone: the push fails, and stays pending
+    outbox = PushOutbox(path)
+    entry, added = outbox.add(json_data, 'offline', api_url, claim=True)
+    assert added and entry['status'] == 'sending'
+    with pytest.raises(push_outbox.PushError):
+        outbox.send(entry['id'], **PUSH_KWARGS)
+    # KiCad restarted, the server is back on the same port
+    outbox = PushOutbox(path)
+    pending = outbox.pending()
+    assert [_e['id'] for _e in pending] == [entry['id']] and pending[0]['attempts'] == 1
+    with MyListsServer(port=port) as server:
+        assert outbox.drain(**PUSH_KWARGS) == 1
+        assert server.lists.get('offline') == json_data and not outbox.pending()
+
+
+def test_dedupe(tmp_path):
+    outbox = PushOutbox(str(tmp_path / 'outbox.sqlite3'))
+    json_data = json_from_bom__with_pn_as_key(make_bom(20))
+    with MyListsServer(delay=0.05) as server:
+        # a burst of identical pushes: one entry
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(outbox.add(json_data, 'burst', server.api_url)))
+                   for _ in range(20)]
+        for _t in threads:
+            _t.start()
+        for _t in threads:
+            _t.join()
+        assert len({_e['id'] for _e, _added in results}) == 1 and sum(_added for _e, _added in results) == 1
+        # several drainers at once: sent once
+        counts = []
+        drainers = [threading.Thread(target=lambda: counts.append(outbox.drain(**PUSH_KWARGS))) for _ in range(4)]
+        for _t in drainers:
+            _t.start()
+        for _t in drainers:
+            _t.join()
+        assert sum(counts) == 1 and server.requests == 1
+        # pushed again after it was sent: a new push, the user may have deleted the first lists
+        entry, added = outbox.add(json_data, 'burst', server.api_url)
+        assert added and entry['status'] == 'pending'
+        # another list name is another push
+        assert outbox.add(json_data, 'burst 2', server.api_url)[1]
+
+
+def test_claimed_when_added(tmp_path):
+    # a push of the user is claimed as it's added: a drainer can't send it at the same time
+    outbox = PushOutbox(str(tmp_path / 'outbox.sqlite3'))
+    json_data = json_from_bom__with_pn_as_key(make_bom(10))
+    entry, added = outbox.add(json_data, 'claimed', claim=True)
+    assert added and entry['status'] == 'sending'
+    assert outbox.claim_due() is None and not outbox.claim(entry['id'], force=True)
+    # the same push, while it's sent
+    assert outbox.add(json_data, 'claimed', claim=True) == (None, False)
+    assert outbox.add(json_data, 'claimed') == (entry, False)
+    # failed, pushed again by the user: the pending entry is claimed
+    outbox.mark_failed(entry['id'], 'SHORT_URL_NOT_RETURNED')
+    retry, added = outbox.add(json_data, 'claimed', claim=True)
+    assert not added and retry['id'] == entry['id'] and retry['status'] == 'sending'
+    assert outbox.claim_due() is None
+
+
+def test_failed_chunk_sent_again_alone(tmp_path):
+    outbox = PushOutbox(str(tmp_path / 'outbox.sqlite3'))
+    json_data = json_from_bom__with_pn_as_key(make_bom(30))
+    # the first chunk is created, the second fails: a retry only sends the chunks without a list
+    with MyListsServer(failures=[None, 503]) as server:
+        entry, _added = outbox.add(json_data, 'split', server.api_url, chunk_size=10)
+        outbox.claim(entry['id'], force=True)
+        with pytest.raises(push_outbox.PushError):
+            outbox.send(entry['id'], retries=0, max_workers=1)
+        entry = outbox.get(entry['id'])
+        created = sorted(entry['chunk_urls'])  # the third chunk may be sent before the failure is seen
+        assert entry['status'] == 'pending' and 0 in created and 1 not in created
+        assert len(server.lists) == len(created)
+        n_requests = server.requests
+        outbox.drain(**PUSH_KWARGS)
+        entry = outbox.get(entry['id'])
+        assert entry['status'] == 'sent' and server.requests - n_requests == 3 - len(created)
+        assert len(entry['short_urls']) == 3 and entry['short_urls'][0] == entry['chunk_urls'][0]
+        assert [server.lists['split ({i}/3)'.format(i=_i)] for _i in (1, 2, 3)] == \
+            [json_data[:10], json_data[10:20], json_data[20:]]
+
+
+def test_outbox_of_a_previous_version(tmp_path):
+    # the columns added since are added to the table
+    path = str(tmp_path / 'outbox.sqlite3')
+    db = push_outbox.sqlite3.connect(path)
+    db.executescript(push_outbox._SCHEMA.replace(',\n    chunk_size INTEGER,\n    chunk_urls TEXT', ''))
+    db.close()
+    entry, added = PushOutbox(path).add([{'requestedPartNumber': 'A'}], 'old', chunk_size=10)
+    assert added and entry['chunk_size'] == 10 and entry['chunk_urls'] == {}
+
+
+def test_drainer(tmp_path):
+    outbox = PushOutbox(str(tmp_path / 'outbox.sqlite3'))
+    json_data = json_from_bom__with_pn_as_key(make_bom(10))
+    sent = []
+    # the first attempts fail, the drainer tries again later
+    with MyListsServer(failures=[503] * 2) as server:
+        outbox.add(json_data, 'drainer', server.api_url)
+        drainer = OutboxDrainer(outbox, interval=0.05, on_sent=lambda e, u: sent.append((e['list_name'], u)),
+                                retries=0, backoff=0.01)
+        drainer.start()
+        deadline = time.time() + 10
+        while not sent and time.time() < deadline:
+            time.sleep(0.02)
+        drainer.stop()
+        drainer.join()
+        assert len(sent) == 1 and sent[0][0] == 'drainer' and server.requests == 3
+
+
+def test_refused_push_not_retried(tmp_path):
+    outbox = PushOutbox(str(tmp_path / 'outbox.sqlite3'))
+    json_data = json_from_bom__with_pn_as_key(make_bom(10))
+    with MyListsServer(max_parts=5) as server:
+        entry, _added = outbox.add(json_data, 'refused', server.api_url)
+        outbox.drain(**PUSH_KWARGS)
+        assert outbox.get(entry['id'])['status'] == 'failed'
@@ -0,0 +1,18 @@
+import pytest
+import synth
+from bench_parser import legacy_get_symbol_dict
+from src import utils
+
+
+@pytest.fixture(scope='module')
+def schematic(tmp_path_factory):
+    path = tmp_path_factory.mktemp('parser').joinpath('flat.kicad_sch')
+    return synth.write_schematic(str(path), n_symbols=500, n_fields=10)
+
+
+def test_stream_parser_matches_legacy(schematic):
+    assert utils.get_symbol_dict(schematic) == legacy_get_symbol_dict(schematic)
+
+
+def test_mmap_engine_matches_stream(schematic):
+    assert utils.get_symbol_dict(schematic, engine='mmap') == utils.get_symbol_dict(schematic)
@@ -0,0 +1,39 @@
+from collections import Counter
+import pytest
+import synth
+from src import utils
+from src.bom_model import BOMModel
+from src.sch_hierarchy import get_hierarchy_symbol_dict
+
+PN_FIELD = 'Digikey Part Number'
+
+
+@pytest.mark.parametrize('kicad_version', (6, 7))
+@pytest.mark.parametrize('hierarchy', (False, True))
+def test_bom_of_a_schematic(tmp_path, kicad_version, hierarchy):
+    # the steps timed by bench/suite.py, on the output of each other
+    if hierarchy:
+        path = synth.write_hierarchy(str(tmp_path), depth=2, fanout=2, symbols_per_sheet=100, n_fields=10,
+                                     kicad_version=kicad_version)
+        symbol_dict = get_hierarchy_symbol_dict(path)
+        n_symbols = 100 * (1 + 2 + 4)  # every instance of the sheets, see `synth.write_hierarchy`
+    else:
+        path = synth.write_schematic(str(tmp_path / 'flat.kicad_sch'), n_symbols=1_000, n_fields=10,
+                                     unique_parts=100, kicad_version=kicad_version)
+        symbol_dict = utils.get_symbol_dict(path)
+        n_symbols = 1_000
+    assert len(symbol_dict) == n_symbols
+    field_scores = utils.score_fields_as_part_number(symbol_dict)
+    selected = utils.auto_select_part_number_field(symbol_dict)
+    assert selected['name'] == PN_FIELD
+    assert field_scores[PN_FIELD]['field_score'] == selected['field_score']
+    assert utils.auto_select_part_number_field(symbol_dict, sampled=True)['name'] == PN_FIELD
+
+    bom_obj_by_pn = utils.make_quantity(symbol_dict, PN_FIELD)
+    bom = BOMModel(bom_obj_by_pn, utils.parse_fields(symbol_dict), PN_FIELD).bom()
+    json_data = utils.json_from_bom__with_pn_as_key(bom)
+    # one line per part number, with the number of symbols having it
+    expected = Counter(_prop['value'] for _props in symbol_dict.values() for _prop in _props
+                       if _prop['name'] == PN_FIELD)
+    assert {_p['requestedPartNumber']: int(_p['quantities'][0]['quantity']) for _p in json_data} == expected
+    assert sum(expected.values()) == n_symbols
@@ -0,0 +1,101 @@
+import random
+import pytest
+import synth
+from bench_pn_normalize import PN_FIELD, with_variants
+from src import utils
+from src.bom_index import BOMIndex
+from src.pn_normalize import FOLD_PACKAGING_ENV, NORMALIZE_ENV, PartNumberNormalizer, canonical_part_number, \
+    fold_packaging, normalizer_from_environ
+from src.symbol_table import SymbolTable
+
+
+@pytest.mark.parametrize('value, fold, expected', [
+    (' 296-1234-1-nd ', False, '296-1234-1-ND'),
+    ('\uff12\uff19\uff16-1234-1-ND', False, '296-1234-1-ND'),  # full-width digits
+    ('296-1234-1-ND\u00a0', False, '296-1234-1-ND'),  # no-break space
+    ('296-1234-2-ND', False, '296-1234-2-ND'),
+    ('296-1234-2-ND', True, '296-1234-1-ND'),
+    ('p5555tr-nd', True, 'P5555CT-ND'),
+    ('LM358DKR-ND', True, 'LM358CT-ND'),
+    ('   ', False, ''),
+])
+def test_canonical_part_number(value, fold, expected):
+    assert canonical_part_number(value, fold) == expected
+
+
+def test_fold_packaging_keeps_other_part_numbers():
+    assert fold_packaging('RC0603FR-0710KL') == 'RC0603FR-0710KL'
+
+
+def test_merge():
+    merged, variants = PartNumberNormalizer().merge({'296-1234-1-ND': [0, 7], 'RC0603FR-0710KL': [1, 2],
+                                                     ' 296-1234-1-nd': [3], '': [4]})
+    assert merged == {'296-1234-1-ND': [0, 3, 7], 'RC0603FR-0710KL': [1, 2]}
+    assert variants == {'296-1234-1-ND': {'296-1234-1-ND': 2, ' 296-1234-1-nd': 1}}
+
+
+@pytest.fixture(scope='module')
+def symbols(tmp_path_factory):
+    # (table, symbol_dict), some part numbers spelled differently
+    path = tmp_path_factory.mktemp('pn').joinpath('pn.kicad_sch')
+    symbol_dict = with_variants(utils.get_symbol_dict(synth.write_schematic(str(path), n_symbols=5_000, n_fields=10)),
+                                random.Random(1))
+    return SymbolTable.from_symbol_dict(symbol_dict), symbol_dict
+
+
+def expected_quantities(symbol_dict, fold):
+    quantities = {}
+    for properties in symbol_dict.values():
+        for prop in properties:
+            if prop['name'] == PN_FIELD:
+                part_number = canonical_part_number(prop['value'], fold)
+                if part_number:
+                    quantities[part_number] = quantities.get(part_number, 0) + 1
+    return quantities
+
+
+@pytest.mark.parametrize('fold', (False, True))
+def test_grouping_by_canonical_part_number(symbols, fold):
+    table, symbol_dict = symbols
+    bom_index = BOMIndex(table, normalizer=PartNumberNormalizer(fold))
+    result = bom_index.make_quantity(PN_FIELD)
+    quantities = {_pn: _item['quantity'] for _pn, _item in result.items()}
+    assert quantities == expected_quantities(symbol_dict, fold)
+    assert len(result) < len(BOMIndex(table).make_quantity(PN_FIELD))
+    # every merged part number adds up its spellings
+    merged_variants = bom_index.merged_variants(PN_FIELD)
+    assert merged_variants
+    for part_number, variants in merged_variants.items():
+        assert len(variants) >= 2 and sum(variants.values()) == quantities[part_number]
+    # symbols of a part stay in table order
+    for item in result.values():
+        rows = [table.index[_uuid] for _uuid in item['symbol_uuids']]
+        assert rows == sorted(rows)
+
+
+@pytest.mark.parametrize('fold', (False, True))
+def test_make_quantity_for_part_numbers_as_written(symbols, fold):
+    # a change seen by the watcher names part numbers as written
+    table, _symbol_dict = symbols
+    bom_index = BOMIndex(table, normalizer=PartNumberNormalizer(fold))
+    result = bom_index.make_quantity(PN_FIELD)
+    some = random.Random(2).sample(sorted(result), 10)
+    written = [_v for _v in table.column(PN_FIELD) if _v and canonical_part_number(_v, fold) in some]
+    part_numbers = bom_index.canonical_part_numbers(written)
+    assert sorted(part_numbers) == sorted(some)
+    assert bom_index.make_quantity_for(PN_FIELD, part_numbers) == {_pn: result[_pn] for _pn in part_numbers}
+
+
+@pytest.mark.parametrize('environ, normalized, folded', [
+    ({}, True, False),
+    ({NORMALIZE_ENV: '0'}, False, False),
+    ({NORMALIZE_ENV: 'off', FOLD_PACKAGING_ENV: '1'}, True, True),  # folding needs normalizing
+    ({FOLD_PACKAGING_ENV: 'yes'}, True, True),
+    ({NORMALIZE_ENV: '1', FOLD_PACKAGING_ENV: '0'}, True, False),
+])
+def test_settings_of_the_dialog(environ, normalized, folded):
+    # same settings as `--no-normalize` and `--fold-packaging` of the command line
+    normalizer = normalizer_from_environ(environ)
+    assert (normalizer is not None) == normalized
+    if normalizer is not None:
+        assert normalizer.fold_packaging_suffixes == folded
@@ -0,0 +1,62 @@
+import cProfile
+import json
+import os
+import pstats
+import pytest
+import synth
+from bench_profiling import replay_load, replay_push
+from mylists_server import MyListsServer
+from src import profiling
+from src.push_outbox import PushOutbox
+
+LOAD_PHASES = ('read_schematic', 'parse_sheet', 'symbol_table', 'field_scoring', 'aggregation', 'serialization')
+PUSH_PHASES = ('outbox', 'upload', 'launch_browser')
+
+
+def test_disabled_by_default():
+    assert profiling.get_profiler({}) is profiling.NULL_PROFILER
+
+
+@pytest.fixture(scope='module')
+def trace(tmp_path_factory):
+    # --> (trace, path of the trace, number of chunks pushed): the phases of the load and push threads
+    # (they need wx) replayed with KICAD_DIGIKEY_PROFILE and KICAD_DIGIKEY_CPROFILE set
+    tmp = tmp_path_factory.mktemp('profiling')
+    directory = synth.write_hierarchy(str(tmp), depth=2, fanout=3, symbols_per_sheet=40, n_fields=10)
+    profiler = profiling.get_profiler({profiling.PROFILE_ENV: str(tmp.joinpath('traces')),
+                                       profiling.CPROFILE_ENV: '1'})
+    json_data = replay_load(profiler, directory)
+    with MyListsServer() as server:
+        replay_push(profiler, json_data, server.api_url, PushOutbox(str(tmp.joinpath('outbox.sqlite3'))))
+    trace_path = profiler.save()
+    with open(trace_path, encoding='utf-8') as fi:
+        return json.load(fi), trace_path, -(-len(json_data) // 200)
+
+
+def test_trace_phases(trace):
+    trace, _path, n_chunks = trace
+    events = [_e for _e in trace['traceEvents'] if _e['ph'] == 'X']
+    names = [_e['name'] for _e in events]
+    assert set(LOAD_PHASES + PUSH_PHASES) <= set(names)
+    assert names.count('http_round_trip') == n_chunks
+    for event in events:
+        assert event['dur'] >= 0 and 'peak_kb' in event['args'], event
+        # the CPU time of the phase's thread is part of the CPU time of the process
+        assert 0 <= event['args']['thread_cpu_ms'] <= event['args']['process_cpu_ms'] + 1, event
+    # the sheets are parsed within the reading of the schematic
+    read = next(_e for _e in events if _e['name'] == 'read_schematic')
+    for event in events:
+        if event['name'] == 'parse_sheet':
+            assert read['ts'] <= event['ts'] <= read['ts'] + read['dur']
+    assert any(_e['ph'] == 'M' and _e['name'] == 'thread_name' for _e in trace['traceEvents'])
+
+
+def test_cprofile_dump(trace):
+    _trace, trace_path, _n_chunks = trace
+    prof_path = trace_path[:-len('.json')] + '.prof'
+    assert os.path.exists(prof_path)
+    pstats.Stats(prof_path)
+    # `save()` stopped cProfile: another one can start
+    other = cProfile.Profile()
+    other.enable()
+    other.disable()
@@ -0,0 +1,136 @@
+import gzip
+import json
+import socket
+import time
+import pytest
+from bench_push import make_bom
+from mylists_server import MyListsServer
+from src import push_client
+from src.utils import json_from_bom__with_pn_as_key
+
+
+@pytest.fixture(scope='module')
+def json_data():
+    return json_from_bom__with_pn_as_key(make_bom(10))
+
+
+def test_transient_errors_are_retried(json_data):
+    with MyListsServer(failures=[503, 429, 502], retry_after=0) as server:
+        metrics = push_client.PushMetrics()
+        push_client.push_bom(json_data, 'retry', api_url=server.api_url, backoff=0.01, metrics=metrics)
+        assert (metrics.retries, metrics.attempts, list(server.lists)) == (3, 4, ['retry'])
+
+
+def test_more_errors_than_retries(json_data):
+    # the last answer is reported, the push can be sent again later
+    with MyListsServer(failures=[503] * 3) as server:
+        metrics = push_client.PushMetrics()
+        with pytest.raises(push_client.PushError) as e:
+            push_client.push_bom(json_data, 'retry', api_url=server.api_url, retries=2, backoff=0.01, metrics=metrics)
+        assert e.value.state == 'SHORT_URL_NOT_RETURNED' and e.value.transient
+        assert (metrics.attempts, metrics.failures) == (3, 1)
+
+
+def test_read_timeout_is_not_retried(json_data):
+    # the list may be created: not sent again, and not transient
+    with MyListsServer(delay=0.5) as server:
+        metrics = push_client.PushMetrics()
+        with pytest.raises(push_client.PushError) as e:
+            push_client.push_bom(json_data, 'timeout', api_url=server.api_url, timeout=(5, 0.1), backoff=0.01,
+                                 metrics=metrics)
+        assert e.value.state == 'ERR_REQUESTS_EXCEPTION' and not e.value.transient
+        assert (metrics.attempts, server.requests) == (1, 1)
+
+
+def test_retry_after_is_honored(json_data):
+    with MyListsServer(failures=[429], retry_after=1) as server:
+        t0 = time.perf_counter()
+        push_client.push_bom(json_data, 'retry', api_url=server.api_url, backoff=0.01)
+        assert time.perf_counter() - t0 >= 1
+
+
+def test_connection_refused(json_data):
+    # nothing listening: retried, then reported as a connection error
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        api_url = 'http://127.0.0.1:{p}/mylists/api/thirdparty'.format(p=sock.getsockname()[1])
+    metrics = push_client.PushMetrics()
+    with pytest.raises(push_client.PushError) as e:
+        push_client.push_bom(json_data, 'retry', api_url=api_url, retries=2, backoff=0.01, metrics=metrics)
+    assert e.value.state == 'ERR_REQUESTS_EXCEPTION' and e.value.transient
+    assert metrics.attempts == 3
+
+
+def test_keep_alive():
+    # chunks sent one after the other reuse the same connection
+    json_data = json_from_bom__with_pn_as_key(make_bom(1000))
+    with MyListsServer() as server:
+        push_client.push_bom(json_data, 'keep-alive', api_url=server.api_url, chunk_size=100, max_workers=1)
+        assert (server.requests, server.connections) == (10, 1)
+
+
+def test_gzip():
+    json_data = json_from_bom__with_pn_as_key(make_bom(300, note_length=200))
+    # plain JSON by default
+    with MyListsServer(accept_gzip=False) as server:
+        push_client.push_bom(json_data, 'default', api_url=server.api_url)
+        assert server.gzip_refused == 0 and server.lists['default'] == json_data
+    # compressed when asked for, and decoded by the server as the same parts
+    with MyListsServer() as server:
+        push_client.push_bom(json_data, 'gzip', api_url=server.api_url, compress=True)
+        assert server.lists['gzip'] == json_data
+        assert server.bytes_received * 4 < len(json.dumps(json_data))
+    # refused: sent again as plain JSON, and plain from then on
+    with MyListsServer(accept_gzip=False) as server:
+        push_client.push_bom(json_data, 'plain', api_url=server.api_url, compress=True)
+        push_client.push_bom(json_data, 'plain 2', api_url=server.api_url, compress=True)
+        assert server.gzip_refused == 1
+        assert server.lists['plain'] == server.lists['plain 2'] == json_data
+
+
+def test_encode_body():
+    json_data = json_from_bom__with_pn_as_key(make_bom(2000, note_length=100))
+    body, headers = push_client.encode_body(json_data, False)
+    assert body == json.dumps(json_data, allow_nan=False).encode('utf-8') and 'Content-Encoding' not in headers
+    plain = body
+    body, headers = push_client.encode_body(json_data, True)
+    assert headers['Content-Encoding'] == 'gzip' and gzip.decompress(body) == plain
+    # compressed piece by piece, the pieces make the same JSON
+    assert b''.join(push_client.iter_json_body(json_data, piece_size=1000)) == plain
+
+
+@pytest.mark.parametrize('n_parts, chunk_size, max_workers', [
+    (800, None, 1), (2000, 500, 1), (2000, 500, 4), (2000, 250, 8), (1, 500, 4)])
+def test_chunks(n_parts, chunk_size, max_workers):
+    # a server refusing requests of more than 1000 parts
+    json_data = json_from_bom__with_pn_as_key(make_bom(n_parts))
+    progress = []
+    with MyListsServer(max_parts=1000) as server:
+        short_urls = push_client.push_bom(json_data, 'bench', api_url=server.api_url, chunk_size=chunk_size,
+                                          max_workers=max_workers, on_chunk_done=lambda d, n: progress.append(d))
+        chunks = push_client.split_chunks(json_data, chunk_size)
+        assert len(short_urls) == len(set(short_urls)) == len(chunks)
+        received = []
+        for _i in range(len(chunks)):
+            received += server.lists[push_client.chunk_list_name('bench', _i, len(chunks))]
+        assert received == json_data
+        assert sorted(progress) == list(range(1, len(chunks) + 1))
+
+
+def test_one_list_by_default():
+    json_data = json_from_bom__with_pn_as_key(make_bom(1200))
+    with MyListsServer() as server:
+        assert len(push_client.push_bom(json_data, 'whole', api_url=server.api_url)) == 1
+        assert list(server.lists) == ['whole'] and server.lists['whole'] == json_data
+
+
+def test_chunks_already_sent():
+    # only the chunks without a list are sent, every short URL is returned in order
+    json_data = json_from_bom__with_pn_as_key(make_bom(30))
+    sent = []
+    with MyListsServer() as server:
+        short_urls = push_client.push_bom(json_data, 'split', api_url=server.api_url, chunk_size=10,
+                                          sent={1: 'https://www.digikey.com/short/aaaaaaa'},
+                                          on_chunk_sent=lambda i, u: sent.append(i))
+        assert sorted(server.lists) == ['split (1/3)', 'split (3/3)'] and sorted(sent) == [0, 2]
+        assert short_urls[1] == 'https://www.digikey.com/short/aaaaaaa' and len(set(short_urls)) == 3
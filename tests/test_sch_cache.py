@@ -0,0 +1,139 @@
+import os
+import zlib
+import pytest
+import synth
+from src.sch_cache import SheetCache
+from src.sch_parser import parse_sheet
+
+
+class CountingParse:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path, project=None):
+        self.calls += 1
+        return parse_sheet(path, project)
+
+
+@pytest.fixture
+def sheets(tmp_path):
+    return [synth.write_schematic(str(tmp_path / 'sheet_{n}.kicad_sch'.format(n=_n)), n_symbols=20, seed=_n)
+            for _n in range(3)]
+
+
+@pytest.fixture
+def parse():
+    return CountingParse()
+
+
+def set_mtime(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def rewrite_in_place(path):
+    # same size and mtime, another content
+    st = os.stat(path)
+    with open(path, 'r+b') as fo:
+        data = fo.read()
+        fo.seek(0)
+        fo.write(data.replace(b'R1"', b'R9"', 1))
+    set_mtime(path, st.st_mtime_ns)
+    assert os.stat(path).st_size == st.st_size
+
+
+def test_hit(tmp_path, sheets, parse):
+    cache = SheetCache(tmp_path / 'cache', parse=parse)
+    sheet = cache.parse_sheet(sheets[0])
+    assert cache.parse_sheet(sheets[0]) == sheet
+    assert parse.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    # a new instance reads the entries stored by the previous one
+    assert SheetCache(tmp_path / 'cache', parse=parse).parse_sheet(sheets[0]) == sheet
+    assert parse.calls == 1
+
+
+def test_miss_after_mtime_change(tmp_path, sheets, parse):
+    cache = SheetCache(tmp_path / 'cache', parse=parse)
+    cache.parse_sheet(sheets[0])
+    set_mtime(sheets[0], os.stat(sheets[0]).st_mtime_ns + 1_000_000)
+    cache.parse_sheet(sheets[0])
+    assert parse.calls == 2
+    cache.parse_sheet(sheets[0])
+    assert parse.calls == 2
+
+
+def test_miss_after_size_change(tmp_path, sheets, parse):
+    cache = SheetCache(tmp_path / 'cache', parse=parse)
+    cache.parse_sheet(sheets[0])
+    mtime_ns = os.stat(sheets[0]).st_mtime_ns
+    with open(sheets[0], 'a') as fo:
+        fo.write('\n')
+    set_mtime(sheets[0], mtime_ns)
+    cache.parse_sheet(sheets[0])
+    assert parse.calls == 2
+
+
+def test_hash_keyed(tmp_path, sheets, parse):
+    cache = SheetCache(tmp_path / 'cache', use_hash=True, parse=parse)
+    cache.parse_sheet(sheets[0])
+    # touched, same content (e.g. a git checkout): still a hit
+    set_mtime(sheets[0], os.stat(sheets[0]).st_mtime_ns + 1_000_000)
+    cache.parse_sheet(sheets[0])
+    assert parse.calls == 1
+    # modified, same size and mtime: a miss
+    rewrite_in_place(sheets[0])
+    sheet = cache.parse_sheet(sheets[0])
+    assert parse.calls == 2
+    assert sheet == parse_sheet(sheets[0])
+
+
+def test_mtime_keyed_does_not_see_a_rewrite_in_place(tmp_path, sheets, parse):
+    cache = SheetCache(tmp_path / 'cache', parse=parse)
+    cache.parse_sheet(sheets[0])
+    rewrite_in_place(sheets[0])
+    cache.parse_sheet(sheets[0])
+    assert parse.calls == 1
+
+
+@pytest.mark.parametrize('content', (
+    b'DKSC' + b'\x00' * 16,  # truncated or corrupt
+    zlib.compress(b'[{"mtime_ns": 0, "size": 0, "hash": null}, {}]'),  # not written by the cache
+    b'DKSC' + zlib.compress(b'{"not": "an entry"}'),  # entry of another version
+))
+def test_unusable_entry_is_a_miss(tmp_path, sheets, parse, content):
+    cache = SheetCache(tmp_path / 'cache', parse=parse)
+    sheet = cache.parse_sheet(sheets[0])
+    entry_path, = (tmp_path / 'cache').glob('*.bin')
+    entry_path.write_bytes(content)
+    assert cache.get(sheets[0]) is None
+    assert cache.parse_sheet(sheets[0]) == sheet
+    assert parse.calls == 2
+    # the entry was replaced by a valid one
+    assert cache.get(sheets[0]) == sheet
+
+
+def test_least_recently_used_evicted_by_size(tmp_path, sheets, parse):
+    cache = SheetCache(tmp_path / 'cache', parse=parse)
+    for _path in sheets:
+        cache.parse_sheet(_path)
+    entry_paths = [cache._entry_path(str(os.path.realpath(_path)), None) for _path in sheets]
+    for _n, _entry_path in enumerate(entry_paths):
+        set_mtime(_entry_path, (_n + 1) * 1_000_000_000)
+    cache.get(sheets[0])  # sheets[1] is now the least recently used
+    sizes = [os.stat(_entry_path).st_size for _entry_path in entry_paths]
+    cache.max_bytes = sum(sizes) - 1
+    cache.evict()
+    assert [_entry_path.exists() for _entry_path in entry_paths] == [True, False, True]
+    calls = parse.calls
+    cache.parse_sheet(sheets[0])
+    cache.parse_sheet(sheets[2])
+    assert parse.calls == calls
+    cache.parse_sheet(sheets[1])
+    assert parse.calls == calls + 1
+
+
+def test_evicted_by_count(tmp_path, sheets, parse):
+    cache = SheetCache(tmp_path / 'cache', max_entries=2, parse=parse)
+    for _path in sheets:
+        cache.parse_sheet(_path)
+    assert len(list((tmp_path / 'cache').glob('*.bin'))) == 2
@@ -0,0 +1,55 @@
+import random
+import pytest
+import synth
+from bench_sch_index import SYMBOL_HEAD, non_ascii, rewrite
+from src import utils
+from src.sch_index import IndexCache, build_index, read_symbol, read_symbols
+
+
+# the file as written, with multi-byte characters before and inside symbols (byte offsets and character
+# offsets differ), and also with CRLF line endings
+EDITS = {
+    'LF': lambda path: None,
+    'non-ASCII': lambda path: rewrite(path, non_ascii),
+    'CRLF': lambda path: (rewrite(path, non_ascii), rewrite(path, lambda text: text, newline='\r\n')),
+}
+
+
+@pytest.fixture(params=list(EDITS))
+def schematic(request, tmp_path):
+    path = synth.write_schematic(str(tmp_path / 'flat.kicad_sch'), n_symbols=500, n_fields=10)
+    EDITS[request.param](path)
+    return path
+
+
+def test_reads_through_the_index(schematic):
+    expected = utils.get_symbol_dict(schematic)
+    index = build_index(schematic)
+    assert sorted(index) == sorted(expected)
+    assert read_symbols(schematic, index) == expected
+    for uuid in random.Random(0).sample(sorted(index), 20):
+        assert read_symbol(schematic, index, uuid) == expected[uuid]
+        assert index[uuid]['fields'] == [_prop['name'] for _prop in expected[uuid]]
+
+
+def test_changes_found_by_block_hash(schematic, tmp_path):
+    cache = IndexCache(str(tmp_path / 'index'))
+    index, (added, modified, removed) = cache.update(schematic)
+    assert (len(added), modified, removed) == (len(index), [], [])
+    assert cache.update(schematic)[1] == ([], [], []) and cache.hits == 1
+
+    # one part number edited at the start of the file: the following blocks move, they're not modified
+    def edit(text):
+        head, *blocks = text.split(SYMBOL_HEAD)
+        blocks[0] = blocks[0].replace('-ND"', '-NEW-ND"', 1)
+        del blocks[-2]  # the last block goes on to the end of the file
+        return SYMBOL_HEAD.join([head] + blocks)
+
+    by_offset = sorted(index, key=lambda _uuid: index[_uuid]['offset'])
+    first, last = by_offset[0], by_offset[-2]
+    rewrite(schematic, edit)
+    new_index, (added, modified, removed) = cache.update(schematic)
+    assert (added, modified, removed) == ([], [first], [last])
+    assert read_symbols(schematic, new_index, modified)[first] == utils.get_symbol_dict(schematic)[first]
+    with pytest.raises(ValueError):
+        read_symbol(schematic, index, last)  # stale index
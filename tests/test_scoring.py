@@ -0,0 +1,94 @@
+import random
+import pytest
+import synth
+from bench_scoring import legacy_score_field_value_as_part_number, legacy_score_fields_as_part_number, \
+    part_number_values
+from src import utils
+
+# values that hit the edge cases of the value score: length bounds, packaging suffixes, case, non-ASCII
+EDGE_VALUES = ['', 'x', 'ABCDEFG', 'ABCDEFGH', 'ABCDEFGHI', 'ABCDEFGHIJ', 'ABCDEFGHIJK', 'A' * 24, 'A' * 25,
+                'A' * 31, 'A' * 32, 'A' * 37, 'A' * 38, 'A' * 49, 'A' * 50, '311-1.00KHRCT-ND', '296-1234-2-ND',
+                '296-1234-1-ND', '296-1234-6-ND', 'LM358DKR-ND', 'LM358TR-ND', '12345-X-ND', '1-X-ND\n',
+                'lower-nd', 'Mixed Case', 'µA741', 'ÄBC-ND', 'straße', 'R_0603 [1%]', 'A;B"C\'D%']
+
+
+def random_values(n, seed=0):
+    # part-number-like values, with enough noise to reach every branch of the value score
+    rng = random.Random(seed)
+    alphabet = 'abcxyzABCDKNRT0123456789-_ ,.#()[]"\'%\n\x00µß'
+    values = list(EDGE_VALUES)
+    while len(values) < n:
+        if rng.random() < 0.5:
+            values.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 70))))
+        else:
+            values.append('{n}-{m}{s}'.format(n=rng.randint(0, 99_999), m=''.join(rng.choice('AB1-') for _ in range(4)),
+                                              s=rng.choice(['-ND', 'CT-ND', '-1-ND', 'DKR-ND', '-nd', 'ND'])))
+    return values
+
+
+@pytest.mark.parametrize('value', EDGE_VALUES)
+def test_value_score_matches_legacy(value):
+    assert utils.score_field_value_as_part_number(value) == legacy_score_field_value_as_part_number(value)
+
+
+@pytest.mark.parametrize('use_numpy', (False, True))
+def test_batch_scores_match_legacy(use_numpy):
+    values = random_values(20_000) + part_number_values(20_000)
+    expected = [legacy_score_field_value_as_part_number(_v) for _v in values]
+    assert list(utils.score_field_values_as_part_number(values, use_numpy=use_numpy)) == expected
+
+
+@pytest.fixture(scope='module')
+def symbol_dict(tmp_path_factory):
+    path = tmp_path_factory.mktemp('scoring').joinpath('flat.kicad_sch')
+    return utils.get_symbol_dict(synth.write_schematic(str(path), n_symbols=2_000, n_fields=12, unique_parts=100))
+
+
+def test_field_scores_match_legacy(symbol_dict):
+    # same scores, in the same order, from a dict or a SymbolTable
+    expected = list(legacy_score_fields_as_part_number(symbol_dict).items())
+    assert list(utils.score_fields_as_part_number(symbol_dict).items()) == expected
+    assert list(utils.score_fields_as_part_number(utils.SymbolTable.from_symbol_dict(symbol_dict)).items()) == expected
+
+
+def test_sampled_auto_detection_picks_the_same_field(symbol_dict):
+    # below the sampling threshold, every value is scored
+    table = utils.SymbolTable.from_symbol_dict(symbol_dict)
+    assert utils.auto_select_part_number_field(table, True) == utils.auto_select_part_number_field(table)
+
+
+def part_number_symbol_dict(first_field, second_field, n=20_000):
+    # two candidate fields of mixed values (part numbers, references, values...), so sampled scores spread
+    first_values, second_values = part_number_values(n, seed=1), part_number_values(n, seed=2)
+    return {'uuid-{n}'.format(n=_n): [{'name': 'Reference', 'value': 'R{n}'.format(n=_n + 1)},
+                                      {'name': first_field, 'value': first_values[_n]},
+                                      {'name': second_field, 'value': second_values[_n]}]
+            for _n in range(n)}
+
+
+@pytest.fixture(scope='module')
+def large_symbol_dict():
+    # above the sampling threshold, see `utils._auto_select_sampled`
+    return part_number_symbol_dict('Digikey PN', 'Digikey Part Number')
+
+
+@pytest.mark.parametrize('as_table', (False, True))
+def test_sampled_auto_detection_on_a_large_design(large_symbol_dict, as_table):
+    symbols = utils.SymbolTable.from_symbol_dict(large_symbol_dict) if as_table else large_symbol_dict
+    n_values = sum(len(_v_symbol) for _v_symbol in large_symbol_dict.values())
+    full = utils.auto_select_part_number_field(symbols)
+    sampled = utils.auto_select_part_number_field(symbols, sampled=True)
+    assert sampled['name'] == full['name'] == 'Digikey Part Number'
+    assert full['values_examined'] == n_values == 3 * len(large_symbol_dict)
+    assert sampled['values_examined'] < n_values / 10
+    assert 0.99 <= sampled['confidence'] < 1.0
+
+
+def test_sampled_auto_detection_falls_back_when_not_decisive():
+    # two fields as likely to be the part number: no sample can tell them apart
+    symbol_dict = part_number_symbol_dict('Digikey Part Number', 'Alt Digikey Part Number')
+    full = utils.auto_select_part_number_field(symbol_dict)
+    sampled = utils.auto_select_part_number_field(symbol_dict, sampled=True)
+    assert sampled['confidence'] == 1.0
+    assert sampled['values_examined'] > full['values_examined'] == 3 * len(symbol_dict)
+    assert dict(sampled, values_examined=None) == dict(full, values_examined=None)
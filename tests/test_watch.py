@@ -0,0 +1,67 @@
+import os
+import pytest
+import synth
+from bench_watch import PN_FIELD, CountingParser, edit_sheet, set_part_number
+from src.bom_index import BOMIndex
+from src.bom_model import BOMModel
+from src.sch_hierarchy import get_hierarchy_symbol_table
+from src.sch_watch import SchematicWatcher, affected_part_numbers, apply_change
+from src.utils import parse_fields
+
+
+def model_rows(model):
+    return {model.part_numbers[_row]: (model.quantities[_row], model.cus_refs[_row], model.notes[_row])
+            for _row in range(len(model))}
+
+
+def follow_change(root_path, edit_path, edit):
+    # one edit of `edit_path` followed by the watcher, with user values on every part,
+    # checked against a full reload
+    parser = CountingParser()
+    watcher = SchematicWatcher(root_path, parse=parser)
+    watcher.load()
+    table = watcher.symbol_table()
+    bom_index = BOMIndex(table)
+    model = BOMModel(bom_index.make_quantity(PN_FIELD), parse_fields(table), PN_FIELD)
+    for row in range(len(model)):
+        model.set_text(row, model.cus_ref_col, 'ref {r}'.format(r=row))
+        model.set_text(row, model.note_col, 'note {pn}'.format(pn=model.part_numbers[row]))
+    user_values = {model.part_numbers[_row]: (model.cus_refs[_row], model.notes[_row]) for _row in range(len(model))}
+
+    assert watcher.poll() is None  # no edit, no change
+    edit_sheet(edit_path, edit)
+    parser.paths.clear()
+    assert watcher.poll() is None  # not parsed while it may still be written
+    change = watcher.poll()
+    assert change is not None
+    assert parser.paths == [os.path.basename(edit_path)]  # only the modified sheet is parsed again
+    apply_change(table, change)
+    bom_index.clear()
+    part_numbers = affected_part_numbers(change, PN_FIELD)
+    model.update_parts(bom_index.make_quantity_for(PN_FIELD, part_numbers), part_numbers)
+
+    full_table = get_hierarchy_symbol_table(root_path)
+    expected = BOMModel(BOMIndex(full_table).make_quantity(PN_FIELD), parse_fields(full_table), PN_FIELD)
+    assert sorted(full_table.items()) == sorted(table.items())
+    actual = model_rows(model)
+    assert len(actual) == len(expected)
+    for pn, (qty, _cus_ref, _note) in model_rows(expected).items():
+        assert actual[pn][0] == qty, pn
+        if pn in user_values:
+            assert actual[pn][1:] == user_values[pn], pn  # Customer References and Notes are kept
+
+
+@pytest.mark.parametrize('kicad_version', (6, 7))
+def test_hierarchy(tmp_path, kicad_version):
+    root_path = synth.write_hierarchy(str(tmp_path), depth=2, fanout=3, symbols_per_sheet=40, n_fields=10,
+                                      kicad_version=kicad_version)
+    level_2 = os.path.join(str(tmp_path), 'level_2.kicad_sch')
+    # a new part number, then the same one on another symbol, then symbols removed
+    follow_change(root_path, level_2, lambda b: set_part_number(b, 0, 'NEW-PN-ND'))
+    follow_change(root_path, level_2, lambda b: set_part_number(b, 1, 'NEW-PN-ND'))
+    follow_change(root_path, level_2, lambda b: b[:-3] + b[-1:])
+
+
+def test_flat(tmp_path):
+    flat = synth.write_schematic(str(tmp_path / 'flat.kicad_sch'), n_symbols=300, n_fields=10)
+    follow_change(flat, flat, lambda b: set_part_number(b, 5, 'OTHER-PN-ND'))